@@ -0,0 +1,7 @@
+"""
+Performance benchmarks for duckargs. Each module can be run with 'python -m', e.g.
+
+    python -m benchmarks.bench_infer
+
+'python -m benchmarks' runs the code generation benchmark suite in bench_generate.
+"""
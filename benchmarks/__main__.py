@@ -0,0 +1,8 @@
+"""
+Runs the code generation benchmark suite, with 'python -m benchmarks'
+"""
+import sys
+
+from benchmarks.bench_generate import main
+
+sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Compares the number of write system calls made by generated C programs when
+printing usage text and option values, with and without DUCKARGS_C_BUFFERED=1.
+
+Syscalls are counted with 'strace -c' if it is installed. Otherwise, the generated
+program is linked into a small harness which reads the write syscall count from
+/proc/self/io (Linux only). Either way, stdout is line-buffered, as it would be
+when writing to a terminal.
+"""
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from duckargs import generate_c_code
+from benchmarks.c_harness import (compile_program, parse_write_count, WRITE_COUNT_MAIN,
+                                   LINEBUF_MAIN)
+
+# Number of options in the generated program
+NUM_OPTIONS = 20
+
+
+def make_args(num_options):
+    """
+    Create arguments describing a program with a mix of option types
+
+    :param int num_options: number of options (at most 52)
+    :rtype: list
+    """
+    letters = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    values = [None, '12', '4.5', 'hello', 'FILE', 'x,y,z']
+    args = ['duckargs']
+
+    for i in range(num_options):
+        args += [f"-{letters[i]}", f"--option{i}"]
+        value = values[i % len(values)]
+        if value is not None:
+            args.append(value)
+
+    return args
+
+def make_program_args(num_options):
+    """
+    Create arguments for the program described by make_args(), which set every option
+
+    :param int num_options: number of options (at most 52)
+    :rtype: list
+    """
+    letters = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    values = [None, '34', '5.5', 'world', 'infile', 'y']
+    args = []
+
+    for i in range(num_options):
+        args.append(f"-{letters[i]}")
+        value = values[i % len(values)]
+        if value is not None:
+            args.append(value)
+
+    return args
+
+def _compile(cc, workdir, code, harness_main):
+    exe, proc = compile_program(cc, workdir, code, harness_main, ['-O2'])
+    if proc.returncode != 0:
+        raise RuntimeError(f"failed to compile generated code:\n{proc.stdout}")
+
+    return exe
+
+def count_writes(exe, args, use_strace):
+    """
+    Run a compiled program and return the number of write syscalls it made
+
+    :param str exe: path to program compiled with WRITE_COUNT_MAIN (or LINEBUF_MAIN,\
+        if using strace)
+    :param list args: arguments to pass to the program
+    :param bool use_strace: if True, count syscalls with 'strace -c'
+    :rtype: int
+    """
+    if use_strace:
+        proc = subprocess.run(['strace', '-c', '-e', 'trace=write,writev', exe] + args,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                              universal_newlines=True)
+        total = 0
+        for line in proc.stderr.splitlines():
+            fields = line.split()
+            if fields and fields[-1] in ('write', 'writev'):
+                total += int(fields[3])
+
+        return total
+
+    proc = subprocess.run([exe] + args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+    return parse_write_count(proc.stderr)
+
+def run(num_options=NUM_OPTIONS, out=sys.stdout):
+    """
+    Run the benchmark and print results
+
+    :param int num_options: number of options in the generated program
+    :param out: file object to print results to
+    """
+    cc = shutil.which('cc') or shutil.which('gcc')
+    if cc is None:
+        print("No C compiler available, skipping", file=out)
+        return
+
+    use_strace = shutil.which('strace') is not None
+    if (not use_strace) and (not os.path.exists('/proc/self/io')):
+        print("Neither strace nor /proc/self/io is available, skipping", file=out)
+        return
+
+    argv = make_args(num_options)
+    prog_args = make_program_args(num_options)
+    harness_main = LINEBUF_MAIN if use_strace else WRITE_COUNT_MAIN
+    method = "strace -c" if use_strace else "/proc/self/io"
+
+    print(f"{num_options} options, write syscalls counted with {method}", file=out)
+    print(f"{'mode':<12} {'usage':>8} {'values':>8}", file=out)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for buffered in ['0', '1']:
+            env = {'DUCKARGS_PRINT': '1', 'DUCKARGS_COMMENT': '1', 'DUCKARGS_C_BUFFERED': buffered}
+            exe = _compile(cc, workdir, generate_c_code(argv, env), harness_main)
+
+            usage = count_writes(exe, [], use_strace)
+            values = count_writes(exe, prog_args, use_strace)
+            name = "buffered" if buffered == '1' else "default"
+            print(f"{name:<12} {usage:>8} {values:>8}", file=out)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('-n', '--num-options', type=int, default=NUM_OPTIONS,
+                        help='number of options in the generated program (at most 52)')
+    args = parser.parse_args()
+
+    run(args.num_options)
+
+if __name__ == "__main__":
+    main()
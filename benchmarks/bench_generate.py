@@ -0,0 +1,269 @@
+"""
+Benchmark suite for code generation. Builds synthetic program descriptions of
+increasing size, times process_args, generate_python_code and generate_c_code
+separately, and measures the peak memory allocated by each with tracemalloc.
+
+Results are saved as JSON, and compared with a baseline created on the same machine
+with --update-baseline (timing depends on the machine and python version, so no
+baseline is shipped). The exit status is 1 if any benchmark took longer, or allocated
+more memory, than the baseline by more than the allowed threshold.
+"""
+import os
+import gc
+import sys
+import json
+import time
+import statistics
+import argparse
+import platform
+import tracemalloc
+
+from duckargs.core import process_args
+from duckargs.probe import FileProbe, PROBE_SENTINEL
+from duckargs.python import generate_python_code, _is_python_reserved_str
+from duckargs.c import generate_c_code
+
+# Number of options / positional arguments in each synthetic program
+SIZES = [10, 100, 1000, 10000]
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# A benchmark has regressed if it is slower, or allocates more memory, than the
+# baseline by more than this fraction
+DEFAULT_THRESHOLD = 0.25
+
+# Smallest relative noise assumed for any timing. The allowed increase in time is
+# the threshold plus the measured noise of both runs, and at least this much
+NOISE_FLOOR = 0.05
+
+# Each benchmark is repeated until it has run for at least this long (and at
+# least MIN_REPEATS times), and the median run time is reported, along with the
+# relative spread of run times
+MIN_BENCH_SECONDS = 0.2
+MIN_REPEATS = 7
+
+# Fixed settings, so that results don't depend on environment variables. Values are
+# never checked for existing files, so results don't depend on the current directory
+ENV = {'DUCKARGS_PRINT': '1', 'DUCKARGS_COMMENT': '1', 'DUCKARGS_PROBE': PROBE_SENTINEL}
+
+
+def make_args(size):
+    """
+    Create arguments describing a program with a mix of flags, typed options,
+    options with choices, FILE options and typed positional arguments. Options need
+    a unique single-letter short option, so programs with more than 104 options and
+    positional arguments are mostly positional arguments.
+
+    :param int size: total number of options and positional arguments
+    :rtype: list
+    """
+    letters = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    option_values = [None, '12', '0x1f', '4.5', 'hello', 'fast,medium,slow', 'FILE']
+    positional_values = ['name', '7', '2.5', 'some-value']
+
+    num_options = min(size // 2, len(letters))
+    args = ['duckargs']
+
+    for i in range(num_options):
+        args += [f"-{letters[i]}", f"--option-{i}"]
+        value = option_values[i % len(option_values)]
+        if value is not None:
+            args.append(value)
+
+    for i in range(size - num_options):
+        value = positional_values[i % len(positional_values)]
+        # String values are used as variable names, so they must be unique
+        args.append(value if value[0].isdigit() else f"{value}{i}")
+
+    return args
+
+def _process_args(argv):
+    return process_args(_is_python_reserved_str, argv, FileProbe(PROBE_SENTINEL))
+
+BENCHMARKS = [
+    ('process_args', _process_args),
+    ('generate_python_code', lambda argv: generate_python_code(argv, ENV)),
+    ('generate_c_code', lambda argv: generate_c_code(argv, ENV)),
+]
+
+def _quartiles(values):
+    # First and third quartiles, the same as statistics.quantiles(values, n=4) with the
+    # default 'exclusive' method (which needs python 3.8). Needs at least two values
+    data = sorted(values)
+    m = len(data) + 1
+    ret = []
+
+    for i in (1, 3):
+        j = min(max((i * m) // 4, 1), len(data) - 1)
+        delta = (i * m) - (j * 4)
+        ret.append((data[j - 1] * (4 - delta) + data[j] * delta) / 4)
+
+    return ret
+
+def time_func(func, argv):
+    """
+    Time a function, repeating it enough times for a stable result
+
+    :param func: function to time, which accepts argv
+    :param list argv: arguments to pass to func
+    :return: tuple of (median run time in seconds, relative noise), where noise is\
+        the interquartile range of run times divided by the median
+    :rtype: tuple
+    """
+    times = []
+    total = 0.0
+
+    # Like timeit, garbage collection is disabled while timing, since collections
+    # triggered by earlier runs are the biggest source of noise
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while (len(times) < MIN_REPEATS) or (total < MIN_BENCH_SECONDS):
+            start = time.perf_counter()
+            func(argv)
+            elapsed = time.perf_counter() - start
+
+            times.append(elapsed)
+            total += elapsed
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    median = statistics.median(times)
+    lower, upper = _quartiles(times)
+    return median, (upper - lower) / median
+
+def peak_memory(func, argv):
+    """
+    Measure the peak memory allocated while running a function
+
+    :param func: function to run, which accepts argv
+    :param list argv: arguments to pass to func
+    :return: peak size of memory blocks traced by tracemalloc, in bytes
+    :rtype: int
+    """
+    tracemalloc.start()
+    try:
+        func(argv)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+def run(sizes=SIZES, out=sys.stdout):
+    """
+    Run all benchmarks and print results
+
+    :param list sizes: program sizes to benchmark
+    :param out: file object to print results to
+    :return: results, which can be saved as JSON
+    :rtype: dict
+    """
+    results = []
+
+    print(f"{'benchmark':<22} {'size':>6} {'time (ms)':>12} {'noise':>9} {'peak (KB)':>12}", file=out)
+
+    for size in sizes:
+        argv = make_args(size)
+
+        for name, func in BENCHMARKS:
+            # Also makes sure all caches are warm before timing
+            peak = peak_memory(func, argv)
+            seconds, noise = time_func(func, argv)
+
+            results.append({'benchmark': name, 'size': size, 'seconds': seconds, 'noise': noise,
+                            'peak_bytes': peak})
+            print(f"{name:<22} {size:>6} {seconds * 1000:>12.3f} {noise * 100:>8.1f}% "
+                  f"{peak / 1024:>12.1f}", file=out)
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare benchmark results with a baseline. A benchmark is only slower than the
+    baseline if its median time increased by more than the threshold plus the noise
+    measured in both runs (and at least NOISE_FLOOR), so that a single noisy run
+    isn't reported as a regression
+
+    :param dict results: results returned by run()
+    :param dict baseline: results returned by an earlier call to run()
+    :param float threshold: allowed increase in time or memory, as a fraction\
+        of the baseline value
+
+    :return: list of descriptions of each regression
+    :rtype: list
+    """
+    base = {(r['benchmark'], r['size']): r for r in baseline['results']}
+    ret = []
+
+    for result in results['results']:
+        key = (result['benchmark'], result['size'])
+        if key not in base:
+            continue
+
+        old_seconds = base[key]['seconds']
+        seconds = result['seconds']
+        noise = max(NOISE_FLOOR, base[key].get('noise', 0.0) + result['noise'])
+        if seconds > (old_seconds * (1.0 + threshold + noise)):
+            ret.append(f"{key[0]} (size {key[1]}): {seconds * 1000:.3f}ms, "
+                       f"baseline {old_seconds * 1000:.3f}ms")
+
+        old_peak = base[key]['peak_bytes']
+        peak = result['peak_bytes']
+        if peak > (old_peak * (1.0 + threshold)):
+            ret.append(f"{key[0]} (size {key[1]}): peak memory {peak} bytes, "
+                       f"baseline {old_peak} bytes")
+
+    return ret
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip(),
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=SIZES,
+                        help='number of options and positional arguments in each program')
+    parser.add_argument('-o', '--output', default='benchmark_results.json',
+                        help='file to save results in, as JSON')
+    parser.add_argument('-b', '--baseline', default=BASELINE_FILE,
+                        help='JSON file containing baseline results, created on this machine')
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed increase in time or memory, as a fraction of the baseline')
+    parser.add_argument('-u', '--update-baseline', action='store_true',
+                        help='save results as the new baseline, instead of comparing with it')
+    args = parser.parse_args()
+
+    results = run(args.sizes)
+
+    with open(args.output, 'w') as fh:
+        json.dump(results, fh, indent=4)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as fh:
+            json.dump(results, fh, indent=4)
+
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.isfile(args.baseline):
+        print(f"No baseline found at {args.baseline}, run with --update-baseline to create one")
+        return 0
+
+    with open(args.baseline, 'r') as fh:
+        baseline = json.load(fh)
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+
+    if regressions:
+        return 1
+
+    print(f"No regressions (threshold {args.threshold * 100:.0f}%)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
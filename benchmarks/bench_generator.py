@@ -0,0 +1,137 @@
+"""
+Benchmark for generating many small programs in a single process. Generates code
+for 100,000 small specs, once with the module-level code generation functions (which
+read all settings from environment variables on every call), and once with a
+duckargs.Generator (which reads settings once), and prints the throughput of each.
+
+Also measures the per-call overhead of Generator.generate, which is the time spent
+outside of the backend's own code generation, and compares it with the documented
+target. The exit status is 1 if the overhead is higher than the target.
+"""
+import sys
+import time
+import argparse
+
+from duckargs import Generator, Spec, generate_code
+from duckargs.probe import PROBE_SENTINEL
+from duckargs.python import PythonSettings, _iter_python_code
+from duckargs.c import CSettings, _iter_c_code
+
+NUM_SPECS = 100000
+
+# Per-call overhead target for Generator.generate, in seconds
+OVERHEAD_TARGET = 5e-6
+
+# Fixed settings, so that results don't depend on environment variables. Values are
+# never checked for existing files, so results don't depend on the current directory
+ENV = {'DUCKARGS_PRINT': '1', 'DUCKARGS_COMMENT': '1', 'DUCKARGS_PROBE': PROBE_SENTINEL}
+
+# Number of times each measurement is repeated; the fastest run is reported
+REPEATS = 5
+
+BACKENDS = [
+    ('python', PythonSettings, _iter_python_code),
+    ('c', CSettings, _iter_c_code)
+]
+
+
+def make_specs(count):
+    """
+    Create arguments describing many small programs, each with a positional argument,
+    an int option and a flag
+
+    :param int count: number of programs
+    :rtype: list
+    """
+    return [['duckargs', f"infile{i}", '-n', f"--count{i}", str(i), '-v', '--verbose']
+            for i in range(count)]
+
+def time_calls(func, items, repeats=REPEATS):
+    """
+    Time calling a function once for each item
+
+    :param func: function to call
+    :param list items: items to pass to func
+    :param int repeats: number of times to repeat, the fastest run is reported
+
+    :return: fastest run time, in seconds
+    :rtype: float
+    """
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+def measure_overhead(target, settings_class, emitter, calls=20000):
+    """
+    Measure the per-call overhead of Generator.generate, by generating a program
+    with no options with Generator.generate, and directly with the backend
+
+    :return: overhead per call, in seconds
+    :rtype: float
+    """
+    generator = Generator(ENV)
+    settings = settings_class(ENV)
+    probe = generator.probe
+    items = [Spec([])] * calls
+
+    direct = time_calls(lambda spec: ''.join(emitter(spec, settings, probe)), items)
+    wrapped = time_calls(lambda spec: generator.generate(spec, target), items)
+    return max(0.0, wrapped - direct) / calls
+
+def run(num_specs=NUM_SPECS, out=sys.stdout):
+    """
+    Run all benchmarks and print results
+
+    :param int num_specs: number of specs to generate for each target
+    :param out: file object to print results to
+    :return: highest per-call overhead of Generator.generate, in seconds
+    :rtype: float
+    """
+    specs = make_specs(num_specs)
+    generator = Generator(ENV)
+    worst_overhead = 0.0
+
+    print(f"{'target':<8} {'method':<16} {'specs/s':>10} {'us/spec':>10}", file=out)
+
+    for target, settings_class, emitter in BACKENDS:
+        methods = [
+            ('generate_code', lambda argv: generate_code(target, argv, ENV)),
+            ('Generator', lambda argv: generator.generate(argv, target))
+        ]
+
+        for name, func in methods:
+            seconds = time_calls(func, specs, repeats=1)
+            print(f"{target:<8} {name:<16} {num_specs / seconds:>10.0f} "
+                  f"{seconds / num_specs * 1e6:>10.2f}", file=out)
+
+        overhead = measure_overhead(target, settings_class, emitter)
+        worst_overhead = max(worst_overhead, overhead)
+        print(f"{target:<8} {'overhead':<16} {'':>10} {overhead * 1e6:>10.2f}", file=out)
+
+    return worst_overhead
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip(),
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-n', '--num-specs', type=int, default=NUM_SPECS,
+                        help='number of specs to generate for each target')
+    args = parser.parse_args()
+
+    overhead = run(args.num_specs)
+    if overhead > OVERHEAD_TARGET:
+        print(f"Generator.generate overhead {overhead * 1e6:.2f}us is above the target "
+              f"of {OVERHEAD_TARGET * 1e6:.2f}us")
+        return 1
+
+    print(f"Generator.generate overhead is within the target of {OVERHEAD_TARGET * 1e6:.2f}us")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
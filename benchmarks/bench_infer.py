@@ -0,0 +1,118 @@
+"""
+Micro-benchmark for token classification / type inference, comparing
+duckargs.core.classify_token with the previous implementation, which tried int(),
+int(x, 16) and float() in turn and caught the exceptions.
+"""
+import sys
+import time
+import random
+import argparse
+
+from duckargs.core import classify_token, classify_tokens
+
+# Number of distinct tokens in the corpus, and the total number of tokens
+DISTINCT_TOKENS = 5000
+CORPUS_SIZE = 200000
+
+
+def _legacy_is_int(arg):
+    ret = True
+
+    try:
+        intval = int(arg)
+    except ValueError:
+        if ((len(arg) >= 3) and (arg[:2].lower() == "0x")) or \
+           ((len(arg) >= 4) and (arg[:3].lower() == "-0x")):
+            try:
+                intval = int(arg, 16)
+            except ValueError:
+                ret = False
+        else:
+            ret = False
+
+    return ret
+
+def _legacy_classify(token):
+    if _legacy_is_int(token):
+        return "int"
+
+    try:
+        float(token)
+    except ValueError:
+        pass
+    else:
+        return "float"
+
+    if token == 'FILE':
+        return "file"
+
+    return "string"
+
+def make_corpus(distinct, size, seed=0):
+    """
+    Create a list of tokens containing a realistic mix of option names, integers,
+    hex integers, negative numbers, floats, FILE sentinels and strings
+
+    :param int distinct: number of distinct tokens
+    :param int size: total number of tokens
+    :param int seed: random seed
+    :rtype: list
+    """
+    rng = random.Random(seed)
+    makers = [
+        lambda: f"-{rng.choice('abcdefghijklmnopqrstuvwxyz')}",
+        lambda: f"--{rng.choice(['apple', 'banana', 'cherry', 'output-file'])}{rng.randint(0, 99)}",
+        lambda: str(rng.randint(0, 100000)),
+        lambda: str(rng.randint(-1000, -1)),
+        lambda: hex(rng.randint(0, 0xffffff)),
+        lambda: f"{rng.uniform(-100, 100):.4f}",
+        lambda: 'FILE',
+        lambda: rng.choice(['apple', 'a,b,c', 'path/to/file.txt', 'hello-world', 'x_y_z']),
+    ]
+
+    pool = [rng.choice(makers)() for _ in range(distinct)]
+    return [rng.choice(pool) for _ in range(size)]
+
+def _time(func, corpus):
+    start = time.perf_counter()
+    func(corpus)
+    return time.perf_counter() - start
+
+def run(distinct=DISTINCT_TOKENS, size=CORPUS_SIZE, out=sys.stdout):
+    """
+    Run the benchmark and print results
+
+    :param int distinct: number of distinct tokens in the corpus
+    :param int size: total number of tokens in the corpus
+    :param out: file object to print results to
+    """
+    corpus = make_corpus(distinct, size)
+
+    results = [
+        ('legacy', _time(lambda c: [_legacy_classify(t) for t in c], corpus)),
+        ('classify_token (no cache)', _time(lambda c: [classify_token.__wrapped__(t) for t in c], corpus)),
+    ]
+
+    classify_token.cache_clear()
+    results.append(('classify_token (cold cache)', _time(lambda c: [classify_token(t) for t in c], corpus)))
+    results.append(('classify_token (warm cache)', _time(lambda c: [classify_token(t) for t in c], corpus)))
+
+    classify_token.cache_clear()
+    results.append(('classify_tokens (cold cache)', _time(classify_tokens, corpus)))
+
+    print(f"{size} tokens, {distinct} distinct", file=out)
+    for name, secs in results:
+        print(f"{name:<30} {secs * 1000:9.2f} ms {size / secs / 1e6:8.2f} M tokens/s", file=out)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('-d', '--distinct', type=int, default=DISTINCT_TOKENS,
+                        help='number of distinct tokens')
+    parser.add_argument('-n', '--size', type=int, default=CORPUS_SIZE,
+                        help='total number of tokens')
+    args = parser.parse_args()
+
+    run(args.distinct, args.size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Compares the cold-start time of generated python programs which parse arguments
+with argparse, and with the hand-written parser generated when DUCKARGS_FASTPARSE=1.
+
+Each program is run as a new process, the same way a small tool would be run from a
+shell script, and the median wall-clock time is reported. The startup time of an
+empty python program is also reported, for reference.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+from duckargs import generate_python_code
+
+# Number of options in the generated program
+NUM_OPTIONS = 20
+
+# Number of times each program is run
+NUM_RUNS = 30
+
+
+def make_args(num_options):
+    """
+    Create arguments describing a program with a mix of option types
+
+    :param int num_options: number of options (at most 51)
+    :rtype: list
+    """
+    # No '-h', since generated python programs always have a '-h' option
+    letters = 'abcdefgijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    values = [None, '12', '4.5', 'hello', 'x,y,z', '0x1f']
+    args = ['duckargs', 'infile']
+
+    for i in range(num_options):
+        args += [f"-{letters[i]}", f"--option{i}"]
+        value = values[i % len(values)]
+        if value is not None:
+            args.append(value)
+
+    return args
+
+def make_program_args(num_options):
+    """
+    Create arguments for the program described by make_args(), which set every option
+
+    :param int num_options: number of options (at most 51)
+    :rtype: list
+    """
+    # No '-h', since generated python programs always have a '-h' option
+    letters = 'abcdefgijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    values = [None, '34', '5.5', 'world', 'y', '32']
+    args = ['input.txt']
+
+    for i in range(num_options):
+        args.append(f"-{letters[i]}")
+        value = values[i % len(values)]
+        if value is not None:
+            args.append(value)
+
+    return args
+
+def time_program(cmd, runs):
+    """
+    Run a command several times, and return the median wall-clock time
+
+    :param list cmd: command to run
+    :param int runs: number of times to run the command
+    :return: median run time in seconds
+    :rtype: float
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+
+    times.sort()
+    return times[len(times) // 2]
+
+def run(num_options=NUM_OPTIONS, runs=NUM_RUNS, out=sys.stdout):
+    """
+    Run the benchmark and print results
+
+    :param int num_options: number of options in the generated program
+    :param int runs: number of times each program is run
+    :param out: file object to print results to
+    """
+    argv = make_args(num_options)
+    prog_args = make_program_args(num_options)
+
+    print(f"{num_options} options, median of {runs} runs", file=out)
+    print(f"{'program':<12} {'time (ms)':>10}", file=out)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [("empty", time_program([sys.executable, '-c', 'pass'], runs))]
+
+        for fastparse in ['0', '1']:
+            env = {'DUCKARGS_PRINT': '0', 'DUCKARGS_COMMENT': '0', 'DUCKARGS_PROBE': 'sentinel',
+                   'DUCKARGS_FASTPARSE': fastparse}
+
+            path = os.path.join(workdir, f"program{fastparse}.py")
+            with open(path, 'w') as fh:
+                fh.write(generate_python_code(argv, env))
+
+            # First run is not timed, so that all imported modules are in the OS file cache
+            cmd = [sys.executable, path] + prog_args
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, check=True)
+
+            name = "fastparse" if fastparse == '1' else "argparse"
+            results.append((name, time_program(cmd, runs)))
+
+    for name, seconds in results:
+        print(f"{name:<12} {seconds * 1000:>10.2f}", file=out)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('-n', '--num-options', type=int, default=NUM_OPTIONS,
+                        help='number of options in the generated program (at most 51)')
+    parser.add_argument('-r', '--runs', type=int, default=NUM_RUNS,
+                        help='number of times each program is run')
+    args = parser.parse_args()
+
+    run(args.num_options, args.runs)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Compiling generated C code into small test programs, shared by the C benchmarks
+and the C tests.
+"""
+import os
+import subprocess
+
+# Program which includes generated C code, and calls its functions instead of its
+# main function. The harness main function (and anything else it needs) replaces {0}
+HARNESS = """
+#define main generated_main
+#include "generated.c"
+#undef main
+
+{0}
+"""
+
+# Harness main function which counts write syscalls made by the generated main
+# function (read from /proc/self/io, Linux only), with stdout line-buffered as it
+# would be when writing to a terminal. The count is printed to stderr, see
+# parse_write_count
+WRITE_COUNT_MAIN = """
+static long write_syscalls(void)
+{
+    char line[128];
+    long ret = -1;
+    FILE *fh = fopen("/proc/self/io", "r");
+
+    while (fh && fgets(line, sizeof(line), fh))
+    {
+        if (1 == sscanf(line, "syscw: %ld", &ret))
+        {
+            break;
+        }
+    }
+
+    if (fh)
+    {
+        fclose(fh);
+    }
+
+    return ret;
+}
+
+int main(int argc, char *argv[])
+{
+    setvbuf(stdout, NULL, _IOLBF, BUFSIZ);
+
+    long before = write_syscalls();
+    int ret = generated_main(argc, argv);
+    fflush(stdout);
+    long after = write_syscalls();
+
+    fprintf(stderr, "duckargs-writes: %ld\\n", after - before);
+    return ret;
+}
+"""
+
+# Harness main function which only makes stdout line-buffered, for counting
+# syscalls with strace (stdbuf can't change buffering of a static binary)
+LINEBUF_MAIN = """
+int main(int argc, char *argv[])
+{
+    setvbuf(stdout, NULL, _IOLBF, BUFSIZ);
+    return generated_main(argc, argv);
+}
+"""
+
+# Prefix of the line printed to stderr by WRITE_COUNT_MAIN
+_WRITE_COUNT_PREFIX = "duckargs-writes:"
+
+
+def compile_program(cc, workdir, code, harness_main=None, cflags=()):
+    """
+    Compile generated C code, either by itself or included in HARNESS
+
+    :param str cc: C compiler command
+    :param str workdir: directory to write source files and the program to
+    :param str code: generated C code
+    :param str harness_main: code to put in HARNESS, e.g. WRITE_COUNT_MAIN. If None,\
+        the generated code is compiled by itself
+    :param cflags: extra arguments for the C compiler
+
+    :return: tuple of (path to compiled program, subprocess.CompletedProcess for the\
+        compiler, with stderr in stdout)
+    :rtype: tuple
+    """
+    with open(os.path.join(workdir, "generated.c"), 'w') as fh:
+        fh.write(code)
+
+    src = "generated.c"
+    if harness_main is not None:
+        src = "harness.c"
+        with open(os.path.join(workdir, src), 'w') as fh:
+            fh.write(HARNESS.format(harness_main))
+
+    exe = os.path.join(workdir, "program")
+    proc = subprocess.run([cc] + list(cflags) + ['-o', exe, src], cwd=workdir,
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                          universal_newlines=True)
+    return exe, proc
+
+def parse_write_count(stderr):
+    """
+    Read the write syscall count printed by a program compiled with WRITE_COUNT_MAIN
+
+    :param str stderr: stderr output of the program
+    :return: number of write syscalls
+    :rtype: int
+    """
+    for line in stderr.splitlines():
+        if line.startswith(_WRITE_COUNT_PREFIX):
+            return int(line[len(_WRITE_COUNT_PREFIX):])
+
+    raise RuntimeError(f"failed to count writes: {stderr}")
@@ -1,5 +1,7 @@
+import os
 import sys
-from duckargs import generate_python_code, generate_c_code, __version__
+import time
+from duckargs import ENV_VARS, generate_code, iter_code, __version__
 
 PYTHON_USAGE = """
 duckargs-python %s
@@ -69,31 +71,286 @@ program_name [OPTIONS] positional_arg
 
 """ % __version__
 
-def duckargs_python():
+# Options for duckargs itself, mapped to True if the option takes a value. These are
+# only recognized before the arguments describing the program to generate, and only if
+# the first one is a long option. Use '--' to mark the end of duckargs options. By default,
+# arguments describing a program can't start with a long option, since every option
+# needs a short option. But the table-driven C parsers allow long options with no short
+# option, so when generating C code with those, duckargs options must be followed by '--'
+# if any arguments describing a program (other than '@FILE') follow them. E.g.
+# 'duckargs-c --output 3 -a' describes a program with '--output' and '-a' options, and
+# 'duckargs-c --output 3 -- -a' writes a program with a '-a' option to a file named '3'.
+DUCKARGS_OPTIONS = {
+    '--no-cache': False,
+    '--no-daemon': False,
+    '--serve': False,
+    '--serve-stats': False,
+    '--serve-stop': False,
+    '--socket': True,
+    '--idle-timeout': True,
+    '--output': True,
+    '--force': False,
+    '--spec': True,
+    '--target': True,
+    '--update': True,
+    '--watch': True
+}
+
+# Short aliases for duckargs options. Like all duckargs options, these are only
+# recognized after a long duckargs option, e.g. 'duckargs --no-cache -o out.py -a'
+DUCKARGS_OPTION_ALIASES = {
+    '-o': '--output'
+}
+
+# Values of DUCKARGS_C_PARSER which allow long options with no short option. Not
+# imported from duckargs.c, which is slow to import
+LONG_ONLY_C_PARSERS = ('table', 'reentrant')
+
+def _long_only_allowed(env=None):
     """
-    CLI entry point for 'duckargs-python'
+    Check whether arguments describing a program may start with a long option
+
+    :param dict env: environment variables. If None, os.environ is used
+    :rtype: bool
+    """
+    if env is None:
+        env = os.environ
+
+    return env.get('DUCKARGS_C_PARSER') in LONG_ONLY_C_PARSERS
+
+def _split_args(argv, require_separator=False):
     """
-    if len(sys.argv) == 1:
-        print(PYTHON_USAGE)
+    Separate options for duckargs itself from the arguments describing the program
+    to generate
+
+    :param list argv: command-line arguments, including program name
+    :param bool require_separator: if True, arguments describing the program to\
+        generate may start with a long option, so duckargs options are only\
+        recognized if they are followed by '--', by a single '@FILE', or by nothing
+    :return: tuple of (dict of duckargs options, argv describing program to generate)
+    :rtype: tuple
+    """
+    opts = {}
+    i = 1
+
+    if (len(argv) > 1) and argv[1].startswith('--'):
+        while i < len(argv):
+            arg = DUCKARGS_OPTION_ALIASES.get(argv[i], argv[i])
+            if arg == '--':
+                i += 1
+                break
+
+            if arg not in DUCKARGS_OPTIONS:
+                break
+
+            if DUCKARGS_OPTIONS[arg]:
+                if (i + 1) >= len(argv):
+                    raise ValueError(f"option {arg} requires an argument")
+
+                opts[arg] = argv[i + 1]
+                i += 2
+            else:
+                opts[arg] = True
+                i += 1
+        else:
+            # Every argument is a duckargs option
+            return opts, argv[:1]
+
+        # A single '@FILE' never describes a program, so needs no '--' either
+        at_file = (i == (len(argv) - 1)) and argv[i].startswith('@')
+        if require_separator and (argv[i - 1] != '--') and (not at_file):
+            # Without '--', these are all arguments describing the program
+            return {}, list(argv)
+
+    return opts, argv[:1] + argv[i:]
+
+def _run_server_command(opts):
+    from duckargs.client import send_request
+
+    if '--serve' in opts:
+        from duckargs.server import serve, DEFAULT_IDLE_TIMEOUT
+
+        try:
+            idle_timeout = float(opts.get('--idle-timeout', DEFAULT_IDLE_TIMEOUT))
+        except ValueError:
+            raise ValueError("--idle-timeout must be a number")
+
+        serve(opts.get('--socket'), idle_timeout)
+        return
+
+    cmd = 'stats' if '--serve-stats' in opts else 'shutdown'
+    response = send_request({'cmd': cmd}, opts.get('--socket'))
+    if response is None:
+        raise RuntimeError("duckargs server is not running")
+
+    if cmd == 'stats':
+        import json
+        print(json.dumps(response['stats'], indent=4))
+
+def _load_spec_file(path, target):
+    from duckargs.core import SpecFile
+    from duckargs.probe import FileProbe
+    from duckargs.spec import parse_spec
+
+    allow_long_only = (target == 'c') and _long_only_allowed()
+    return parse_spec(SpecFile(path), FileProbe.from_env(), allow_long_only)
+
+def _run_update(target, path, argv, output, force):
+    from duckargs.update import update_file
+
+    conflicts = update_file(target, path, argv, output=output, force=force)
+    for line_number, old_lines, new_lines in conflicts:
+        print(f"Warning: {path}:{line_number}: lines were changed by hand, so the following "
+              "generated lines were not changed:", file=sys.stderr)
+        print(''.join('-' + line for line in old_lines), end='', file=sys.stderr)
+        print(''.join('+' + line for line in new_lines), end='', file=sys.stderr)
+
+    if conflicts and not force:
+        raise ValueError(f"{output or path} was not written, since some lines could not be "
+                         "updated. Use --force to write it anyway")
+
+def _run_watch(target, opts):
+    from duckargs.watch import Watcher
+
+    path = opts['--watch']
+    output = opts.get('--output')
+
+    # Without an output file, the spec file is a manifest, and the target language
+    # of each program is picked based on its output file extension by default
+    if output is None:
+        target = None
+
+    watcher = Watcher(path, output, opts.get('--target', target))
+    print(f"Watching {path} for changes, press Ctrl+C to stop", flush=True)
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+
+def _run(target, usage):
+    try:
+        opts, argv = _split_args(sys.argv, (target == 'c') and _long_only_allowed())
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    if ('--serve' in opts) or ('--serve-stats' in opts) or ('--serve-stop' in opts):
+        try:
+            _run_server_command(opts)
+        except (ValueError, RuntimeError, OSError) as e:
+            print(f"Error: {e}")
+
+        return
+
+    if '--watch' in opts:
+        _run_watch(target, opts)
         return
 
+    # '@FILE' is the same as '--spec FILE'
+    if (len(argv) == 2) and argv[1].startswith('@'):
+        opts['--spec'] = argv[1][1:]
+        argv = argv[:1]
+
+    if '--spec' in opts:
+        if len(argv) > 1:
+            print("Error: program arguments cannot be given with --spec")
+            return
+    elif len(argv) == 1:
+        print(usage)
+        return
+
+    # Allows generating code for targets added by other packages
+    target = opts.get('--target', target)
+    output = opts.get('--output')
+    code = None
+
     try:
-        print(generate_python_code())
-    except (ValueError, RuntimeError) as e:
+        if '--spec' in opts:
+            argv = _load_spec_file(opts['--spec'], target)
+
+        if '--update' in opts:
+            _run_update(target, opts['--update'], argv, output, '--force' in opts)
+            return
+
+        # Specs read from files are never sent to the server or cached, since they
+        # may be too large to send or hash quickly
+        if ('--no-daemon' not in opts) and ('--spec' not in opts):
+            from duckargs.client import generate
+            code = generate(target, argv, ENV_VARS, opts.get('--socket'))
+
+        if (code is None) and ('--no-cache' not in opts) and ('--spec' not in opts) and \
+           ('DUCKARGS_CACHE_DIR' in os.environ):
+            from duckargs.cache import GenerationCache, generate_cached
+            code = generate_cached(target, argv, GenerationCache())
+
+        if output is not None:
+            # Written atomically, so parallel builds never see a partially written file
+            from duckargs.output import write_atomic
+            write_atomic(output, [code] if code is not None else iter_code(target, argv))
+        elif code is not None:
+            print(code)
+        else:
+            print(generate_code(target, argv))
+    except (ValueError, RuntimeError, OSError) as e:
         print(f"Error: {e}")
 
+def duckargs_python():
+    """
+    CLI entry point for 'duckargs-python'
+    """
+    _run('python', PYTHON_USAGE)
+
 def duckargs_c():
     """
     CLI entry point for 'duckargs-c'
     """
-    if len(sys.argv) == 1:
-        print(C_USAGE)
-        return
+    _run('c', C_USAGE)
+
+def duckargs_batch():
+    """
+    CLI entry point for 'duckargs-batch'
+    """
+    import argparse
+    from duckargs import get_targets
+    from duckargs.batch import load_manifest, run_batch
+    from duckargs.cache import GenerationCache
+
+    parser = argparse.ArgumentParser(description='Generate many duckargs programs, described by '
+                                     'a manifest file, in a single run',
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('manifest', help='manifest file, containing one output path followed by '
+                        'arguments per line, or one JSON object per line')
+    parser.add_argument('-j', '--jobs', default=None, type=int, help='number of worker processes '
+                        '(default is the number of CPUs)')
+    parser.add_argument('-t', '--target', choices=get_targets(), default=None,
+                        help='target language for specs that do not set one (default is to '
+                        'pick based on output file extension)')
+    parser.add_argument('--cache-dir', default=None, help='directory for cached generated code '
+                        '(default is DUCKARGS_CACHE_DIR if set, otherwise ~/.cache/duckargs)')
+    parser.add_argument('--no-cache', action='store_true', help='do not use cached generated code')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
 
     try:
-        print(generate_c_code())
-    except (ValueError, RuntimeError) as e:
-        print(f"Error: {e}")
+        cache = None if args.no_cache else GenerationCache(args.cache_dir)
+        specs = load_manifest(args.manifest, args.target)
+        errors = run_batch(specs, args.jobs, cache)
+    except (ValueError, RuntimeError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    for error in errors:
+        print(error, file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    cached = f" ({cache.hits} cached)" if cache is not None else ""
+    print(f"Generated {len(specs) - len(errors)} of {len(specs)} programs{cached} in {elapsed:.2f}s",
+          file=sys.stderr)
+
+    return 1 if errors else 0
 
 if __name__ == "__main__":
     duckargs_python()
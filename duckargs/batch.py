@@ -0,0 +1,279 @@
+"""
+Batch generation of many programs in a single run
+"""
+import os
+import json
+import shlex
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from duckargs import check_target, generate_code, get_generator
+from duckargs.cache import cache_key
+from duckargs.probe import FileProbe, probed_paths
+from duckargs.output import write_atomic
+
+# Output file extensions that select the C backend when no target is given
+C_EXTENSIONS = ('.c', '.h')
+
+# Below this many unique specs, generation is done in-process, since starting
+# worker processes would cost more than it saves
+MIN_PARALLEL_SPECS = 8
+
+# FileProbe shared by all specs generated in a worker process
+_worker_probe = None
+
+
+def target_for_path(path):
+    """
+    Pick a target language from the extension of an output file path
+
+    :param str path: output file path
+    :return: target name
+    :rtype: str
+    """
+    return 'c' if os.path.splitext(path)[1].lower() in C_EXTENSIONS else 'python'
+
+
+class BatchSpec(object):
+    """
+    Represents a single program to generate in a batch run
+    """
+    def __init__(self, output, args, target=None, source=None):
+        """
+        :param str output: path to write the generated code to
+        :param list args: arguments describing the program (not including program name)
+        :param str target: target language, inferred from output path if None
+        :param str source: where this spec came from, used in error messages
+        """
+        if target is None:
+            target = target_for_path(output)
+
+        check_target(target)
+
+        self.output = output
+        self.args = tuple(args)
+        self.target = target
+        self.source = source
+
+    def key(self):
+        """
+        Returns a hashable key; specs with equal keys generate identical code
+        """
+        return (self.target, self.args)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.output}, {self.target}, {list(self.args)})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class BatchError(object):
+    """
+    Represents a failure to generate code for one spec in a batch run
+    """
+    def __init__(self, spec, message):
+        self.spec = spec
+        self.message = message
+
+    def __str__(self):
+        source = self.spec.source if self.spec.source else self.spec.output
+        return f"{source}: Error: {self.message}"
+
+
+def _parse_manifest_line(line, default_target, source):
+    if line.startswith('{'):
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON ({e})")
+
+        if (not isinstance(obj, dict)) or ('output' not in obj) or ('args' not in obj):
+            raise ValueError(f"JSON spec must be an object with 'output' and 'args' keys")
+
+        if not isinstance(obj['args'], list):
+            raise ValueError(f"'args' must be a list of strings")
+
+        return BatchSpec(obj['output'], [str(a) for a in obj['args']],
+                         obj.get('target', default_target), source)
+
+    tokens = shlex.split(line, comments=True)
+    if not tokens:
+        return None
+
+    return BatchSpec(tokens[0], tokens[1:], default_target, source)
+
+def load_manifest(path, default_target=None):
+    """
+    Read a batch manifest file. Each non-blank line (lines starting with '#' are
+    ignored) describes one program, in one of two formats:
+
+    * An output path followed by the arguments for the program, as they would
+      be passed to duckargs on the command line, e.g. "tools/foo.py -a --apple 3"
+
+    * A JSON object with 'output' and 'args' keys, and an optional 'target' key,
+      e.g. {"output": "tools/foo.c", "args": ["-a", "--apple", "3"], "target": "c"}
+
+    :param str path: path to manifest file
+    :param str default_target: target for specs that don't give one. If None, the\
+        target is picked based on the output file extension
+
+    :return: list of BatchSpec instances
+    :rtype: list
+    """
+    ret = []
+
+    with open(path, 'r') as fh:
+        for lineno, line in enumerate(fh, 1):
+            line = line.strip()
+            if (not line) or line.startswith('#'):
+                continue
+
+            source = f"{path}:{lineno}"
+            try:
+                spec = _parse_manifest_line(line, default_target, source)
+            except ValueError as e:
+                raise ValueError(f"{source}: {e}")
+
+            if spec is not None:
+                ret.append(spec)
+
+    return ret
+
+def dedupe_specs(specs):
+    """
+    Group specs that generate identical code, and drop repeated entries
+
+    :param list specs: list of BatchSpec instances
+    :return: dict mapping each unique spec key to a list of BatchSpec instances\
+        sharing that key, in the order they were first seen
+    :rtype: dict
+    """
+    groups = {}
+    outputs = {}
+
+    for spec in specs:
+        path = os.path.normpath(spec.output)
+        if path in outputs:
+            if outputs[path].key() != spec.key():
+                raise ValueError(f"Output '{spec.output}' is generated by more than one different spec")
+
+            # Exact duplicate, nothing more to do
+            continue
+
+        outputs[path] = spec
+        groups.setdefault(spec.key(), []).append(spec)
+
+    return groups
+
+def generate_parallel(target, argvs, max_workers=None, env=None, probe=None):
+    """
+    Generate code for many programs using a pool of threads.
+
+    Code generation keeps all of its state in local variables, so it is safe to
+    call generate_code, generate_python_code and generate_c_code from any number
+    of threads at once; this is a convenience wrapper for doing so. Since code
+    generation is CPU-bound, use run_batch instead if you just want to generate
+    many programs as fast as possible.
+
+    :param str target: target language name
+    :param argvs: iterable of argument lists (including program name) or Spec instances
+    :param int max_workers: number of threads. If None, the ThreadPoolExecutor\
+        default is used
+    :param dict env: environment variables to read settings from. If None,\
+        os.environ is used
+    :param FileProbe probe: used to check whether values are existing files,\
+        shared by all threads. If None, a new FileProbe using the DUCKARGS_PROBE\
+        setting is used
+
+    :return: list of generated code, in the same order as argvs
+    :rtype: list
+    """
+    func = get_generator(target)
+
+    if probe is None:
+        probe = FileProbe.from_env(env)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda argv: func(argv, env, probe), argvs))
+
+def _init_worker(probe):
+    global _worker_probe
+    _worker_probe = probe
+
+def _generate(key):
+    target, args = key
+    try:
+        return generate_code(target, ('duckargs',) + args, probe=_worker_probe), None
+    except (ValueError, RuntimeError) as e:
+        return None, str(e)
+
+def run_batch(specs, max_workers=None, cache=None, probe=None):
+    """
+    Generate code for all specs and atomically write each result to its output path.
+    Duplicate specs are only generated once.
+
+    :param list specs: list of BatchSpec instances
+    :param int max_workers: number of worker processes. If None, the number of\
+        CPUs is used. If 1, everything is generated in the calling process
+    :param GenerationCache cache: cache to look up and store generated code in.\
+        If None, no cache is used
+    :param FileProbe probe: used to check whether values are existing files. If\
+        None, a new FileProbe using the DUCKARGS_PROBE setting is used
+
+    :return: list of BatchError instances, one for each spec that failed
+    :rtype: list
+    """
+    groups = dedupe_specs(specs)
+    results = {}
+    keys = []
+    cache_keys = {}
+
+    if probe is None:
+        probe = FileProbe.from_env()
+
+    # Check all paths used by all specs at once, in this process, and share
+    # the results with the worker processes
+    probe.prefetch(path for _, args in groups for path in probed_paths(args))
+
+    for key in groups:
+        if cache is not None:
+            target, args = key
+            cache_keys[key] = cache_key(target, ('duckargs',) + args, probe=probe)
+            code = cache.get(cache_keys[key])
+            if code is not None:
+                results[key] = (code, None)
+                continue
+
+        keys.append(key)
+
+    if (max_workers == 1) or (len(keys) < MIN_PARALLEL_SPECS):
+        _init_worker(probe)
+        generated = map(_generate, keys)
+        executor = None
+    else:
+        workers = max_workers if max_workers else (os.cpu_count() or 1)
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(probe,))
+        chunksize = max(1, len(keys) // (workers * 4))
+        generated = executor.map(_generate, keys, chunksize=chunksize)
+
+    try:
+        for key, (code, error) in zip(keys, generated):
+            results[key] = (code, error)
+            if (cache is not None) and (error is None):
+                cache.put(cache_keys[key], code)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    errors = []
+
+    for key, group in groups.items():
+        code, error = results[key]
+        for spec in group:
+            if error is None:
+                write_atomic(spec.output, [code])
+            else:
+                errors.append(BatchError(spec, error))
+
+    return errors
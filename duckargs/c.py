@@ -0,0 +1,1750 @@
+"""
+C code generator
+"""
+import sys
+import os
+import re
+import shlex
+
+from duckargs.core import ArgType, process_args, split_template, iter_template, _get_env_int, _get_env_choice
+from duckargs.spec import Spec
+from duckargs.probe import FileProbe
+from duckargs import profiling
+
+C_TEMPLATE = """{0}#include <stdlib.h>
+#include <stdio.h>
+
+{1}
+void print_usage(void)
+{{
+{2}
+}}
+
+int parse_args(int argc, char *argv[])
+{{
+{3}
+}}
+
+int main(int argc, char *argv[])
+{{
+{7}    if (argc < 2)
+    {{
+        print_usage();
+        return -1;
+    }}
+
+    int ret = parse_args(argc, argv);
+{8}    if (0 != ret)
+    {{
+        return ret;
+    }}
+
+{5}{4}{6}    return 0;
+}}
+"""
+
+_C_SEGMENTS = split_template(C_TEMPLATE)
+
+# Used when DUCKARGS_C_PARSER=reentrant. All values are stored in a struct supplied
+# by the caller, so parse_args can be called any number of times, from any thread
+C_REENTRANT_TEMPLATE = """{0}#include <stdlib.h>
+#include <stdio.h>
+
+{1}
+void init_defaults(struct program_options *opts)
+{{
+{2}
+}}
+
+void print_usage(void)
+{{
+{3}
+}}
+
+int parse_args(struct program_options *opts, int argc, char *argv[])
+{{
+{4}
+}}
+
+int main(int argc, char *argv[])
+{{
+    struct program_options opts;
+
+{8}    if (argc < 2)
+    {{
+        print_usage();
+        return -1;
+    }}
+
+    init_defaults(&opts);
+    int ret = parse_args(&opts, argc, argv);
+{9}    if (0 != ret)
+    {{
+        return ret;
+    }}
+
+{6}{5}{7}    return 0;
+}}
+"""
+
+_C_REENTRANT_SEGMENTS = split_template(C_REENTRANT_TEMPLATE)
+
+# Ways of checking option values against a list of choices (DUCKARGS_C_CHOICES)
+C_CHOICES_LINEAR = "linear"    # strcmp each choice in turn
+C_CHOICES_SORTED = "sorted"    # binary search of a sorted table
+C_CHOICES_HASH = "hash"        # perfect hash table, built at generation time
+
+C_CHOICES_MODES = (C_CHOICES_LINEAR, C_CHOICES_SORTED, C_CHOICES_HASH)
+
+# Values for DUCKARGS_C_FILE
+C_FILE_PATH = "path"    # FILE arguments are just paths
+C_FILE_MMAP = "mmap"    # FILE arguments are opened and memory-mapped after parsing
+
+C_FILE_MODES = (C_FILE_PATH, C_FILE_MMAP)
+
+# Values for DUCKARGS_C_PARSER
+C_PARSER_GETOPT = "getopt"    # getopt / getopt_long, and a switch statement
+C_PARSER_TABLE = "table"      # option descriptor table, and a perfect hash of long options
+C_PARSER_REENTRANT = "reentrant"    # like "table", but values are stored in a caller-supplied struct
+
+C_PARSER_MODES = (C_PARSER_GETOPT, C_PARSER_TABLE, C_PARSER_REENTRANT)
+
+# Used for FILE arguments when DUCKARGS_C_FILE=mmap
+C_MAPPED_FILE_CODE = """
+typedef struct
+{
+    const char *data;  // File contents, or NULL if the file has not been opened
+    size_t size;       // Size of file contents, in bytes
+    int mapped;        // 1 if data is memory-mapped, 0 if data was read into a heap buffer
+} mapped_file_t;
+
+// Size of the first buffer allocated for files that can't be memory-mapped (e.g. pipes)
+#define READ_BUFFER_SIZE (1024 * 1024)
+
+static int read_whole_file(int fd, mapped_file_t *file)
+{
+    size_t capacity = READ_BUFFER_SIZE;
+    size_t size = 0;
+    char *buf = malloc(capacity);
+
+    if (NULL == buf)
+    {
+        return -1;
+    }
+
+    while (1)
+    {
+        if (size == capacity)
+        {
+            char *newbuf = realloc(buf, capacity * 2);
+            if (NULL == newbuf)
+            {
+                free(buf);
+                errno = ENOMEM;
+                return -1;
+            }
+
+            buf = newbuf;
+            capacity *= 2;
+        }
+
+        ssize_t ret = read(fd, buf + size, capacity - size);
+        if (ret > 0)
+        {
+            size += (size_t) ret;
+        }
+        else if (0 == ret)
+        {
+            break;
+        }
+        else if (EINTR != errno)
+        {
+            int err = errno;
+            free(buf);
+            errno = err;
+            return -1;
+        }
+    }
+
+    file->data = buf;
+    file->size = size;
+    file->mapped = 0;
+    return 0;
+}
+
+// Memory-map a file read-only, or read it into a heap buffer if it can't be mapped.
+// "-" means stdin. Returns 0 if successful, or prints an error and returns -1
+static int open_mapped_file(mapped_file_t *file, const char *path)
+{
+    int fd = STDIN_FILENO;
+    struct stat st;
+    int ret = 0;
+
+    file->data = NULL;
+    file->size = 0;
+    file->mapped = 0;
+
+    if (0 != strcmp(path, "-"))
+    {
+        fd = open(path, O_RDONLY);
+        if (fd < 0)
+        {
+            printf("Failed to open %s: %s\\n", path, strerror(errno));
+            return -1;
+        }
+    }
+
+    if ((0 == fstat(fd, &st)) && S_ISREG(st.st_mode) && (st.st_size > 0))
+    {
+        void *data = mmap(NULL, (size_t) st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+        if (MAP_FAILED != data)
+        {
+#ifdef MADV_SEQUENTIAL
+            // Most programs read input files from start to end, so ask for aggressive read-ahead
+            madvise(data, (size_t) st.st_size, MADV_SEQUENTIAL);
+#endif
+            file->data = data;
+            file->size = (size_t) st.st_size;
+            file->mapped = 1;
+        }
+    }
+
+    if ((!file->mapped) && (0 != read_whole_file(fd, file)))
+    {
+        printf("Failed to read %s: %s\\n", path, strerror(errno));
+        ret = -1;
+    }
+
+    if (STDIN_FILENO != fd)
+    {
+        close(fd);
+    }
+
+    return ret;
+}
+
+static void close_mapped_file(mapped_file_t *file)
+{
+    if (NULL == file->data)
+    {
+        return;
+    }
+
+    if (file->mapped)
+    {
+        munmap((void *) file->data, file->size);
+    }
+    else
+    {
+        free((void *) file->data);
+    }
+
+    file->data = NULL;
+    file->size = 0;
+    file->mapped = 0;
+}
+"""
+
+# Used when DUCKARGS_TIMING=1. Adds a hidden --duckargs-timing option, which reports
+# argument parsing time, total run time and peak RSS to stderr when the program exits
+C_TIMING_CODE = """
+// Used by the hidden --duckargs-timing option
+static struct timespec duckargs_start_time;
+static struct timespec duckargs_parsed_time;
+
+static double duckargs_elapsed_ms(const struct timespec *start, const struct timespec *end)
+{
+    return ((end->tv_sec - start->tv_sec) * 1000.0) + ((end->tv_nsec - start->tv_nsec) / 1000000.0);
+}
+
+static void duckargs_timing_report(void)
+{
+    struct timespec end_time;
+    struct rusage usage;
+
+    clock_gettime(CLOCK_MONOTONIC, &end_time);
+    getrusage(RUSAGE_SELF, &usage);
+
+#ifdef __APPLE__
+    // ru_maxrss is in bytes on macOS, and in kilobytes everywhere else
+    usage.ru_maxrss /= 1024;
+#endif
+
+    fprintf(stderr, "duckargs timing: parsing %.3f ms, total %.3f ms, peak RSS %ld KB\\n",
+            duckargs_elapsed_ms(&duckargs_start_time, &duckargs_parsed_time),
+            duckargs_elapsed_ms(&duckargs_start_time, &end_time), (long) usage.ru_maxrss);
+}
+
+// Removes the hidden --duckargs-timing option from argv. If it was given, timing
+// information is reported when the program exits
+static void duckargs_timing_start(int *argc, char *argv[])
+{
+    clock_gettime(CLOCK_MONOTONIC, &duckargs_start_time);
+    duckargs_parsed_time = duckargs_start_time;
+
+    for (int i = 1; i < *argc; i++)
+    {
+        if (0 == strcmp(argv[i], "--"))
+        {
+            break;
+        }
+
+        if (0 == strcmp(argv[i], "--duckargs-timing"))
+        {
+            // Also moves the NULL pointer at argv[argc]
+            memmove(&argv[i], &argv[i + 1], (*argc - i) * sizeof(char *));
+            (*argc)--;
+            atexit(duckargs_timing_report);
+            break;
+        }
+    }
+}
+
+static void duckargs_timing_parsed(void)
+{
+    clock_gettime(CLOCK_MONOTONIC, &duckargs_parsed_time);
+}
+"""
+
+# Largest seed tried for a single perfect hash bucket, before trying a bigger table
+MAX_HASH_SEED = 1 << 16
+
+# Names that can't be used as C variable names
+C_RESERVED_WORDS = frozenset([
+    'bool', '_Bool', 'char', 'unsigned', 'short', 'int', 'long', 'size_t', 'ssize_t',
+    'time_t', 'float', 'double', 'wchar_t', 'void', 'int8_t', 'uint8_t',
+    'int16_t', 'uint16_t', 'int32_t', 'uint32_t', 'int64_t', 'uint64_t', 'int128_t',
+    'uint128_t', 'static', 'auto', 'restrict', 'register', 'return', 'switch',
+    'union', 'extern', 'enum', 'if', 'else', 'for', 'while', 'do', 'break', 'signed',
+    'sizeof', 'typedef', 'struct', 'case', 'default', 'volatile', 'goto', 'continue',
+    'const'
+])
+
+def _is_c_reserved_str(var_name):
+    return var_name in C_RESERVED_WORDS
+
+
+class CSettings(object):
+    """
+    Settings for generating C code, read from environment variables. Settings are
+    read once when an instance is created, so a single instance can be passed to
+    iter_c_code / generate_c_code in place of env to generate many programs without
+    reading them again.
+    """
+    __slots__ = ('env', 'choices_mode', 'buffered', 'file_mode', 'parser_mode', 'print_values',
+                 'comment', 'timing')
+
+    def __init__(self, env=None):
+        """
+        :param dict env: environment variables to read settings from. If None,\
+            os.environ is used
+        """
+        if env is None:
+            env = os.environ
+
+        self.env = env
+        self.choices_mode = _get_env_choice(env, 'DUCKARGS_C_CHOICES', C_CHOICES_MODES, C_CHOICES_LINEAR)
+        self.buffered = _get_env_int(env, 'DUCKARGS_C_BUFFERED', 0) > 0
+        self.file_mode = _get_env_choice(env, 'DUCKARGS_C_FILE', C_FILE_MODES, C_FILE_PATH)
+        self.parser_mode = _get_env_choice(env, 'DUCKARGS_C_PARSER', C_PARSER_MODES, C_PARSER_GETOPT)
+        self.print_values = _get_env_int(env, 'DUCKARGS_PRINT') > 0
+        self.comment = _get_env_int(env, 'DUCKARGS_COMMENT') > 0
+        self.timing = _get_env_int(env, 'DUCKARGS_TIMING', 0) > 0
+
+
+def _fnv1a(data, seed):
+    # Must match duckargs_hash() in the generated C code
+    ret = 0x811c9dc5 ^ seed
+    for b in data:
+        ret = ((ret ^ b) * 0x01000193) & 0xffffffff
+
+    return ret
+
+def _unique_choices(choices):
+    # Maps each distinct choice to the index of its first occurrence
+    ret = {}
+    for i, choice in enumerate(choices):
+        ret.setdefault(choice, i)
+
+    return ret
+
+def _build_perfect_hash(choices):
+    """
+    Build a perfect hash table for a list of strings, using the "hash and displace"
+    method: strings are split into buckets by hash value, and for each bucket a seed
+    is found which places all strings in the bucket in empty table slots
+
+    :param list choices: list of strings
+    :return: tuple of (list of seeds, one per bucket, list of table slots, containing\
+        choice indices or None for empty slots)
+    :rtype: tuple
+    """
+    unique = _unique_choices(choices)
+    keys = [(c.encode('utf-8'), i) for c, i in unique.items()]
+    num_buckets = len(keys)
+    table_size = 2 * len(keys)
+
+    while True:
+        buckets = [[] for _ in range(num_buckets)]
+        for key in keys:
+            buckets[_fnv1a(key[0], 0) % num_buckets].append(key)
+
+        seeds = [0] * num_buckets
+        slots = [None] * table_size
+        failed = False
+
+        # Place the biggest buckets first, while most of the table is empty
+        for bucket_index in sorted(range(num_buckets), key=lambda b: -len(buckets[b])):
+            bucket = buckets[bucket_index]
+            if not bucket:
+                break
+
+            for seed in range(1, MAX_HASH_SEED):
+                positions = [_fnv1a(data, seed) % table_size for data, _ in bucket]
+                if (len(set(positions)) == len(positions)) and \
+                   all(slots[pos] is None for pos in positions):
+                    break
+            else:
+                failed = True
+                break
+
+            seeds[bucket_index] = seed
+            for pos, (_, index) in zip(positions, bucket):
+                slots[pos] = index
+
+        if not failed:
+            return seeds, slots
+
+        table_size *= 2
+
+def _choice_enum_names(choice_args):
+    """
+    Build the names of the enum values for the choices of all options / positional
+    arguments with choices. Enum values share a single namespace in C, so names must
+    be unique across the whole program, not just within one option: a name which is
+    already used (e.g. 'MODE_A_X' for '--mode a_x' and '--mode-a x') gets a numeric
+    suffix
+
+    :param list choice_args: CmdlineOpt instances with a list of choices
+    :return: dict mapping variable names to lists of enum value names
+    :rtype: dict
+    """
+    used = set()
+    ret = {}
+
+    for arg in choice_args:
+        prefix = arg.var_name.upper()
+        names = [f"{prefix}_" + re.sub("[^0-9a-zA-Z_]", "_", c).upper() for c in arg.value]
+        if len(set(names)) != len(names):
+            names = [f"{prefix}_CHOICE_{i}" for i in range(len(arg.value))]
+
+        unique = []
+        for name in names:
+            candidate = name
+            suffix = 2
+            while candidate in used:
+                candidate = f"{name}_{suffix}"
+                suffix += 1
+
+            used.add(candidate)
+            unique.append(candidate)
+
+        ret[arg.var_name] = unique
+
+    return ret
+
+def _iter_c_choice_lookup(arg, names, choices_mode, index_var=True):
+    """
+    Generate an enum with one value per choice, and a '<var_name>_choice_index'
+    function which returns the enum value for a string, or -1 if the string
+    is not one of the choices. If index_var is True, a '<var_name>_index' variable
+    is also generated, to hold the enum value of the selected choice
+
+    :param arg: CmdlineOpt instance with a list of choices
+    :param list names: enum value names, one per choice (see _choice_enum_names)
+    :param str choices_mode: DUCKARGS_C_CHOICES setting
+    :param bool index_var: if True, generate a '<var_name>_index' variable
+    """
+    name = arg.var_name
+    num_choices = len(arg.value)
+
+    yield f"\nenum {name}_choice\n{{\n"
+    yield ",\n".join([f"    {n}" for n in names])
+    yield f"\n}};\n\n"
+
+    if index_var:
+        yield f"static int {name}_index = {names[0]};\n\n"
+
+    if choices_mode == C_CHOICES_SORTED:
+        unique = _unique_choices(arg.value)
+        entries = sorted(unique.items(), key=lambda x: x[0].encode('utf-8'))
+
+        yield f"// Choices in strcmp order, for binary search\n"
+        yield f"static const struct {{ const char *name; int index; }} {name}_sorted_choices[] =\n{{\n"
+        yield ",\n".join([f"    {{\"{c}\", {names[i]}}}" for c, i in entries])
+        yield f"\n}};\n\n"
+        yield f"static int {name}_choice_index(const char *str)\n"
+        yield f"{{\n"
+        yield f"    int low = 0;\n"
+        yield f"    int high = {len(entries) - 1};\n\n"
+        yield f"    while (low <= high)\n"
+        yield f"    {{\n"
+        yield f"        int mid = low + ((high - low) / 2);\n"
+        yield f"        int cmp = strcmp(str, {name}_sorted_choices[mid].name);\n"
+        yield f"        if (0 == cmp)\n"
+        yield f"        {{\n"
+        yield f"            return {name}_sorted_choices[mid].index;\n"
+        yield f"        }}\n\n"
+        yield f"        if (cmp < 0)\n"
+        yield f"        {{\n"
+        yield f"            high = mid - 1;\n"
+        yield f"        }}\n"
+        yield f"        else\n"
+        yield f"        {{\n"
+        yield f"            low = mid + 1;\n"
+        yield f"        }}\n"
+        yield f"    }}\n\n"
+        yield f"    return -1;\n"
+        yield f"}}\n"
+        return
+
+    seeds, slots = _build_perfect_hash(arg.value)
+
+    yield f"// Perfect hash table of choices, generated by duckargs\n"
+    yield f"static const uint32_t {name}_hash_seeds[{len(seeds)}] =\n{{\n"
+    yield ",\n".join([f"    {s}" for s in seeds])
+    yield f"\n}};\n\n"
+    yield f"static const struct {{ const char *name; int index; }} {name}_hash_table[{len(slots)}] =\n{{\n"
+    yield ",\n".join(["    {NULL, -1}" if i is None else f"    {{\"{arg.value[i]}\", {names[i]}}}"
+                       for i in slots])
+    yield f"\n}};\n\n"
+    yield f"static int {name}_choice_index(const char *str)\n"
+    yield f"{{\n"
+    yield f"    uint32_t seed = {name}_hash_seeds[duckargs_hash(str, 0) % {len(seeds)}];\n"
+    yield f"    uint32_t slot = duckargs_hash(str, seed) % {len(slots)};\n\n"
+    yield f"    if ((NULL != {name}_hash_table[slot].name) && (0 == strcmp(str, {name}_hash_table[slot].name)))\n"
+    yield f"    {{\n"
+    yield f"        return {name}_hash_table[slot].index;\n"
+    yield f"    }}\n\n"
+    yield f"    return -1;\n"
+    yield f"}}\n"
+
+def _iter_c_hash_function():
+    yield "\n// FNV-1a hash, used for choices lookup\n"
+    yield "static uint32_t duckargs_hash(const char *str, uint32_t seed)\n"
+    yield "{\n"
+    yield "    uint32_t hash = 2166136261u ^ seed;\n\n"
+    yield "    while (*str)\n"
+    yield "    {\n"
+    yield "        hash ^= (unsigned char) *str++;\n"
+    yield "        hash *= 16777619u;\n"
+    yield "    }\n\n"
+    yield "    return hash;\n"
+    yield "}\n"
+
+def _generate_c_opt_lines(arg, desc=None, optarg='optarg', choices_mode=C_CHOICES_LINEAR, prefix=""):
+    # prefix is prepended to variable names, e.g. "opts->" for struct members
+    ret = []
+    var = prefix + arg.var_name
+
+    if desc is None:
+        desc = f"Option '{arg.opt}'"
+
+    if arg.is_flag():
+        ret.append(f"{var} = true;")
+
+    elif ArgType.FLOAT == arg.type:
+        ret.append(f"{var} = strtof({optarg}, &endptr);")
+        ret.append(f"if (endptr == {optarg})")
+        ret.append(f"{{")
+        ret.append(f"    printf(\"{desc} requires a floating-point argument\\n\");")
+        ret.append(f"    return -1;")
+        ret.append(f"}}")
+    elif ArgType.INT == arg.type:
+        ret.append(f"{var} = strtol({optarg}, &endptr, 0);")
+        ret.append(f"if (endptr && (*endptr != '\\0'))")
+        ret.append(f"{{")
+        ret.append(f"    printf(\"{desc} requires an integer argument\\n\");")
+        ret.append(f"    return -1;")
+        ret.append(f"}}")
+    elif ArgType.FILE == arg.type:
+        ret.append(f"{var} = {optarg};")
+    elif ArgType.STRING == arg.type:
+        ret.append(f"{var} = {optarg};")
+
+        if (type(arg.value) == list) and (choices_mode != C_CHOICES_LINEAR):
+            ret.append(f"{var}_index = {arg.var_name}_choice_index({var});")
+            ret.append(f"if ({var}_index < 0)")
+            ret.append(f"{{")
+            ret.append(f"    printf(\"{desc} must be one of {arg.value}\\n\");")
+            ret.append(f"    return -1;")
+            ret.append(f"}}")
+        elif type(arg.value) == list:
+            ret.append(f"for (int i = 0; i < {len(arg.value)}; i++)")
+            ret.append(f"{{")
+            ret.append(f"    if (0 == strcmp({arg.var_name}_choices[i], {var}))")
+            ret.append(f"    {{")
+            ret.append(f"        break;")
+            ret.append(f"    }}")
+            ret.append(f"    if (i == {len(arg.value) - 1})")
+            ret.append(f"    {{")
+            ret.append(f"        printf(\"{desc} must be one of {arg.value}\\n\");")
+            ret.append(f"        return -1;")
+            ret.append(f"    }}")
+            ret.append(f"}}")
+
+    return ret
+
+def _iter_c_positional_code(positionals, use_optind, choices_mode):
+    for i in range(len(positionals)):
+        arg = positionals[i]
+        desc = f"Positional argument #{i + 1} ({arg.var_name})"
+        optarg = "argv[optind]" if use_optind else f"argv[{i + 1}]"
+        yield '\n'.join(["    " + x for x in _generate_c_opt_lines(arg, desc, optarg, choices_mode)])
+
+        if use_optind and (i < (len(positionals) - 1)):
+            yield "\n    optind++;"
+
+        yield "\n\n"
+
+def _iter_c_getopt_code(processed_args, getopt_string, opts, positionals, has_longopts,
+                        choices_mode=C_CHOICES_LINEAR):
+    needs_endptr = False
+
+    for arg in processed_args:
+        if arg.type in [ArgType.INT, ArgType.FLOAT]:
+            needs_endptr = True
+            break
+
+    if needs_endptr:
+        yield "    char *endptr = NULL;\n"
+
+    if opts:
+        yield "    int ch;\n\n"
+
+        if has_longopts:
+            yield f"    while ((ch = getopt_long(argc, argv, \"{getopt_string}\", long_options, NULL)) != -1)\n"
+        else:
+            yield f"    while ((ch = getopt(argc, argv, \"{getopt_string}\")) != -1)\n"
+
+        yield f"    {{\n"
+        yield f"        switch (ch)\n"
+        yield f"        {{\n"
+
+        for arg in opts:
+            yield f"            case '{arg.opt[1]}':\n"
+            yield f"            {{\n"
+
+            yield '\n'.join(["                " + x for x in _generate_c_opt_lines(arg, choices_mode=choices_mode)])
+            yield '\n'
+
+            yield f"                break;\n"
+            yield f"            }}\n"
+
+        yield f"        }}\n"
+        yield f"    }}\n\n"
+
+        if positionals:
+            # Has both positionals and opts
+            yield f"    if (argc < (optind + {len(positionals)}))\n"
+            yield f"    {{\n"
+            yield f"        printf(\"Missing positional arguments\\n\");\n"
+            yield f"        return -1;\n"
+            yield f"    }}\n\n"
+
+            yield from _iter_c_positional_code(positionals, True, choices_mode)
+
+    elif positionals:
+        # Has only positionals and no opts
+        yield f"    if (argc < {len(positionals) + 1})\n"
+        yield f"    {{\n"
+        yield f"        printf(\"Missing positional arguments\\n\");\n"
+        yield f"        return -1;\n"
+        yield f"    }}\n\n"
+
+        yield from _iter_c_positional_code(positionals, False, choices_mode)
+
+    yield f"    return 0;"
+
+# Names of the option types used in the option descriptor table (DUCKARGS_C_PARSER=table)
+_C_OPTION_TYPES = {
+    ArgType.INT: "OPT_INT",
+    ArgType.FLOAT: "OPT_FLOAT",
+    ArgType.STRING: "OPT_STRING",
+    ArgType.FILE: "OPT_STRING"
+}
+
+def _c_option_type(arg):
+    return "OPT_FLAG" if arg.is_flag() else _C_OPTION_TYPES[arg.type]
+
+def _long_option_prefixes(names):
+    """
+    Find every string which getopt_long would accept as a long option name: each
+    complete name, and each prefix of a name. A prefix which is not a complete name,
+    and is shared by more than one name, is ambiguous
+
+    :param list names: long option names, without leading dashes. None for options\
+        which have no long option
+    :return: list of (prefix, option index, ambiguous) tuples
+    :rtype: list
+    """
+    exact = {name: i for i, name in enumerate(names) if name is not None}
+    matches = {}
+
+    for i, name in enumerate(names):
+        if name is None:
+            continue
+
+        for length in range(1, len(name) + 1):
+            matches.setdefault(name[:length], []).append(i)
+
+    ret = []
+    for prefix, indices in matches.items():
+        if prefix in exact:
+            ret.append((prefix, exact[prefix], False))
+        else:
+            ret.append((prefix, indices[0], len(indices) > 1))
+
+    return ret
+
+def _iter_c_option_lookup(opts):
+    """
+    Generate a table mapping short option characters to option indices, and a
+    perfect hash table of long option names and their prefixes
+    """
+    short_opts = [(arg.opt[1], i) for i, arg in enumerate(opts) if arg.opt is not None]
+    if short_opts:
+        yield "\n// Index + 1 of the option for each short option character, 0 if none\n"
+        yield "static const unsigned short short_option_table[128] =\n{\n"
+        yield ",\n".join([f"    ['{ch}'] = {i + 1}" for ch, i in short_opts])
+        yield "\n};\n\n"
+        yield "static int find_short_option(char ch)\n"
+        yield "{\n"
+        yield "    unsigned char index = (unsigned char) ch;\n"
+        yield "    return (index < 128) ? (short_option_table[index] - 1) : -1;\n"
+        yield "}\n"
+
+    names = [None if arg.longopt is None else arg.longopt[2:] for arg in opts]
+    prefixes = _long_option_prefixes(names)
+    if not prefixes:
+        return
+
+    seeds, slots = _build_perfect_hash([p[0] for p in prefixes])
+
+    yield "\n// FNV-1a hash of the first len characters of a string, used for long option lookup\n"
+    yield "static uint32_t option_hash(const char *str, size_t len, uint32_t seed)\n"
+    yield "{\n"
+    yield "    uint32_t hash = 2166136261u ^ seed;\n\n"
+    yield "    while (len-- > 0)\n"
+    yield "    {\n"
+    yield "        hash ^= (unsigned char) *str++;\n"
+    yield "        hash *= 16777619u;\n"
+    yield "    }\n\n"
+    yield "    return hash;\n"
+    yield "}\n\n"
+
+    yield f"// Perfect hash table of long option names and their prefixes, generated by duckargs\n"
+    yield f"static const uint32_t long_option_seeds[{len(seeds)}] =\n{{\n"
+    yield ",\n".join([f"    {s}" for s in seeds])
+    yield f"\n}};\n\n"
+    yield f"static const struct {{ short option; unsigned short length; unsigned char ambiguous; }} " \
+          f"long_option_slots[{len(slots)}] =\n{{\n"
+    yield ",\n".join(["    {-1, 0, 0}" if i is None else
+                       f"    {{{prefixes[i][1]}, {len(prefixes[i][0])}, {int(prefixes[i][2])}}}"
+                       for i in slots])
+    yield f"\n}};\n\n"
+
+    yield f"// Returns the index of the option whose long name, or an unambiguous prefix of it,\n"
+    yield f"// matches the first len characters of name. Returns -2 if name is ambiguous, or -1\n"
+    yield f"// if there is no match\n"
+    yield f"static int find_long_option(const char *name, size_t len)\n"
+    yield f"{{\n"
+    yield f"    uint32_t seed = long_option_seeds[option_hash(name, len, 0) % {len(seeds)}];\n"
+    yield f"    uint32_t slot = option_hash(name, len, seed) % {len(slots)};\n"
+    yield f"    int index = long_option_slots[slot].option;\n\n"
+    yield f"    if ((index < 0) || ((size_t) long_option_slots[slot].length != len) ||\n"
+    yield f"        (0 != memcmp(name, option_table[index].long_name, len)))\n"
+    yield f"    {{\n"
+    yield f"        return -1;\n"
+    yield f"    }}\n\n"
+    yield f"    return long_option_slots[slot].ambiguous ? -2 : index;\n"
+    yield f"}}\n"
+
+def _iter_c_store_option(opts, reentrant=False):
+    # Generates a function which checks and stores the value of any option
+    types = set(_c_option_type(arg) for arg in opts)
+
+    if reentrant:
+        params = "struct program_options *opts, const option_desc_t *opt, char *value"
+        dest = "((char *) opts + opt->offset)"
+    else:
+        params = "const option_desc_t *opt, char *value"
+        dest = "opt->value"
+
+    if types == {"OPT_FLAG"}:
+        yield "\n// Stores the value of an option. Returns 0 if successful\n"
+        yield f"static int store_option({params})\n"
+        yield "{\n"
+        yield "    (void) value;\n"
+        yield f"    *(bool *) {dest} = true;\n"
+        yield "    return 0;\n"
+        yield "}\n"
+        return
+
+    has_choices = any(type(arg.value) == list for arg in opts)
+
+    # Only needed for error messages about invalid values
+    if has_choices or ("OPT_INT" in types) or ("OPT_FLOAT" in types):
+        yield "\nstatic void print_option_name(const option_desc_t *opt)\n"
+        yield "{\n"
+        yield "    if ('\\0' != opt->short_name)\n"
+        yield "    {\n"
+        yield "        printf(\"Option '-%c'\", opt->short_name);\n"
+        yield "    }\n"
+        yield "    else\n"
+        yield "    {\n"
+        yield "        printf(\"Option '--%s'\", opt->long_name);\n"
+        yield "    }\n"
+        yield "}\n"
+
+    yield "\n// Checks and stores the value of an option. Returns 0 if successful\n"
+    yield f"static int store_option({params})\n"
+    yield "{\n"
+
+    if ("OPT_INT" in types) or ("OPT_FLOAT" in types):
+        yield "    char *endptr = NULL;\n\n"
+
+    yield "    switch (opt->type)\n"
+    yield "    {\n"
+
+    if "OPT_FLAG" in types:
+        yield "        case OPT_FLAG:\n"
+        yield "        {\n"
+        yield f"            *(bool *) {dest} = true;\n"
+        yield "            break;\n"
+        yield "        }\n"
+
+    if "OPT_INT" in types:
+        yield "        case OPT_INT:\n"
+        yield "        {\n"
+        yield f"            *(long int *) {dest} = strtol(value, &endptr, 0);\n"
+        yield "            if (endptr && (*endptr != '\\0'))\n"
+        yield "            {\n"
+        yield "                print_option_name(opt);\n"
+        yield "                printf(\" requires an integer argument\\n\");\n"
+        yield "                return -1;\n"
+        yield "            }\n"
+        yield "            break;\n"
+        yield "        }\n"
+
+    if "OPT_FLOAT" in types:
+        yield "        case OPT_FLOAT:\n"
+        yield "        {\n"
+        yield f"            *(float *) {dest} = strtof(value, &endptr);\n"
+        yield "            if (endptr == value)\n"
+        yield "            {\n"
+        yield "                print_option_name(opt);\n"
+        yield "                printf(\" requires a floating-point argument\\n\");\n"
+        yield "                return -1;\n"
+        yield "            }\n"
+        yield "            break;\n"
+        yield "        }\n"
+
+    if "OPT_STRING" in types:
+        yield "        case OPT_STRING:\n"
+        yield "        {\n"
+        yield f"            *(char **) {dest} = value;\n"
+
+        if has_choices:
+            is_choice_args = "opts, value" if reentrant else "value"
+            yield f"            if ((NULL != opt->is_choice) && !opt->is_choice({is_choice_args}))\n"
+            yield "            {\n"
+            yield "                print_option_name(opt);\n"
+            yield "                printf(\" must be one of %s\\n\", opt->choices);\n"
+            yield "                return -1;\n"
+            yield "            }\n"
+
+        yield "            break;\n"
+        yield "        }\n"
+
+    yield "        default:\n"
+    yield "        {\n"
+    yield "            break;\n"
+    yield "        }\n"
+    yield "    }\n\n"
+    yield "    return 0;\n"
+    yield "}\n"
+
+def _iter_c_option_table(opts, choices_mode=C_CHOICES_LINEAR, reentrant=False):
+    """
+    Generate the option descriptor table, and functions to look up options and
+    store option values, used when DUCKARGS_C_PARSER=table or DUCKARGS_C_PARSER=reentrant.
+    If reentrant is True, the table holds the offset of each value in the
+    program_options struct, instead of its address
+    """
+    choice_args = [arg for arg in opts if type(arg.value) == list]
+    choice_params = "struct program_options *opts, const char *value" if reentrant else "const char *value"
+
+    yield "\n// Option descriptor table, generated by duckargs\n"
+    yield "enum option_type\n{\n"
+    yield "    OPT_FLAG,\n"
+    yield "    OPT_INT,\n"
+    yield "    OPT_FLOAT,\n"
+    yield "    OPT_STRING\n"
+    yield "};\n\n"
+    yield "typedef struct\n{\n"
+    yield "    char short_name;          // '\\0' if there is no short option\n"
+    yield "    const char *long_name;    // NULL if there is no long option\n"
+    yield "    enum option_type type;\n"
+
+    if reentrant:
+        yield "    size_t offset;            // Offset of the value in struct program_options\n"
+    else:
+        yield "    void *value;\n"
+
+    if choice_args:
+        yield f"    int (*is_choice)({choice_params});\n"
+        yield "    const char *choices;\n"
+
+    yield "} option_desc_t;\n"
+
+    for arg in choice_args:
+        yield f"\nstatic int {arg.var_name}_is_choice({choice_params})\n"
+        yield f"{{\n"
+
+        if choices_mode == C_CHOICES_LINEAR:
+            if reentrant:
+                yield f"    (void) opts;\n\n"
+
+            yield f"    for (int i = 0; i < {len(arg.value)}; i++)\n"
+            yield f"    {{\n"
+            yield f"        if (0 == strcmp({arg.var_name}_choices[i], value))\n"
+            yield f"        {{\n"
+            yield f"            return 1;\n"
+            yield f"        }}\n"
+            yield f"    }}\n\n"
+            yield f"    return 0;\n"
+        else:
+            index = f"opts->{arg.var_name}_index" if reentrant else f"{arg.var_name}_index"
+            yield f"    {index} = {arg.var_name}_choice_index(value);\n"
+            yield f"    return {index} >= 0;\n"
+
+        yield f"}}\n"
+
+    rows = []
+    for arg in opts:
+        short_name = "'\\0'" if arg.opt is None else f"'{arg.opt[1]}'"
+        long_name = "NULL" if arg.longopt is None else f"\"{arg.longopt[2:]}\""
+        value = f"offsetof(struct program_options, {arg.var_name})" if reentrant else f"&{arg.var_name}"
+        row = f"    {{{short_name}, {long_name}, {_c_option_type(arg)}, {value}"
+
+        if type(arg.value) == list:
+            row += f", {arg.var_name}_is_choice, \"{arg.value}\""
+        elif choice_args:
+            row += ", NULL, NULL"
+
+        rows.append(row + "}")
+
+    yield f"\nstatic const option_desc_t option_table[{len(opts)}] =\n{{\n"
+    yield ",\n".join(rows)
+    yield "\n};\n"
+
+    yield from _iter_c_option_lookup(opts)
+    yield from _iter_c_store_option(opts, reentrant)
+
+def _iter_c_store_positional(positionals, choices_mode=C_CHOICES_LINEAR):
+    # Generates a function which checks and stores the value of a positional
+    # argument in the program_options struct, used when DUCKARGS_C_PARSER=reentrant
+    yield "\n// Checks and stores the value of the positional argument at the given index.\n"
+    yield "// Returns 0 if successful\n"
+    yield "static int store_positional(struct program_options *opts, int index, char *value)\n"
+    yield "{\n"
+
+    if any(arg.type in [ArgType.INT, ArgType.FLOAT] for arg in positionals):
+        yield "    char *endptr = NULL;\n\n"
+
+    yield "    switch (index)\n"
+    yield "    {\n"
+
+    for i, arg in enumerate(positionals):
+        desc = f"Positional argument #{i + 1} ({arg.var_name})"
+        lines = _generate_c_opt_lines(arg, desc, "value", choices_mode, "opts->")
+
+        yield f"        case {i}:\n"
+        yield f"        {{\n"
+        yield '\n'.join(["            " + x for x in lines])
+        yield '\n'
+        yield f"            break;\n"
+        yield f"        }}\n"
+
+    yield "        default:\n"
+    yield "        {\n"
+    yield "            break;\n"
+    yield "        }\n"
+    yield "    }\n\n"
+    yield "    return 0;\n"
+    yield "}\n"
+
+def _iter_c_table_parse_code(opts, positionals, choices_mode=C_CHOICES_LINEAR, reentrant=False):
+    # Generates a single parsing loop which uses the option descriptor table. If
+    # reentrant is True, values are stored in the program_options struct, and argv
+    # is not modified
+    has_short = any(arg.opt is not None for arg in opts)
+    has_long = any(arg.longopt is not None for arg in opts)
+    store_args = "opts, &option_table[index]" if reentrant else "&option_table[index]"
+
+    if any(arg.type in [ArgType.INT, ArgType.FLOAT] for arg in positionals) and not reentrant:
+        yield "    char *endptr = NULL;\n"
+
+    if positionals or not reentrant:
+        yield "    int num_positionals = 0;\n"
+    elif not opts:
+        yield "    (void) opts;\n"
+
+    yield "    int argi;\n\n"
+    yield "    for (argi = 1; argi < argc; argi++)\n"
+    yield "    {\n"
+    yield "        char *arg = argv[argi];\n"
+
+    if opts:
+        yield "        char *value = NULL;\n"
+        yield "        int index;\n"
+
+    yield "\n"
+    yield "        if (('-' != arg[0]) || ('\\0' == arg[1]))\n"
+    yield "        {\n"
+
+    if not reentrant:
+        yield "            // Positional arguments are moved to the start of argv, in order\n"
+        yield "            argv[++num_positionals] = arg;\n"
+    elif positionals:
+        yield "            if (0 != store_positional(opts, num_positionals++, arg))\n"
+        yield "            {\n"
+        yield "                return -1;\n"
+        yield "            }\n\n"
+
+    yield "            continue;\n"
+    yield "        }\n\n"
+    yield "        if ('-' == arg[1])\n"
+    yield "        {\n"
+    yield "            if ('\\0' == arg[2])\n"
+    yield "            {\n"
+    yield "                // All arguments after \"--\" are positional arguments\n"
+    yield "                argi++;\n"
+    yield "                break;\n"
+    yield "            }\n\n"
+
+    if has_long:
+        yield "            char *name = arg + 2;\n"
+        yield "            char *equals = strchr(name, '=');\n"
+        yield "            size_t len = (NULL != equals) ? (size_t) (equals - name) : strlen(name);\n\n"
+        yield "            index = find_long_option(name, len);\n"
+        yield "            if (-2 == index)\n"
+        yield "            {\n"
+        yield "                fprintf(stderr, \"%s: option '%s' is ambiguous\\n\", argv[0], arg);\n"
+        yield "                return -1;\n"
+        yield "            }\n\n"
+        yield "            if (index < 0)\n"
+        yield "            {\n"
+        yield "                fprintf(stderr, \"%s: unrecognized option '%s'\\n\", argv[0], arg);\n"
+        yield "                return -1;\n"
+        yield "            }\n\n"
+        yield "            if (OPT_FLAG == option_table[index].type)\n"
+        yield "            {\n"
+        yield "                if (NULL != equals)\n"
+        yield "                {\n"
+        yield "                    fprintf(stderr, \"%s: option '--%s' doesn't allow an argument\\n\",\n"
+        yield "                            argv[0], option_table[index].long_name);\n"
+        yield "                    return -1;\n"
+        yield "                }\n"
+        yield "            }\n"
+        yield "            else if (NULL != equals)\n"
+        yield "            {\n"
+        yield "                value = equals + 1;\n"
+        yield "            }\n"
+        yield "            else if (argi < (argc - 1))\n"
+        yield "            {\n"
+        yield "                value = argv[++argi];\n"
+        yield "            }\n"
+        yield "            else\n"
+        yield "            {\n"
+        yield "                fprintf(stderr, \"%s: option '--%s' requires an argument\\n\",\n"
+        yield "                        argv[0], option_table[index].long_name);\n"
+        yield "                return -1;\n"
+        yield "            }\n\n"
+        yield f"            if (0 != store_option({store_args}, value))\n"
+        yield "            {\n"
+        yield "                return -1;\n"
+        yield "            }\n\n"
+        yield "            continue;\n"
+    else:
+        yield "            fprintf(stderr, \"%s: unrecognized option '%s'\\n\", argv[0], arg);\n"
+        yield "            return -1;\n"
+
+    yield "        }\n\n"
+
+    if has_short:
+        yield "        // One or more short options, and the last one may have a value\n"
+        yield "        for (char *ch = arg + 1; '\\0' != *ch; ch++)\n"
+        yield "        {\n"
+        yield "            index = find_short_option(*ch);\n"
+        yield "            if (index < 0)\n"
+        yield "            {\n"
+        yield "                fprintf(stderr, \"%s: invalid option -- '%c'\\n\", argv[0], *ch);\n"
+        yield "                return -1;\n"
+        yield "            }\n\n"
+        yield "            if (OPT_FLAG != option_table[index].type)\n"
+        yield "            {\n"
+        yield "                if ('\\0' != ch[1])\n"
+        yield "                {\n"
+        yield "                    value = ch + 1;\n"
+        yield "                }\n"
+        yield "                else if (argi < (argc - 1))\n"
+        yield "                {\n"
+        yield "                    value = argv[++argi];\n"
+        yield "                }\n"
+        yield "                else\n"
+        yield "                {\n"
+        yield "                    fprintf(stderr, \"%s: option requires an argument -- '%c'\\n\", argv[0], *ch);\n"
+        yield "                    return -1;\n"
+        yield "                }\n\n"
+        yield f"                if (0 != store_option({store_args}, value))\n"
+        yield "                {\n"
+        yield "                    return -1;\n"
+        yield "                }\n\n"
+        yield "                break;\n"
+        yield "            }\n\n"
+        yield f"            store_option({store_args}, NULL);\n"
+        yield "        }\n"
+    else:
+        yield "        fprintf(stderr, \"%s: invalid option -- '%c'\\n\", argv[0], arg[1]);\n"
+        yield "        return -1;\n"
+
+    yield "    }\n\n"
+
+    if not reentrant:
+        yield "    while (argi < argc)\n"
+        yield "    {\n"
+        yield "        argv[++num_positionals] = argv[argi++];\n"
+        yield "    }\n\n"
+    elif positionals:
+        yield "    while (argi < argc)\n"
+        yield "    {\n"
+        yield "        if (0 != store_positional(opts, num_positionals++, argv[argi++]))\n"
+        yield "        {\n"
+        yield "            return -1;\n"
+        yield "        }\n"
+        yield "    }\n\n"
+
+    if positionals:
+        yield f"    if (num_positionals < {len(positionals)})\n"
+        yield f"    {{\n"
+        yield f"        printf(\"Missing positional arguments\\n\");\n"
+        yield f"        return -1;\n"
+        yield f"    }}\n\n"
+
+        if not reentrant:
+            yield from _iter_c_positional_code(positionals, False, choices_mode)
+
+    yield f"    return 0;"
+
+def _c_print_fields(processed_args, file_mode=C_FILE_PATH, prefix=""):
+    # Returns a list of (format string, arguments) pairs for printing the value
+    # of each option / positional argument
+    ret = []
+
+    for arg in processed_args:
+        format_arg = ""
+        var_name = ""
+        var = prefix + arg.var_name
+
+        if arg.is_flag():
+            format_arg = "%s"
+            var_name = f"{var} ? \"true\" : \"false\""
+        elif arg.type == ArgType.INT:
+            format_arg = "%ld"
+            var_name = f"{var}"
+        elif arg.type == ArgType.FLOAT:
+            format_arg = "%.4f"
+            var_name = f"{var}"
+        elif (arg.type == ArgType.FILE) and (file_mode == C_FILE_MMAP):
+            format_arg = "%s (%zu bytes)"
+            var_name = f"{var} ? {var} : \"null\", {var}_file.size"
+        elif arg.type in [ArgType.FILE, ArgType.STRING]:
+            format_arg = "%s"
+            var_name = f"{var} ? {var} : \"null\""
+
+        ret.append((f"\"{arg.desc}: {format_arg}\\n\"", var_name))
+
+    return ret
+
+def _iter_c_print_code(processed_args, file_mode=C_FILE_PATH, prefix=""):
+    for fmt, var_name in _c_print_fields(processed_args, file_mode, prefix):
+        yield f"    printf({fmt}, {var_name});\n"
+
+    yield "\n"
+
+def _iter_c_buffered_print_code(processed_args, file_mode=C_FILE_PATH, prefix=""):
+    fields = _c_print_fields(processed_args, file_mode, prefix)
+    if fields:
+        yield from _iter_c_buffered_call("duckargs_write", [f[0] for f in fields], [f[1] for f in fields])
+        yield "\n"
+
+    yield "\n"
+
+def _iter_c_usage_lines(opts, positionals, prefix=""):
+    # Yields (string literal, argument) pairs, where argument is None for
+    # lines with no format specifiers. prefix is prepended to variable names
+    yield "\"\\n\"", None
+    yield "\"USAGE:\\n\\n\"", None
+
+    line = "program_name"
+    if opts:
+        line += " [OPTIONS]"
+
+    if positionals:
+        positional_names = ' '.join([x.var_name for x in positionals])
+        line += f" {positional_names}"
+
+    yield "\"" + line + "\\n\"", None
+
+    if opts:
+        yield "\"\\nOPTIONS:\\n\\n\"", None
+        longest_left_col = 0
+        usage_lines = []
+
+        for opt in opts:
+            left_col = "\"" + ' '.join([x for x in (opt.opt, opt.longopt) if x is not None])
+            var = prefix + opt.var_name
+
+            arg = None
+            right_col = ""
+            right_arg = None
+            if opt.is_flag():
+                right_col = f"{opt.desc} flag\\n\""
+            else:
+                if type(opt.value) == list:
+                    right_col = f"A string value (default: %s)\\n\""
+                    right_arg = f"{var} ? {var} : \"null\""
+                    choices = '|'.join(opt.value)
+                    arg = f" [{choices}]"
+                elif ArgType.INT == opt.type:
+                    right_col = f"An int value (default: %ld)\\n\""
+                    right_arg = f"{var}"
+                    arg = " [int]"
+                elif ArgType.FLOAT == opt.type:
+                    right_col = f"A float value (default: %.2f)\\n\""
+                    right_arg = f"{var}"
+                    arg = " [float]"
+                elif ArgType.STRING == opt.type:
+                    right_col = f"A string value (default: %s)\\n\""
+                    right_arg = f"{var} ? {var} : \"null\""
+                    arg = " [string]"
+                elif ArgType.FILE == opt.type:
+                    right_col = f"A filename (default: %s)\\n\""
+                    right_arg = f"{var} ? {var} : \"null\""
+                    arg = " FILE"
+
+            if arg is not None:
+                left_col += arg
+
+            if len(left_col) > longest_left_col:
+                longest_left_col = len(left_col)
+
+            usage_lines.append((left_col, right_col, right_arg))
+
+        for leftcol, rightcol, rightarg in usage_lines:
+            num_spaces = (longest_left_col + 2) - len(leftcol)
+            yield leftcol + (" " * num_spaces) + rightcol, rightarg
+
+    yield "\"\\n\"", None
+
+def _iter_c_usage_defaults(opts):
+    # Used when DUCKARGS_C_PARSER=reentrant, where there are no global variables
+    # holding default values to print in the usage text
+    if any(not opt.is_flag() for opt in opts):
+        yield "    struct program_options defaults;\n"
+        yield "    init_defaults(&defaults);\n\n"
+
+def _iter_c_usage_code(opts, positionals, prefix=""):
+    for i, (line, arg) in enumerate(_iter_c_usage_lines(opts, positionals, prefix)):
+        if arg is not None:
+            line += ", " + arg
+
+        yield f"    printf({line});" if i == 0 else f"\n    printf({line});"
+
+def _iter_c_buffered_call(func, literals, args):
+    # Generates a single function call, with all string literals concatenated
+    # into a single argument, followed by all other arguments
+    indent = " " * (len(func) + 5)
+
+    yield f"    {func}("
+    for i, literal in enumerate(literals):
+        if i > 0:
+            yield "\n" + indent
+
+        yield literal
+
+    for arg in args:
+        yield ",\n" + indent + arg
+
+    yield ");"
+
+def _iter_c_buffered_usage_code(opts, positionals, prefix=""):
+    lines = list(_iter_c_usage_lines(opts, positionals, prefix))
+    args = [arg for _, arg in lines if arg is not None]
+
+    if args:
+        # Defaults are formatted into a single buffer and written at once
+        yield from _iter_c_buffered_call("duckargs_write", [line for line, _ in lines], args)
+        return
+
+    # Usage text is a single string literal
+    indent = " " * 32
+    yield "    static const char usage[] = "
+    yield ("\n" + indent).join([line for line, _ in lines])
+    yield ";\n\n"
+    yield "    duckargs_write_all(usage, sizeof(usage) - 1);"
+
+def _iter_c_write_functions(formatted):
+    yield "\n// Writes to stdout with a single write() call, unless interrupted\n"
+    yield "static void duckargs_write_all(const char *buf, size_t len)\n"
+    yield "{\n"
+    yield "    fflush(stdout);\n\n"
+    yield "    while (len > 0)\n"
+    yield "    {\n"
+    yield "        ssize_t ret = write(STDOUT_FILENO, buf, len);\n"
+    yield "        if (ret < 0)\n"
+    yield "        {\n"
+    yield "            if (EINTR == errno)\n"
+    yield "            {\n"
+    yield "                continue;\n"
+    yield "            }\n\n"
+    yield "            return;\n"
+    yield "        }\n\n"
+    yield "        buf += ret;\n"
+    yield "        len -= ret;\n"
+    yield "    }\n"
+    yield "}\n"
+
+    if not formatted:
+        return
+
+    yield "\n// Formats text into a single buffer, and writes it to stdout at once\n"
+    yield "static void duckargs_write(const char *fmt, ...)\n"
+    yield "{\n"
+    yield "    char stackbuf[4096];\n"
+    yield "    char *buf = stackbuf;\n"
+    yield "    va_list ap;\n\n"
+    yield "    va_start(ap, fmt);\n"
+    yield "    int len = vsnprintf(buf, sizeof(stackbuf), fmt, ap);\n"
+    yield "    va_end(ap);\n\n"
+    yield "    if (len < 0)\n"
+    yield "    {\n"
+    yield "        return;\n"
+    yield "    }\n\n"
+    yield "    if ((size_t) len >= sizeof(stackbuf))\n"
+    yield "    {\n"
+    yield "        buf = malloc(len + 1);\n"
+    yield "        if (NULL == buf)\n"
+    yield "        {\n"
+    yield "            return;\n"
+    yield "        }\n\n"
+    yield "        va_start(ap, fmt);\n"
+    yield "        vsnprintf(buf, len + 1, fmt, ap);\n"
+    yield "        va_end(ap);\n"
+    yield "    }\n\n"
+    yield "    duckargs_write_all(buf, len);\n\n"
+    yield "    if (buf != stackbuf)\n"
+    yield "    {\n"
+    yield "        free(buf);\n"
+    yield "    }\n"
+    yield "}\n"
+
+def _iter_c_mapped_file_code(file_args):
+    # Generates functions to open all FILE arguments after parsing, and to close them
+    yield C_MAPPED_FILE_CODE
+    yield "\n"
+
+    for arg in file_args:
+        yield f"static mapped_file_t {arg.var_name}_file;\n"
+
+    yield from _iter_c_file_functions(file_args)
+
+def _iter_c_file_functions(file_args, reentrant=False):
+    # Generates functions to open and close all FILE arguments. If reentrant is
+    # True, the paths and mapped files are in the program_options struct
+    params = "struct program_options *opts" if reentrant else "void"
+    close_args = "opts" if reentrant else ""
+    prefix = "opts->" if reentrant else ""
+
+    yield f"\nstatic void close_files({params})\n{{\n"
+    for arg in file_args:
+        yield f"    close_mapped_file(&{prefix}{arg.var_name}_file);\n"
+
+    yield f"}}\n\nstatic int open_files({params})\n{{\n"
+    for arg in file_args:
+        var = prefix + arg.var_name
+        yield f"    if ((NULL != {var}) && (0 != open_mapped_file(&{var}_file, {var})))\n"
+        yield "    {\n"
+        yield f"        close_files({close_args});\n"
+        yield "        return -1;\n"
+        yield "    }\n\n"
+
+    yield "    return 0;\n}\n"
+
+def _iter_c_open_files_code(open_args=""):
+    yield f"    ret = open_files({open_args});\n"
+    yield "    if (0 != ret)\n"
+    yield "    {\n"
+    yield "        return ret;\n"
+    yield "    }\n\n"
+
+def _c_var_decl(arg):
+    # Returns (type name, declarator, default value) for the variable holding
+    # the value of an option / positional argument
+    typename = arg.type
+    varname = arg.var_name
+    value = arg.value
+
+    if arg.is_flag():
+        typename = "bool"
+        value = "false"
+
+    elif arg.type == ArgType.INT:
+        typename = "long int"
+
+    elif arg.type in [ArgType.STRING, ArgType.FILE]:
+        typename = "char"
+        varname = "*" + varname
+        value = f"\"{value}\""
+
+        if arg.type == ArgType.FILE:
+            if arg.value == "FILE":
+                value = "NULL"
+        elif type(arg.value) == list:
+            value = f"\"{arg.value[0]}\""
+
+    return typename, varname, value
+
+def _iter_c_linear_choices(arg):
+    choicestrings = ", ".join([f"\"{c}\"" for c in arg.value])
+    yield f"static char *{arg.var_name}_choices[] = {{{choicestrings}}};\n"
+
+def _iter_c_decls(processed_args, long_opts, choices_mode=C_CHOICES_LINEAR, buffered=False,
+                  formatted_write=False, file_args=()):
+    for arg in processed_args:
+        # Other choices modes generate their own lookup tables
+        if (type(arg.value) == list) and (choices_mode == C_CHOICES_LINEAR):
+            yield from _iter_c_linear_choices(arg)
+
+        typename, varname, value = _c_var_decl(arg)
+        yield f"static {typename} {varname} = {value};\n"
+
+    if long_opts:
+        yield "\nstatic struct option long_options[] =\n{\n"
+        yield "\n".join(["    " + opt for opt in long_opts])
+        yield "\n    {NULL, 0, NULL, 0}\n};\n"
+
+    if buffered:
+        yield from _iter_c_write_functions(formatted_write)
+
+    if file_args:
+        yield from _iter_c_mapped_file_code(file_args)
+
+    if choices_mode == C_CHOICES_LINEAR:
+        return
+
+    choice_args = [arg for arg in processed_args if type(arg.value) == list]
+    if choice_args and (choices_mode == C_CHOICES_HASH):
+        yield from _iter_c_hash_function()
+
+    enum_names = _choice_enum_names(choice_args)
+    for arg in choice_args:
+        yield from _iter_c_choice_lookup(arg, enum_names[arg.var_name], choices_mode)
+
+def _iter_c_struct_decls(processed_args, choices_mode=C_CHOICES_LINEAR, buffered=False,
+                         formatted_write=False, file_args=()):
+    """
+    Generate the program_options struct, which holds the values of all options and
+    positional arguments, and everything else that is declared before it, used when
+    DUCKARGS_C_PARSER=reentrant. Nothing declared here is modified after the program
+    starts, so any number of program_options structs can be parsed into at once
+    """
+    choice_args = [arg for arg in processed_args if type(arg.value) == list]
+    if choices_mode == C_CHOICES_LINEAR:
+        for arg in choice_args:
+            yield from _iter_c_linear_choices(arg)
+
+    if file_args:
+        yield C_MAPPED_FILE_CODE
+
+    yield "\n// Values of all options and positional arguments\n"
+    yield "struct program_options\n{\n"
+
+    for arg in processed_args:
+        typename, varname, _ = _c_var_decl(arg)
+        yield f"    {typename} {varname};\n"
+
+        if (type(arg.value) == list) and (choices_mode != C_CHOICES_LINEAR):
+            yield f"    int {arg.var_name}_index;\n"
+
+    for arg in file_args:
+        yield f"    mapped_file_t {arg.var_name}_file;\n"
+
+    if not processed_args:
+        yield "    char unused;    // C does not allow empty structs\n"
+
+    yield "};\n"
+
+    if buffered:
+        yield from _iter_c_write_functions(formatted_write)
+
+    if file_args:
+        yield from _iter_c_file_functions(file_args, reentrant=True)
+
+    if choices_mode == C_CHOICES_LINEAR:
+        return
+
+    if choice_args and (choices_mode == C_CHOICES_HASH):
+        yield from _iter_c_hash_function()
+
+    enum_names = _choice_enum_names(choice_args)
+    for arg in choice_args:
+        yield from _iter_c_choice_lookup(arg, enum_names[arg.var_name], choices_mode, index_var=False)
+
+def _iter_c_init_defaults_code(processed_args, choices_mode=C_CHOICES_LINEAR, file_args=()):
+    # Generates the body of init_defaults(), which sets every member of a
+    # program_options struct to its default value
+    enum_names = _choice_enum_names([arg for arg in processed_args if type(arg.value) == list])
+    lines = []
+    for arg in processed_args:
+        lines.append(f"opts->{arg.var_name} = {_c_var_decl(arg)[2]};")
+
+        if (type(arg.value) == list) and (choices_mode != C_CHOICES_LINEAR):
+            lines.append(f"opts->{arg.var_name}_index = {enum_names[arg.var_name][0]};")
+
+    for arg in file_args:
+        lines.append(f"opts->{arg.var_name}_file.data = NULL;")
+        lines.append(f"opts->{arg.var_name}_file.size = 0;")
+        lines.append(f"opts->{arg.var_name}_file.mapped = 0;")
+
+    if not lines:
+        lines.append("(void) opts;")
+
+    yield '\n'.join(["    " + x for x in lines])
+
+def _iter_c_comment(args):
+    yield "// Generated by duckargs, invoked with the following arguments:\n// "
+    yield ' '.join(shlex.quote(arg) for arg in args)
+    yield "\n\n"
+
+def iter_c_code(argv=sys.argv, env=None, probe=None):
+    """
+    Process all command line arguments and yield the text of a C program
+    which handles the described command-line options, one chunk at a time
+
+    :param argv: command-line arguments, including program name, or a Spec instance
+    :param dict env: environment variables to read settings from, or a CSettings\
+        instance. If None, os.environ is used
+    :param FileProbe probe: used to check whether values are existing files. If\
+        None, a new FileProbe using the DUCKARGS_PROBE setting is used
+    """
+    settings = env if isinstance(env, CSettings) else CSettings(env)
+    return profiling.profile_chunks('c', settings.env, _iter_c_code(argv, settings, probe))
+
+def _iter_c_code(argv, settings, probe):
+    choices_mode = settings.choices_mode
+    buffered = settings.buffered
+    file_mode = settings.file_mode
+    parser_mode = settings.parser_mode
+    print_values = settings.print_values
+    timing = settings.timing
+
+    if isinstance(argv, Spec):
+        if parser_mode == C_PARSER_GETOPT:
+            for opt in argv:
+                if (opt.opt is None) and (opt.longopt is not None):
+                    raise ValueError(f"long option ({opt.longopt}) is not allowed without "
+                                     "short option")
+
+        processed_args = argv.to_cmdline_opts(_is_c_reserved_str)
+        args = argv.args
+    else:
+        if probe is None:
+            probe = FileProbe.from_env(settings.env)
+
+        # Only the table-driven parsers support long options without a short option
+        processed_args = process_args(_is_c_reserved_str, argv, probe,
+                                      allow_long_only=(parser_mode != C_PARSER_GETOPT))
+        args = argv[1:]
+
+    long_opts = []
+    has_flags = False
+    has_choices = False
+    opts = []
+    positionals = []
+    getopt_chars = []
+
+    for arg in processed_args:
+        if arg.is_positional():
+            positionals.append(arg)
+        else:
+            opts.append(arg)
+
+        if arg.is_flag():
+            has_flags = True
+
+        elif arg.type == ArgType.STRING:
+            choices = arg.value.split(',')
+            if len(choices) > 1:
+                arg.value = choices
+                has_choices = True
+
+        if arg.opt:
+            getopt_chars.append(arg.opt[1])
+            if not arg.is_flag():
+                getopt_chars.append(":")
+
+        if (arg.longopt is not None) and (parser_mode == C_PARSER_GETOPT):
+            longopt = arg.longopt.lstrip('-')
+            opt = arg.opt.lstrip('-')
+            argtype = "no_argument" if arg.is_flag() else "required_argument"
+            long_opts.append(f"{{\"{longopt}\", {argtype}, NULL, '{opt}'}},")
+
+    # Buffered output needs duckargs_write() for usage text with default values,
+    # and for printing values
+    formatted_write = buffered and ((print_values and processed_args) or
+                                    any(not opt.is_flag() for opt in opts))
+
+    file_args = []
+    if file_mode == C_FILE_MMAP:
+        file_args = [arg for arg in processed_args if arg.type == ArgType.FILE]
+
+    includes = []
+    if has_flags:
+        includes.append("stdbool.h")
+
+    # The reentrant parser is table-driven, and never uses getopt, even with no options
+    reentrant = (parser_mode == C_PARSER_REENTRANT)
+    table = reentrant or ((parser_mode == C_PARSER_TABLE) and len(opts) > 0)
+    if reentrant and opts:
+        includes.append("stddef.h")
+
+    if table:
+        if any(opt.longopt is not None for opt in opts):
+            includes += ["string.h", "stdint.h"]
+    elif opts:
+        includes.append("getopt.h")
+
+    if has_choices:
+        includes.append("string.h")
+
+        if choices_mode == C_CHOICES_HASH:
+            includes.append("stdint.h")
+
+    if buffered:
+        includes += ["unistd.h", "errno.h"]
+
+        if formatted_write:
+            includes.append("stdarg.h")
+
+    if file_args:
+        includes += ["string.h", "unistd.h", "errno.h", "fcntl.h", "sys/stat.h", "sys/mman.h"]
+
+    if timing:
+        includes += ["string.h", "time.h", "sys/resource.h"]
+
+    header = []
+    if settings.comment:
+        header.append(_iter_c_comment(args))
+
+    if timing:
+        # clock_gettime and struct timespec are POSIX, and hidden by e.g. -std=c99
+        header.append(["#define _POSIX_C_SOURCE 199309L\n"])
+
+    header.append([f"#include <{name}>\n" for name in dict.fromkeys(includes)])
+
+    # Values are struct members in main, and in print_usage when reentrant
+    prefix = "opts." if reentrant else ""
+    usage_prefix = "defaults." if reentrant else ""
+
+    print_code = ()
+    if print_values:
+        if buffered:
+            print_code = _iter_c_buffered_print_code(processed_args, file_mode, prefix)
+        else:
+            print_code = _iter_c_print_code(processed_args, file_mode, prefix)
+
+    open_files_code = ()
+    close_files_code = ()
+    if file_args:
+        files_arg = "&opts" if reentrant else ""
+        open_files_code = _iter_c_open_files_code(files_arg)
+        close_files_code = (f"    close_files({files_arg});\n",)
+
+    if buffered:
+        usage_code = _iter_c_buffered_usage_code(opts, positionals, usage_prefix)
+    else:
+        usage_code = _iter_c_usage_code(opts, positionals, usage_prefix)
+
+    if reentrant:
+        usage_code = [_iter_c_usage_defaults(opts), usage_code]
+        decls = [_iter_c_struct_decls(processed_args, choices_mode, buffered, formatted_write, file_args)]
+    else:
+        usage_code = [usage_code]
+        decls = [_iter_c_decls(processed_args, long_opts, choices_mode, buffered, formatted_write, file_args)]
+
+    timing_fields = [(), ()]
+    if timing:
+        decls.append((C_TIMING_CODE,))
+        timing_fields = [("    duckargs_timing_start(&argc, argv);\n\n",), ("    duckargs_timing_parsed();\n",)]
+
+    if table:
+        if opts:
+            decls.append(_iter_c_option_table(opts, choices_mode, reentrant))
+
+        if reentrant and positionals:
+            decls.append(_iter_c_store_positional(positionals, choices_mode))
+
+        parsing_code = _iter_c_table_parse_code(opts, positionals, choices_mode, reentrant)
+    else:
+        parsing_code = _iter_c_getopt_code(processed_args, ''.join(getopt_chars), opts,
+                                           positionals, len(long_opts) > 0, choices_mode)
+
+    fields = [
+        (chunk for part in header for chunk in part),
+        (chunk for part in decls for chunk in part),
+        (chunk for part in usage_code for chunk in part),
+        parsing_code,
+        print_code,
+        open_files_code,
+        close_files_code
+    ] + timing_fields
+
+    if reentrant:
+        fields.insert(2, _iter_c_init_defaults_code(processed_args, choices_mode, file_args))
+        yield from iter_template(_C_REENTRANT_SEGMENTS, fields)
+    else:
+        yield from iter_template(_C_SEGMENTS, fields)
+
+def generate_c_code(argv=sys.argv, env=None, probe=None):
+    """
+    Process all command line arguments and return the text of a C program
+    which handles the described command-line options
+
+    :param argv: command-line arguments, including program name, or a Spec instance
+    :param dict env: environment variables to read settings from, or a CSettings\
+        instance. If None, os.environ is used
+    :param FileProbe probe: used to check whether values are existing files. If\
+        None, a new FileProbe using the DUCKARGS_PROBE setting is used
+
+    :return: text of the corresponding C program
+    :rtype: str
+    """
+    return ''.join(iter_c_code(argv, env, probe))
+
+if __name__ == "__main__":
+    # Allows running with 'python -m duckargs.c', which skips the console script wrapper
+    from duckargs.__main__ import duckargs_c
+    duckargs_c()
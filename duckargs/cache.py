@@ -0,0 +1,217 @@
+"""
+Persistent on-disk cache for generated code
+"""
+import os
+import json
+import hashlib
+
+from duckargs import ENV_VARS, generate_code, __version__
+from duckargs.probe import FileProbe, PROBE_ALWAYS, probed_paths
+from duckargs.output import write_atomic
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "duckargs")
+
+# Default size cap for all cache entries combined, in bytes
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# When the size cap is exceeded, entries are evicted until the cache is this
+# fraction of the size cap, so that eviction doesn't happen on every write
+EVICT_TARGET_RATIO = 0.8
+
+ENTRY_SUFFIX = ".cache"
+
+
+def cache_key(target, argv, env=None, probe=None):
+    """
+    Generate a key that uniquely identifies the code generated for a particular
+    target language, set of arguments, environment and duckargs version
+
+    :param str target: target language name
+    :param list argv: command-line arguments, including program name
+    :param dict env: environment variables to read settings from. If None,\
+        os.environ is used
+    :param FileProbe probe: used to check whether values are existing files. If\
+        None, a new FileProbe using the DUCKARGS_PROBE setting is used
+
+    :return: cache key (hex string)
+    :rtype: str
+    """
+    if env is None:
+        env = os.environ
+
+    if probe is None:
+        probe = FileProbe.from_env(env)
+
+    args = list(argv[1:])
+
+    # Checks for existing files can change the generated code. The probing
+    # policy is part of the environment, and if it doesn't allow checking
+    # the filesystem, no files are listed
+    files = []
+    if probe.policy == PROBE_ALWAYS:
+        files = [[path, probe.isfile(path)] for path in probed_paths(args)]
+
+    payload = {
+        'version': __version__,
+        'target': target,
+        'args': args,
+        'env': {name: env.get(name) for name in ENV_VARS},
+        'files': files
+    }
+
+    data = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class GenerationCache(object):
+    """
+    Content-addressed cache of generated code, stored as one file per entry in
+    a directory. When the combined size of all entries exceeds the size cap,
+    least-recently-used entries are deleted.
+    """
+    def __init__(self, path=None, max_size=None):
+        """
+        :param str path: cache directory. If None, DUCKARGS_CACHE_DIR is used if set,\
+            otherwise DEFAULT_CACHE_DIR
+        :param int max_size: size cap in bytes. If None, DUCKARGS_CACHE_SIZE is used if\
+            set, otherwise DEFAULT_MAX_SIZE
+        """
+        if path is None:
+            path = os.environ.get('DUCKARGS_CACHE_DIR', DEFAULT_CACHE_DIR)
+
+        if max_size is None:
+            env_size = os.environ.get('DUCKARGS_CACHE_SIZE', DEFAULT_MAX_SIZE)
+            try:
+                max_size = int(env_size)
+            except ValueError:
+                raise RuntimeError("DUCKARGS_CACHE_SIZE must be an integer")
+
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        # Combined size of all entries, computed on first write
+        self._size = None
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key + ENTRY_SUFFIX)
+
+    def _entries(self):
+        ret = []
+
+        try:
+            with os.scandir(self.path) as it:
+                for entry in it:
+                    if entry.name.endswith(ENTRY_SUFFIX):
+                        st = entry.stat()
+                        ret.append((st.st_mtime, st.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+
+        return ret
+
+    def get(self, key):
+        """
+        Look up generated code in the cache
+
+        :param str key: cache key, from cache_key()
+        :return: generated code, or None if not in the cache
+        :rtype: str
+        """
+        path = self._entry_path(key)
+
+        try:
+            with open(path, 'r', encoding='utf-8') as fh:
+                code = fh.read()
+
+            # Entry modification time is used to track recent use
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return code
+
+    def put(self, key, code):
+        """
+        Add generated code to the cache, evicting least-recently-used entries
+        if the size cap is exceeded
+
+        :param str key: cache key, from cache_key()
+        :param str code: generated code
+        """
+        try:
+            # Concurrent readers never see a partially written entry
+            size = write_atomic(self._entry_path(key), [code])
+        except OSError:
+            # Failing to cache something is not an error
+            return
+
+        if self._size is None:
+            self._size = sum(e[1] for e in self._entries())
+        else:
+            self._size += size
+
+        if self._size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        """
+        Delete least-recently-used entries until the cache is below its size cap
+        """
+        entries = sorted(self._entries())
+        size = sum(e[1] for e in entries)
+        target = self.max_size * EVICT_TARGET_RATIO
+
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+
+            size -= entry_size
+
+        self._size = size
+
+    def clear(self):
+        """
+        Delete all entries
+        """
+        for _, _, path in self._entries():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+        self._size = 0
+
+
+def generate_cached(target, argv, cache):
+    """
+    Generate code for a target language, using a cached result if available
+
+    :param str target: target language name
+    :param list argv: command-line arguments, including program name
+    :param GenerationCache cache: cache instance to use. If None, no cache is used
+
+    :return: generated code
+    :rtype: str
+    """
+    if cache is None:
+        return generate_code(target, argv)
+
+    # Share file checks between the cache key and code generation
+    probe = FileProbe.from_env()
+    key = cache_key(target, argv, probe=probe)
+    code = cache.get(key)
+
+    if code is None:
+        code = generate_code(target, argv, probe=probe)
+        cache.put(key, code)
+
+    return code
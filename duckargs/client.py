@@ -0,0 +1,140 @@
+"""
+Client for a running duckargs generation server (see duckargs.server). This module
+is imported on every invocation of the duckargs commands, so the socket and json
+modules are only imported if a server socket exists.
+"""
+import os
+
+from duckargs import __version__
+
+# Seconds to wait for a response from the server
+DEFAULT_TIMEOUT = 30.0
+
+
+def default_socket_path():
+    """
+    Returns the path of the Unix domain socket used by the generation server,
+    which is DUCKARGS_SOCKET if set, otherwise a per-user path in XDG_RUNTIME_DIR
+    (or /tmp if XDG_RUNTIME_DIR is not set). Since other users can create files in
+    /tmp, the socket is only used if it is owned by the current user, and only the
+    owner can connect to it (see is_trusted_socket)
+
+    :return: socket path
+    :rtype: str
+    """
+    path = os.environ.get('DUCKARGS_SOCKET')
+    if path:
+        return path
+
+    rundir = os.environ.get('XDG_RUNTIME_DIR', '/tmp')
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(rundir, f"duckargs-{uid}.sock")
+
+def is_trusted_socket(path):
+    """
+    Check whether a path is a socket which was created by a generation server run
+    by the current user: it must be a socket, owned by the current user, and must
+    not be accessible by any other user
+
+    :param str path: socket path
+    :return: True if the socket can be trusted
+    :rtype: bool
+    """
+    import stat
+
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+
+    if not stat.S_ISSOCK(st.st_mode):
+        return False
+
+    if hasattr(os, 'getuid') and (st.st_uid != os.getuid()):
+        return False
+
+    return (st.st_mode & 0o077) == 0
+
+def send_request(message, path=None, timeout=DEFAULT_TIMEOUT, check_version=True):
+    """
+    Send a single request to the generation server and wait for the response
+
+    :param dict message: request message
+    :param str path: socket path. If None, default_socket_path() is used
+    :param float timeout: seconds to wait for the server
+    :param bool check_version: if True, responses from a server running a different\
+        version of duckargs are ignored
+
+    :return: response message, or None if the server is not running, can't be\
+        trusted (see is_trusted_socket), or is running a different version
+    :rtype: dict
+    """
+    if path is None:
+        path = default_socket_path()
+
+    if not os.path.exists(path):
+        return None
+
+    if not is_trusted_socket(path):
+        return None
+
+    import json
+    import socket
+
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+
+    data = b''
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+            while not data.endswith(b'\n'):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    return None
+
+                data += chunk
+    except OSError:
+        return None
+
+    response = json.loads(data)
+    if check_version and (response.get('version') != __version__):
+        return None
+
+    return response
+
+def generate(target, argv, env_vars, path=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Generate code using the generation server
+
+    :param str target: target language name
+    :param list argv: command-line arguments, including program name
+    :param list env_vars: names of environment variables to pass to the server
+    :param str path: socket path. If None, default_socket_path() is used
+    :param float timeout: seconds to wait for the server
+
+    :return: generated code, or None if the server is not running
+    :rtype: str
+    """
+    message = {
+        'target': target,
+        'argv': list(argv),
+        'env': {name: os.environ[name] for name in env_vars if name in os.environ},
+        'cwd': os.getcwd()
+    }
+
+    response = send_request(message, path, timeout)
+    if response is None:
+        return None
+
+    if response.get('ok'):
+        return response['code']
+
+    if response.get('error_type') == 'RuntimeError':
+        raise RuntimeError(response['error'])
+
+    raise ValueError(response['error'])
@@ -0,0 +1,533 @@
+"""
+Parsing of command-line arguments describing a program, shared by all code generators
+"""
+import sys
+import os
+import re
+import string
+import functools
+import itertools
+
+from duckargs.probe import FileProbe
+from duckargs import profiling
+
+class ArgType(object):
+    """
+    Enumerates all argument types that will be recognized
+    """
+    INT = "int"
+    FLOAT = "float"
+    FILE = "argparse.FileType()"
+    STRING = "str"
+
+
+class TokenClass(object):
+    """
+    Enumerates all kinds of value that classify_token will recognize. Negative
+    numbers are classified the same as positive numbers.
+    """
+    INT = "int"
+    HEX = "hex"
+    FLOAT = "float"
+    FILE = "file"
+    STRING = "string"
+
+
+# Matches exactly the strings accepted by int(), int(x, 16) with a '0x' prefix
+# and float(), so that a token can be classified in a single pass instead of
+# trying each conversion and catching the exception
+_TOKEN_RGX = re.compile(r"""
+    (?P<hex>-?0x(?:_?[0-9a-f])+\s*)
+  | (?P<int>\s*[+-]?\d+(?:_\d+)*\s*)
+  | (?P<float>\s*[+-]?(?:
+        (?:(?:\d+(?:_\d+)*)?\.\d+(?:_\d+)*|\d+(?:_\d+)*\.?)(?:e[+-]?\d+(?:_\d+)*)?
+      | inf(?:inity)?
+      | nan
+    )\s*)
+""", re.VERBOSE | re.IGNORECASE)
+
+_TOKEN_CLASSES = {
+    'hex': TokenClass.HEX,
+    'int': TokenClass.INT,
+    'float': TokenClass.FLOAT
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def classify_token(token):
+    """
+    Decide what kind of value a single command-line argument contains. Results
+    are cached per distinct token.
+
+    :param str token: command-line argument
+    :return: TokenClass value
+    """
+    m = _TOKEN_RGX.fullmatch(token)
+    if m is not None:
+        return _TOKEN_CLASSES[m.lastgroup]
+
+    if token == 'FILE':
+        return TokenClass.FILE
+
+    return TokenClass.STRING
+
+def classify_tokens(tokens):
+    """
+    Classify a list of command-line arguments at once. Each distinct token is
+    only classified once.
+
+    :param tokens: sequence of command-line arguments
+    :return: list of TokenClass values, one for each token
+    :rtype: list
+    """
+    seen = {}
+    ret = []
+
+    for token in tokens:
+        cls = seen.get(token)
+        if cls is None:
+            cls = seen[token] = classify_token(token)
+
+        ret.append(cls)
+
+    return ret
+
+def _is_int(arg):
+    return classify_token(arg) in (TokenClass.INT, TokenClass.HEX)
+
+def infer_type(value, probe=None):
+    """
+    Decide which type an option / positional argument value should have
+
+    :param str value: value given for option / positional argument
+    :param FileProbe probe: used to check whether the value is an existing file.\
+        If None, the filesystem is always checked
+    :return: ArgType value
+    """
+    cls = classify_token(value)
+
+    if (cls == TokenClass.INT) or (cls == TokenClass.HEX):
+        return ArgType.INT
+
+    if cls == TokenClass.FLOAT:
+        return ArgType.FLOAT
+
+    if probe is None:
+        if (cls == TokenClass.FILE) or os.path.isfile(value):
+            return ArgType.FILE
+    elif probe.is_file_value(value):
+        return ArgType.FILE
+
+    return ArgType.STRING
+
+class ParseContext(object):
+    """
+    Holds state shared by all CmdlineOpt instances created by a single call to
+    process_args. Keeping this state out of CmdlineOpt means that arguments
+    can be processed in multiple threads at once.
+    """
+    def __init__(self, probe=None):
+        """
+        :param FileProbe probe: used to check whether values are existing files.\
+            If None, the filesystem is always checked
+        """
+        self.positional_count = 0
+        self.probe = probe
+
+    def next_positional_name(self):
+        """
+        Returns a new variable name for a positional argument whose value
+        can't be used as a variable name
+        """
+        ret = f"positional_arg{self.positional_count}"
+        self.positional_count += 1
+        return ret
+
+class CmdlineOpt(object):
+    """
+    Represents a single option / flag / positional argument parsed from command line arguments
+    """
+
+    # Return values for add_arg
+    SUCCESS = 0
+    SUCCESS_AND_FULL = 1
+    FAILURE = 2
+
+    nonalpha_rgx = re.compile(r"[^0-9a-zA-Z\-\_]")
+
+    def __init__(self):
+        self.value = None
+        self.opt = None
+        self.longopt = None
+        self.type = None
+        self.var_name = None
+        self.desc = None
+
+    def finalize(self, context=None):
+        """
+        Called for final post-processing after all required data for a single
+        CmdlineOpt instance has been collected
+
+        :param ParseContext context: state shared with other CmdlineOpt instances\
+            for the same program. If None, a new ParseContext is used
+        """
+        if context is None:
+            context = ParseContext()
+
+        if self.is_positional():
+            if self.value.isidentifier():
+                self.var_name = self.value
+            else:
+                self.var_name = context.next_positional_name()
+        else:
+            if self.longopt is not None:
+                varname = self.longopt
+            elif self.opt is not None:
+                varname = self.opt
+            else:
+                raise RuntimeError(f"Invalid attribute values for {self.__class__.__name__}")
+
+            self.var_name = varname.lstrip('-').replace('-', '_')
+
+        self.desc = self.var_name
+
+        if self.value is None:
+            return
+
+        self.type = infer_type(self.value, context.probe)
+
+    def add_arg(self, arg, allow_long_only=False):
+        """
+        Process a single argument command-line argument
+
+        :param str arg: the command-line argument to process
+        :param bool allow_long_only: if True, long options without a short option are allowed
+        :return: 0 if success and room for more, 1 if success but no more room, 2 if no room
+        """
+        if arg.startswith('--'):
+            if (self.opt is None) and (not allow_long_only):
+                raise ValueError(f"long option ({arg}) is not allowed without short option")
+
+            if self.longopt is None:
+                self.longopt = self.nonalpha_rgx.sub('-', arg)
+            else:
+                return self.FAILURE
+
+        elif arg.startswith('-') and not _is_int(arg):
+            if len(arg) > 2:
+                raise ValueError(f"short option ({arg}) must have exactly one character after the dash (-)")
+
+            if (self.opt is None) and (self.longopt is None):
+                self.opt = self.nonalpha_rgx.sub('-', arg)
+            else:
+                return self.FAILURE
+        else:
+            if self.value is None:
+                if (self.opt) or (self.longopt) or _is_int(arg):
+                    self.value = arg
+                else:
+                    self.value = arg.replace('-', '_')
+
+            return self.SUCCESS_AND_FULL
+
+        return self.SUCCESS
+
+    def opttext(self):
+        ret = []
+        if self.opt is not None:
+            ret.append(f"'{self.opt}'")
+        if self.longopt is not None:
+            ret.append(f"'{self.longopt}'")
+
+        return ', '.join(ret)
+
+    def is_empty(self):
+        """
+        Returns true if nothing has been set yet
+        """
+        return (self.value is None) and (self.opt is None) and (self.longopt is None)
+
+    def is_flag(self):
+        """
+        Returns true if this is an option with no argument (a flag)
+        """
+        return ((self.opt is not None) or (self.longopt is not None)) and self.value is None
+
+    def is_option(self):
+        """
+        Returns true if this is an option with an argument
+        """
+        return ((self.opt is not None) or (self.longopt is not None)) and self.value is not None
+
+    def is_positional(self):
+        """
+        Returns true if this is a positional argument
+        """
+        return (self.opt is None) and (self.longopt is None) and (self.value is not None)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.opt}, {self.longopt}, {self.value})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class SpecFile(object):
+    """
+    Reads the arguments describing a program from a file, for programs with too many
+    options to pass on the command line. The file contains one argument per line, with
+    no quoting. Leading and trailing whitespace is removed from each line, and blank
+    lines and lines starting with '#' are ignored.
+
+    Iterating over a SpecFile yields a program name followed by the arguments, like
+    sys.argv, so it can be passed anywhere argv is accepted by process_args. Lines are
+    read one at a time, so the file is never held in memory.
+    """
+    # Program name yielded before the arguments
+    PROGRAM_NAME = "duckargs"
+
+    def __init__(self, path):
+        """
+        :param str path: path to spec file, or '-' to read from stdin
+        """
+        self.path = path
+        self.lineno = 0
+        self.num_args = 0
+
+    def location(self):
+        """
+        Returns the file name and line number of the last argument read, for error messages
+        """
+        name = "<stdin>" if self.path == '-' else self.path
+        return f"{name}:{self.lineno}"
+
+    def _iter_lines(self, fh):
+        for lineno, line in enumerate(fh, 1):
+            line = line.strip()
+            if line and not line.startswith('#'):
+                self.lineno = lineno
+                self.num_args += 1
+                yield line
+
+    def __iter__(self):
+        yield self.PROGRAM_NAME
+
+        if self.path == '-':
+            yield from self._iter_lines(sys.stdin)
+        else:
+            with open(self.path, 'r') as fh:
+                yield from self._iter_lines(fh)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.path})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def check_duplicates(opts, locations=None):
+    """
+    Raise an exception if any variable names, short options or long options are
+    defined more than once
+
+    :param list opts: List of CmdlineOpt (or OptSpec) instances
+    :param list locations: where each option in opts was defined, as a string to\
+        prefix error messages with. If None, error messages have no prefix
+    """
+    seen_attr_names = {}
+    seen_opt_names = {}
+    seen_longopt_names = {}
+
+    for i, o in enumerate(opts):
+        prefix = "" if locations is None else f"{locations[i]}: "
+
+        if o.var_name in seen_attr_names:
+            raise ValueError(f"{prefix}Option '{o.var_name}' was defined more than once")
+        else:
+            seen_attr_names[o.var_name] = None
+
+        if o.opt is not None:
+            if o.opt in seen_opt_names:
+                raise ValueError(f"{prefix}Short option '{o.opt}' was defined more than once")
+            else:
+                seen_opt_names[o.opt] = None
+
+        if o.longopt is not None:
+            if o.longopt in seen_longopt_names:
+                raise ValueError(f"{prefix}Long option '{o.longopt}' was defined more than once")
+            else:
+                seen_longopt_names[o.opt] = None
+
+def _read_spec_file(spec_file, allow_long_only):
+    # Same as the loop in process_args, but also returns where each option was
+    # defined, and adds the location to error messages
+    ret = []
+    locations = []
+    curr = CmdlineOpt()
+    start = None
+
+    try:
+        for arg in itertools.islice(spec_file, 1, None):
+            if start is None:
+                start = spec_file.location()
+
+            status = curr.add_arg(arg, allow_long_only)
+            if status != CmdlineOpt.SUCCESS:
+                ret.append(curr)
+                locations.append(start)
+                curr = CmdlineOpt()
+                start = None
+
+                if status == CmdlineOpt.FAILURE:
+                    start = spec_file.location()
+                    curr.add_arg(arg, allow_long_only)
+    except ValueError as e:
+        raise ValueError(f"{spec_file.location()}: {e}") from None
+
+    if not curr.is_empty():
+        ret.append(curr)
+        locations.append(start)
+
+    return ret, locations
+
+def process_args(reserved_str_check, argv=sys.argv, probe=None, allow_long_only=False):
+    """
+    Process all command line arguments and return a list of CmdlineOpt instances
+
+    :param reserved_str_check: function that returns True if a variable name is\
+        a reserved word in the target language. If None, no names are changed
+    :param argv: command-line arguments, including program name, or a SpecFile\
+        instance to read arguments from
+    :param FileProbe probe: used to check whether values are existing files. If\
+        None, a new FileProbe which always checks the filesystem is used
+    :param bool allow_long_only: if True, long options without a short option are allowed
+
+    :return: List of CmdlineOpt instances
+    """
+    if probe is None:
+        probe = FileProbe()
+
+    ret = []
+    locations = None
+    context = ParseContext(probe)
+    curr = CmdlineOpt()
+
+    if isinstance(argv, SpecFile):
+        # Number of arguments is not known until the whole file has been read
+        with profiling.phase(profiling.PHASE_TOKENIZE, 0):
+            ret, locations = _read_spec_file(argv, allow_long_only)
+
+        profiling.add_calls(profiling.PHASE_TOKENIZE, argv.num_args)
+    else:
+        with profiling.phase(profiling.PHASE_TOKENIZE, len(argv) - 1):
+            for arg in argv[1:]:
+                status = curr.add_arg(arg, allow_long_only)
+                if status != CmdlineOpt.SUCCESS:
+                    ret.append(curr)
+                    curr = CmdlineOpt()
+
+                    if status == CmdlineOpt.FAILURE:
+                        curr.add_arg(arg, allow_long_only)
+
+            if not curr.is_empty():
+                ret.append(curr)
+
+    # Check all values that might be files at once, before finalizing
+    values = [o.value for o in ret if o.value is not None]
+    with profiling.phase(profiling.PHASE_PROBE, len(values)):
+        probe.prefetch(v for v, c in zip(values, classify_tokens(values)) if c == TokenClass.STRING)
+
+    with profiling.phase(profiling.PHASE_FINALIZE, len(ret)):
+        for o in ret:
+            o.finalize(context)
+
+    with profiling.phase(profiling.PHASE_CHECK_DUPLICATES):
+        check_duplicates(ret, locations)
+
+    if reserved_str_check is not None:
+        with profiling.phase(profiling.PHASE_RENAME_RESERVED):
+            rename_reserved(ret, reserved_str_check)
+
+    return ret
+
+def rename_reserved(opts, reserved_str_check):
+    """
+    Change variable names that are reserved words in the target language
+
+    :param list opts: List of CmdlineOpt instances
+    :param reserved_str_check: function that returns True if a variable name is\
+        a reserved word in the target language
+    """
+    for o in opts:
+        if reserved_str_check(o.var_name):
+            # If var_name is a reserved word for generated language, append 'val'.
+            # So if you pass '-i --int', for example, the var name will be 'intval'
+            o.var_name += "val"
+
+def split_template(template):
+    """
+    Split a str.format template with numbered fields into literal text and field
+    numbers, so that it can be filled in with iter_template
+
+    :param str template: template text, with fields like '{0}'
+    :return: list of literal strings and int field numbers, in order
+    :rtype: list
+    """
+    ret = []
+    for literal, field, _, _ in string.Formatter().parse(template):
+        if literal:
+            ret.append(literal)
+
+        if field is not None:
+            ret.append(int(field))
+
+    return ret
+
+def iter_template(segments, fields):
+    """
+    Fill in a template split by split_template, yielding one chunk of text at a
+    time instead of building the whole result in memory
+
+    :param list segments: template segments returned by split_template
+    :param list fields: one iterable of strings for each template field. Each\
+        iterable is only consumed when its field is reached
+    """
+    for segment in segments:
+        if isinstance(segment, int):
+            yield from fields[segment]
+        else:
+            yield segment
+
+def _get_env_int(env, name, default=1):
+    """
+    Read an integer setting from environment variables
+
+    :param dict env: environment variables
+    :param str name: environment variable name
+    :param default: value to use if the variable is not set
+
+    :return: integer value of the setting
+    :rtype: int
+    """
+    try:
+        return int(env.get(name, default))
+    except ValueError:
+        raise RuntimeError(f"{name} must be an integer")
+
+def _get_env_choice(env, name, choices, default):
+    """
+    Read a setting that must be one of a fixed set of strings from environment variables
+
+    :param dict env: environment variables
+    :param str name: environment variable name
+    :param choices: sequence of allowed values
+    :param str default: value to use if the variable is not set
+
+    :return: value of the setting
+    :rtype: str
+    """
+    value = env.get(name, default)
+    if value not in choices:
+        raise RuntimeError(f"{name} must be one of {list(choices)}")
+
+    return value
@@ -0,0 +1,79 @@
+"""
+Writing generated code to files
+"""
+import os
+import uuid
+
+# Permission bits for new files, before applying the umask
+DEFAULT_FILE_MODE = 0o666
+
+# Flags for creating temporary files, as used by tempfile.mkstemp
+_TEMP_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_NOFOLLOW', 0) | \
+              getattr(os, 'O_CLOEXEC', 0) | getattr(os, 'O_BINARY', 0)
+
+# Number of names to try before giving up on creating a temporary file
+_TEMP_ATTEMPTS = 100
+
+
+def _existing_file_mode(path):
+    # Permissions of the file being replaced, or None if there is no such file
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return None
+
+def _create_temp_file(dirname):
+    # Like tempfile.mkstemp, but created with DEFAULT_FILE_MODE, so that the kernel
+    # applies the umask just as open() would. The umask is never changed to read it,
+    # since that would affect files created by other threads at the same time
+    for _ in range(_TEMP_ATTEMPTS):
+        path = os.path.join(dirname, f".duckargs-{uuid.uuid4().hex}.tmp")
+        try:
+            return os.open(path, _TEMP_FLAGS, DEFAULT_FILE_MODE), path
+        except FileExistsError:
+            continue
+
+    raise FileExistsError(f"No usable temporary file name found in {dirname}")
+
+def write_atomic(path, chunks, mode=None):
+    """
+    Write text to a file, such that other processes see either the old file
+    or the complete new file, but never a partially written file. Text is
+    written to a temporary file in the same directory, which is then renamed.
+    Missing parent directories are created.
+
+    :param str path: file path
+    :param chunks: iterable of strings to write. If an exception is raised while\
+        iterating, the temporary file is deleted and the original file is unchanged
+    :param int mode: permission bits for the file. If None, the permissions of the\
+        existing file are kept, or the default permissions are used for new files
+
+    :return: number of bytes written
+    :rtype: int
+    """
+    dirname = os.path.dirname(path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+
+    if mode is None:
+        mode = _existing_file_mode(path)
+
+    fd, tmppath = _create_temp_file(dirname or '.')
+    size = 0
+
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            for chunk in chunks:
+                data = chunk.encode('utf-8')
+                fh.write(data)
+                size += len(data)
+
+        if mode is not None:
+            os.chmod(tmppath, mode)
+
+        os.replace(tmppath, path)
+    except BaseException:
+        os.unlink(tmppath)
+        raise
+
+    return size
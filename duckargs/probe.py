@@ -0,0 +1,177 @@
+"""
+Checks for existing files, used to decide whether option / positional argument
+values should have the FILE type. Probing the filesystem can be slow (e.g. on
+network filesystems), and makes generated code depend on the current directory,
+so the probing policy can be changed with the DUCKARGS_PROBE environment variable.
+"""
+import os
+import threading
+
+# Values that exist as files get the FILE type, as does the 'FILE' placeholder
+PROBE_ALWAYS = "always"
+
+# Only the 'FILE' placeholder gets the FILE type, the filesystem is never checked
+PROBE_SENTINEL = "sentinel"
+
+# Nothing gets the FILE type, not even the 'FILE' placeholder
+PROBE_NEVER = "never"
+
+PROBE_POLICIES = (PROBE_ALWAYS, PROBE_SENTINEL, PROBE_NEVER)
+
+# Below this many unchecked paths, prefetch() checks paths in the calling thread
+MIN_CONCURRENT_PROBES = 8
+
+# Maximum number of threads used by prefetch()
+MAX_PROBE_THREADS = 16
+
+
+def probe_policy(env=None):
+    """
+    Read the probing policy from the DUCKARGS_PROBE environment variable
+
+    :param dict env: environment variables. If None, os.environ is used
+    :return: probing policy
+    :rtype: str
+    """
+    if env is None:
+        env = os.environ
+
+    policy = env.get('DUCKARGS_PROBE', PROBE_ALWAYS)
+    if policy not in PROBE_POLICIES:
+        raise RuntimeError(f"DUCKARGS_PROBE must be one of {list(PROBE_POLICIES)}")
+
+    return policy
+
+def probed_paths(args):
+    """
+    Returns all paths that may be checked for existing files when processing a
+    list of arguments. Values never start with a dash (unless they are numbers,
+    which are never checked), and positional values have dashes replaced with
+    underscores.
+
+    :param args: command-line arguments, not including program name
+    """
+    for arg in args:
+        if arg.startswith('-'):
+            continue
+
+        yield arg
+        if '-' in arg:
+            yield arg.replace('-', '_')
+
+
+class FileProbe(object):
+    """
+    Checks whether option / positional argument values are existing files,
+    according to a probing policy. Results are cached, so a single instance can
+    be shared by all specs processed in a single run (including from multiple
+    threads) to check each distinct path only once.
+    """
+    def __init__(self, policy=PROBE_ALWAYS, base_dir=None):
+        """
+        :param str policy: one of PROBE_ALWAYS, PROBE_SENTINEL or PROBE_NEVER
+        :param str base_dir: directory that relative paths are relative to. If None,\
+            the current working directory is used
+        """
+        if policy not in PROBE_POLICIES:
+            raise ValueError(f"Invalid probing policy '{policy}', must be one of {list(PROBE_POLICIES)}")
+
+        self.policy = policy
+        self.base_dir = base_dir
+        self._results = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, env=None, base_dir=None):
+        """
+        Create a FileProbe using the probing policy from DUCKARGS_PROBE
+
+        :param dict env: environment variables. If None, os.environ is used
+        :param str base_dir: directory that relative paths are relative to. If None,\
+            the current working directory is used
+
+        :return: new FileProbe instance
+        :rtype: FileProbe
+        """
+        return cls(probe_policy(env), base_dir)
+
+    def _check(self, path):
+        if self.base_dir is not None:
+            path = os.path.join(self.base_dir, path)
+
+        return os.path.isfile(path)
+
+    def isfile(self, path):
+        """
+        Check whether a path is an existing file. Always returns False unless the
+        probing policy is PROBE_ALWAYS.
+
+        :param str path: path to check
+        :rtype: bool
+        """
+        if self.policy != PROBE_ALWAYS:
+            return False
+
+        with self._lock:
+            ret = self._results.get(path)
+
+        if ret is None:
+            ret = self._check(path)
+            with self._lock:
+                self._results[path] = ret
+
+        return ret
+
+    def is_file_value(self, value):
+        """
+        Decide whether a non-numeric option / positional argument value should
+        have the FILE type
+
+        :param str value: option / positional argument value
+        :rtype: bool
+        """
+        if self.policy == PROBE_NEVER:
+            return False
+
+        if value == 'FILE':
+            return True
+
+        return self.isfile(value)
+
+    def prefetch(self, paths):
+        """
+        Check many paths at once, so later calls to isfile() for those paths don't
+        need to touch the filesystem. When there are many paths, they are checked
+        concurrently, which hides most of the latency of slow filesystems.
+
+        :param paths: iterable of paths to check
+        """
+        if self.policy != PROBE_ALWAYS:
+            return
+
+        with self._lock:
+            todo = list(dict.fromkeys(p for p in paths if p not in self._results))
+
+        if len(todo) < MIN_CONCURRENT_PROBES:
+            results = [self._check(p) for p in todo]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+
+            workers = min(MAX_PROBE_THREADS, len(todo))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self._check, todo))
+
+        with self._lock:
+            self._results.update(zip(todo, results))
+
+    def __getstate__(self):
+        with self._lock:
+            results = dict(self._results)
+
+        return {'policy': self.policy, 'base_dir': self.base_dir, 'results': results}
+
+    def __setstate__(self, state):
+        self.policy = state['policy']
+        self.base_dir = state['base_dir']
+        self._results = state['results']
+        self._lock = threading.Lock()
@@ -0,0 +1,262 @@
+"""
+Phase-level profiling of code generation. Disabled unless DUCKARGS_PROFILE is set,
+or a hook has been added with add_hook
+"""
+import sys
+import time
+import threading
+import contextlib
+
+# Phases timed while generating code
+PHASE_TOKENIZE = "tokenize"                  # CmdlineOpt.add_arg, for each argument
+PHASE_PROBE = "probe"                        # checking which values are existing files
+PHASE_FINALIZE = "finalize"                  # type inference and naming, for each option
+PHASE_CHECK_DUPLICATES = "check_duplicates"
+PHASE_RENAME_RESERVED = "rename_reserved"
+PHASE_EMIT = "emit"                          # generating code, excluding all other phases
+
+# Returned by phase() when profiling is disabled
+_NULL_PHASE = contextlib.nullcontext()
+
+# Profile for the generation running in the current thread, if any
+_local = threading.local()
+
+# List of (function, trace memory) tuples
+_hooks = []
+
+
+class Profile(object):
+    """
+    Records the time taken by, number of calls to, and memory allocated by, each
+    phase of a single generation. Time and memory are exclusive: when one phase
+    runs inside another, it is only counted for the inner phase.
+    """
+    def __init__(self, target, trace_memory=False):
+        """
+        :param str target: target language name
+        :param bool trace_memory: if True, memory allocated in each phase is\
+            measured with tracemalloc, which makes everything much slower
+        """
+        self.target = target
+        self.trace_memory = trace_memory
+        self.phases = {}
+        self.error = None
+        self.peak_bytes = None
+        self._stack = []
+        self._started_tracing = False
+        self._start_time = None
+        self._elapsed = None
+
+    def _traced_bytes(self):
+        if not self.trace_memory:
+            return 0
+
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[0]
+
+    def start(self):
+        """
+        Start timing the generation, and start tracing memory allocations if needed
+        """
+        if self.trace_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            elif hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+
+        self._start_time = time.perf_counter()
+
+    def finish(self, error=None):
+        """
+        Stop timing the generation
+
+        :param Exception error: exception raised by the generation, if any
+        """
+        self._elapsed = time.perf_counter() - self._start_time
+
+        if error is not None:
+            self.error = f"{error.__class__.__name__}: {error}"
+
+        if self.trace_memory:
+            import tracemalloc
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            if self._started_tracing:
+                tracemalloc.stop()
+
+    def _stats(self, name):
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = {'seconds': 0.0, 'calls': 0}
+            if self.trace_memory:
+                stats['alloc_bytes'] = 0
+
+        return stats
+
+    def add_calls(self, name, calls):
+        """
+        Count more calls to a phase, for phases where the number of calls is not
+        known until the phase is finished
+
+        :param str name: phase name
+        :param int calls: number of calls to add
+        """
+        self._stats(name)['calls'] += calls
+
+    @contextlib.contextmanager
+    def phase(self, name, calls=1):
+        """
+        Context manager which times one phase of the generation
+
+        :param str name: phase name
+        :param int calls: number of calls to count for this phase
+        """
+        # [start time, start memory, time in nested phases, memory in nested phases]
+        frame = [time.perf_counter(), self._traced_bytes(), 0.0, 0]
+        self._stack.append(frame)
+
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            allocated = self._traced_bytes() - frame[1]
+
+            stats = self._stats(name)
+            stats['seconds'] += elapsed - frame[2]
+            stats['calls'] += calls
+            if self.trace_memory:
+                stats['alloc_bytes'] += allocated - frame[3]
+
+            if self._stack:
+                self._stack[-1][2] += elapsed
+                self._stack[-1][3] += allocated
+
+    def to_dict(self):
+        """
+        Returns a dict representation of this Profile, which can be converted to JSON
+        """
+        ret = {
+            'target': self.target,
+            'seconds': self._elapsed,
+            'phases': self.phases
+        }
+
+        if self.peak_bytes is not None:
+            ret['peak_bytes'] = self.peak_bytes
+
+        if self.error is not None:
+            ret['error'] = self.error
+
+        return ret
+
+
+def add_hook(func, trace_memory=False):
+    """
+    Add a function to be called with the profile of every generation, which enables
+    profiling even if DUCKARGS_PROFILE is not set
+
+    :param func: function which accepts a dict, as returned by Profile.to_dict
+    :param bool trace_memory: if True, memory allocated in each phase is also measured
+    """
+    _hooks.append((func, trace_memory))
+
+def remove_hook(func):
+    """
+    Remove a function added with add_hook
+
+    :param func: function to remove
+    """
+    _hooks[:] = [h for h in _hooks if h[0] != func]
+
+def phase(name, calls=1):
+    """
+    Returns a context manager which times one phase of the generation running in the
+    current thread. When profiling is disabled, this does nothing.
+
+    :param str name: phase name
+    :param int calls: number of calls to count for this phase
+    """
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        return _NULL_PHASE
+
+    return profile.phase(name, calls)
+
+def add_calls(name, calls):
+    """
+    Count more calls to one phase of the generation running in the current thread.
+    When profiling is disabled, this does nothing.
+
+    :param str name: phase name
+    :param int calls: number of calls to add
+    """
+    profile = getattr(_local, 'profile', None)
+    if profile is not None:
+        profile.add_calls(name, calls)
+
+def _write_record(record, destination):
+    import json
+    line = json.dumps(record) + "\n"
+
+    if destination == '-':
+        sys.stderr.write(line)
+    else:
+        # A single write in append mode, so lines from parallel processes aren't mixed
+        with open(destination, 'a') as fh:
+            fh.write(line)
+
+def _iter_profiled(profile, chunks, destination, hooks):
+    profile.start()
+    error = None
+    it = iter(chunks)
+
+    try:
+        while True:
+            previous = getattr(_local, 'profile', None)
+            _local.profile = profile
+
+            try:
+                with profile.phase(PHASE_EMIT):
+                    chunk = next(it)
+            except StopIteration:
+                break
+            finally:
+                _local.profile = previous
+
+            yield chunk
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        profile.finish(error)
+        record = profile.to_dict()
+
+        if destination:
+            _write_record(record, destination)
+
+        for func, _ in hooks:
+            func(record)
+
+def profile_chunks(target, env, chunks):
+    """
+    Profile a generation, if profiling is enabled. When the generation is finished,
+    its profile is written as a single line of JSON to the file named by
+    DUCKARGS_PROFILE ('-' for stderr), and passed to all hooks.
+
+    :param str target: target language name
+    :param dict env: environment variables to read settings from
+    :param chunks: iterator which yields chunks of generated code
+    :return: iterator which yields the same chunks
+    """
+    destination = env.get('DUCKARGS_PROFILE')
+    if (not destination) and (not _hooks):
+        return chunks
+
+    from duckargs.core import _get_env_int
+
+    hooks = list(_hooks)
+    trace_memory = any(h[1] for h in hooks) or (_get_env_int(env, 'DUCKARGS_PROFILE_MEMORY', 0) > 0)
+
+    return _iter_profiled(Profile(target, trace_memory), chunks, destination, hooks)
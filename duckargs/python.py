@@ -0,0 +1,1015 @@
+"""
+Python code generator
+"""
+import sys
+import os
+import shlex
+from keyword import kwlist
+
+from duckargs.core import (ArgType, TokenClass, classify_token, process_args, split_template,
+                           iter_template, _get_env_int, _get_env_choice)
+from duckargs.spec import Spec
+from duckargs.probe import FileProbe
+from duckargs import profiling
+
+PYTHON_TEMPLATE = """{0}{4}import argparse
+{3}
+{5}def main():
+    parser = argparse.ArgumentParser(description='A command-line program generated by duckargs',
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+{1}
+    args = parser.parse_args(){6}{2}
+
+if __name__ == "__main__":
+    main()
+"""
+
+_PYTHON_SEGMENTS = split_template(PYTHON_TEMPLATE)
+
+# Used when DUCKARGS_PY_MODULE=1 or DUCKARGS_PY_MODULE=lazy. The parser is built once,
+# and the program can be imported and run any number of times with parse() and run()
+PYTHON_MODULE_TEMPLATE = """{0}{1}import argparse
+{2}
+def build_parser():
+    parser = argparse.ArgumentParser(description='A command-line program generated by duckargs',
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+{3}
+    return parser
+
+{4}
+def parse(argv=None):
+    \"\"\"
+    Parse command-line arguments. Like argparse, prints a message and raises
+    SystemExit if the arguments are invalid, or if --help is given
+
+    :param list argv: arguments to parse, not including the program name. If None,\\
+        sys.argv[1:] is used
+    :return: Namespace instance holding all argument values
+    \"\"\"
+    return {5}.parse_args(argv)
+
+def run(argv=None):
+    \"\"\"
+    Parse command-line arguments, and run the program
+
+    :param list argv: arguments to parse, not including the program name. If None,\\
+        sys.argv[1:] is used
+    \"\"\"
+    args = parse(argv){6}{7}
+
+{8}def main():
+    run()
+
+if __name__ == "__main__":
+    main()
+"""
+
+_PYTHON_MODULE_SEGMENTS = split_template(PYTHON_MODULE_TEMPLATE)
+
+# Builds the parser when the generated module is imported (DUCKARGS_PY_MODULE=1)
+_PYTHON_MODULE_PARSER = """# Argument parser, built once when this module is imported
+PARSER = build_parser()
+"""
+
+# Builds the parser when it is first needed (DUCKARGS_PY_MODULE=lazy)
+_PYTHON_MODULE_LAZY_PARSER = """# Argument parser, built by get_parser() when it is first needed
+PARSER = None
+
+def get_parser():
+    \"\"\"
+    Return the argument parser, building it on the first call
+    \"\"\"
+    global PARSER
+    if PARSER is None:
+        PARSER = build_parser()
+
+    return PARSER
+"""
+
+# Values for DUCKARGS_PY_MODULE
+PY_MODULE_OFF = "0"      # the parser is built and used by main()
+PY_MODULE_EAGER = "1"    # the parser is built when the module is imported
+PY_MODULE_LAZY = "lazy"  # the parser is built on first use
+
+PY_MODULE_MODES = (PY_MODULE_OFF, PY_MODULE_EAGER, PY_MODULE_LAZY)
+
+# Values for DUCKARGS_PY_FILE
+PY_FILE_OPEN = "open"
+PY_FILE_LAZY = "lazy"
+
+PY_FILE_MODES = (PY_FILE_OPEN, PY_FILE_LAZY)
+
+# Used for FILE arguments when DUCKARGS_PY_FILE=lazy. Files are checked for existence
+# when arguments are parsed, but not opened until they are used
+PYTHON_LAZY_FILE_CLASS = """
+# Size of chunks read by LazyFile.chunks, in bytes
+CHUNK_SIZE = 1024 * 1024
+
+
+class LazyFile(object):
+    \"\"\"
+    A file named on the command line, which is not opened until it is used. '-' means stdin
+    \"\"\"
+    def __init__(self, path):
+        if path != '-':
+            try:
+                os.stat(path)
+            except OSError as e:
+                raise ArgumentTypeError(f"can't open '{path}': {e}")
+
+        self.path = path
+
+    def __fspath__(self):
+        return self.path
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.path!r})"
+
+    def open(self, mode='r', **kwargs):
+        \"\"\"
+        Open the file, like the built-in open(). Closing the returned file does not close stdin
+        \"\"\"
+        if self.path == '-':
+            return open(sys.stdin.fileno(), mode, closefd=False, **kwargs)
+
+        return open(self.path, mode, **kwargs)
+
+    def mmap(self):
+        \"\"\"
+        Map the whole file into memory, read-only, so it can be accessed without copying.
+        Raises OSError if the file can't be mapped, e.g. if it is a pipe
+
+        :return: mmap.mmap object, or empty bytes if the file is empty
+        \"\"\"
+        import mmap
+        import stat
+
+        with self.open('rb', buffering=0) as fh:
+            st = os.fstat(fh.fileno())
+            if stat.S_ISREG(st.st_mode) and (st.st_size == 0):
+                # Empty files can't be mapped
+                return b''
+
+            return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def chunks(self, size=CHUNK_SIZE):
+        \"\"\"
+        Read the whole file, including pipes and stdin, in chunks of up to 'size' bytes.
+        Each chunk is a memoryview of the same buffer, which is overwritten by the next
+        chunk, so use bytes(chunk) to keep a chunk
+        \"\"\"
+        buf = bytearray(size)
+        view = memoryview(buf)
+
+        with self.open('rb', buffering=0) as fh:
+            while True:
+                count = fh.readinto(buf)
+                if not count:
+                    break
+
+                yield view[:count]
+"""
+
+# Modules imported by PYTHON_LAZY_FILE_CLASS, when used with PYTHON_TEMPLATE
+_PYTHON_LAZY_FILE_IMPORTS = """import os
+import sys
+"""
+
+# Used when DUCKARGS_TIMING=1, before any other imports, so that the reported
+# times include importing argparse
+_PYTHON_TIMING_START = """import time
+
+# Value of time.perf_counter() when the program started, used by --duckargs-timing
+START_TIME = time.perf_counter()
+
+"""
+
+# Used when DUCKARGS_TIMING=1. Adds hidden options which report performance information
+# to stderr: --duckargs-timing reports argument parsing time, total run time and peak RSS,
+# and --duckargs-profile runs main with cProfile
+PYTHON_TIMING_CODE = """
+# Number of functions listed by --duckargs-profile
+PROFILE_LINES = 30
+
+# Value of time.perf_counter() when argument parsing finished
+PARSED_TIME = None
+
+
+def duckargs_timing_parsed():
+    global PARSED_TIME
+    PARSED_TIME = time.perf_counter()
+
+
+def print_timing():
+    \"\"\"
+    Print argument parsing time, total run time and peak RSS to stderr
+    \"\"\"
+    end_time = time.perf_counter()
+    parsed_time = end_time if PARSED_TIME is None else PARSED_TIME
+    peak_rss = "unknown"
+
+    try:
+        import resource
+    except ImportError:
+        pass
+    else:
+        # ru_maxrss is in bytes on macOS, and in kilobytes everywhere else
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            maxrss //= 1024
+
+        peak_rss = f"{maxrss} KB"
+
+    print(f"duckargs timing: parsing {(parsed_time - START_TIME) * 1000:.3f} ms, "
+          f"total {(end_time - START_TIME) * 1000:.3f} ms, peak RSS {peak_rss}", file=sys.stderr)
+
+
+def duckargs_timing(func):
+    \"\"\"
+    Decorator for main, which handles the hidden --duckargs-timing and --duckargs-profile
+    options. Both report to stderr when main returns or exits
+    \"\"\"
+    def wrapper():
+        profiler = None
+        if '--duckargs-profile' in sys.argv[1:]:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        try:
+            func()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                import pstats
+                pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(PROFILE_LINES)
+
+            if '--duckargs-timing' in sys.argv[1:]:
+                print_timing()
+
+    return wrapper
+"""
+
+# Hidden options added when DUCKARGS_TIMING=1
+PY_TIMING_OPTION = '--duckargs-timing'
+PY_PROFILE_OPTION = '--duckargs-profile'
+
+# Used when DUCKARGS_FASTPARSE=1. The generated program parses arguments with a small
+# hand-written parser instead of importing argparse, which takes most of the startup time
+# of a small program
+_PYTHON_FASTPARSE_HEADER = """{0}{8}import os
+import sys
+{6}
+
+# Parts of the usage text. The usage text is assembled when it is printed, since it
+# includes the program name
+USAGE_OPTIONALS = {1}
+USAGE_POSITIONALS = {2}
+
+# Help text following the usage text
+HELP = {3}
+
+# (option strings, attribute name, type, default value, choices). Type is None for flags
+OPTIONS = {4}
+
+# (attribute name, type)
+POSITIONALS = {5}
+
+
+"""
+
+PYTHON_FASTPARSE_TEMPLATE = _PYTHON_FASTPARSE_HEADER + """{9}def main():
+    args = parse_args(){10}{7}
+
+if __name__ == "__main__":
+    main()
+"""
+
+_PYTHON_FASTPARSE_SEGMENTS = split_template(PYTHON_FASTPARSE_TEMPLATE)
+
+# Used when DUCKARGS_FASTPARSE=1 and DUCKARGS_PY_MODULE is set. The option tables are
+# always built when the module is imported, so DUCKARGS_PY_MODULE=1 and
+# DUCKARGS_PY_MODULE=lazy generate the same code
+PYTHON_FASTPARSE_MODULE_TEMPLATE = _PYTHON_FASTPARSE_HEADER + """def parse(argv=None):
+    \"\"\"
+    Parse command-line arguments. Like argparse, prints a message and raises
+    SystemExit if the arguments are invalid, or if --help is given
+
+    :param list argv: arguments to parse, not including the program name. If None,\\
+        sys.argv[1:] is used
+    :return: Namespace instance holding all argument values
+    \"\"\"
+    return parse_args(argv)
+
+def run(argv=None):
+    \"\"\"
+    Parse command-line arguments, and run the program
+
+    :param list argv: arguments to parse, not including the program name. If None,\\
+        sys.argv[1:] is used
+    \"\"\"
+    args = parse(argv){10}{7}
+
+{9}def main():
+    run()
+
+if __name__ == "__main__":
+    main()
+"""
+
+_PYTHON_FASTPARSE_MODULE_SEGMENTS = split_template(PYTHON_FASTPARSE_MODULE_TEMPLATE)
+
+# Help text is formatted for an 80-column terminal, the same as argparse would format it
+FASTPARSE_TEXT_WIDTH = 78
+FASTPARSE_MAX_HELP_POSITION = 24
+
+# Type conversion function used by the generated fast parser for each argument type
+_FASTPARSE_TYPES = {
+    ArgType.INT: 'int',
+    ArgType.FLOAT: 'float',
+    ArgType.FILE: 'file_type',
+    ArgType.STRING: 'str'
+}
+
+# Parser used by PYTHON_FASTPARSE_TEMPLATE, which accepts the same arguments, and prints
+# the same usage text and error messages, as argparse
+PYTHON_FASTPARSE_PARSER = """
+HELP_OPTION = (('-h', '--help'), 'help', None, None, None)
+
+# Maximum line length of usage text, the same as argparse uses for an 80-column terminal
+TEXT_WIDTH = 78
+
+
+class ArgumentTypeError(Exception):
+    \"\"\"
+    Raised by type conversion functions, with a complete error message
+    \"\"\"
+
+
+class Namespace(object):
+    \"\"\"
+    Holds parsed argument values as attributes, like argparse.Namespace
+    \"\"\"
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+    def __repr__(self):
+        args = ', '.join(f"{name}={value!r}" for name, value in sorted(self.__dict__.items()))
+        return f"Namespace({args})"
+
+
+def file_type(value):
+    \"\"\"
+    Open a file for reading, like argparse.FileType(). '-' means stdin
+    \"\"\"
+    if value == '-':
+        return sys.stdin
+
+    try:
+        return open(value)
+    except OSError as e:
+        raise ArgumentTypeError(f"can't open '{value}': {e}")
+
+
+def _usage_lines(parts, indent, prefix=None):
+    lines = []
+    line = []
+    line_len = len(indent if prefix is None else prefix) - 1
+
+    for part in parts:
+        if (line_len + 1 + len(part) > TEXT_WIDTH) and line:
+            lines.append(indent + ' '.join(line))
+            line = []
+            line_len = len(indent) - 1
+
+        line.append(part)
+        line_len += len(part) + 1
+
+    if line:
+        lines.append(indent + ' '.join(line))
+
+    if prefix is not None:
+        lines[0] = lines[0][len(indent):]
+
+    return lines
+
+
+def format_usage():
+    \"\"\"
+    Return the usage text, wrapped the same way as argparse wraps it
+    \"\"\"
+    prog = os.path.basename(sys.argv[0])
+    prefix = 'usage: '
+    usage = ' '.join([prog] + USAGE_OPTIONALS + USAGE_POSITIONALS)
+
+    if len(prefix) + len(usage) > TEXT_WIDTH:
+        if len(prefix) + len(prog) <= 0.75 * TEXT_WIDTH:
+            indent = ' ' * (len(prefix) + len(prog) + 1)
+            lines = _usage_lines([prog] + USAGE_OPTIONALS, indent, prefix)
+            lines.extend(_usage_lines(USAGE_POSITIONALS, indent))
+        else:
+            indent = ' ' * len(prefix)
+            lines = _usage_lines(USAGE_OPTIONALS + USAGE_POSITIONALS, indent)
+            if len(lines) > 1:
+                lines = _usage_lines(USAGE_OPTIONALS, indent) + _usage_lines(USAGE_POSITIONALS, indent)
+
+            lines = [prog] + lines
+
+        usage = '\\n'.join(lines)
+
+    return f"{prefix}{usage}\\n"
+
+
+def error(message):
+    \"\"\"
+    Print the usage text and an error message to stderr, and exit with status 2
+    \"\"\"
+    prog = os.path.basename(sys.argv[0])
+    sys.stderr.write(f"{format_usage()}{prog}: error: {message}\\n")
+    sys.exit(2)
+
+
+def _convert(name, kind, value, choices=None):
+    try:
+        ret = kind(value)
+    except ArgumentTypeError as e:
+        error(f"argument {name}: {e}")
+    except (TypeError, ValueError):
+        error(f"argument {name}: invalid {kind.__name__} value: {value!r}")
+
+    if (choices is not None) and (ret not in choices):
+        choices_str = ', '.join(repr(c) for c in choices)
+        error(f"argument {name}: invalid choice: {ret!r} (choose from {choices_str})")
+
+    return ret
+
+
+def _is_negative_number(arg):
+    # Same as the '^-\\d+$|^-\\d*\\.\\d+$' pattern used by argparse
+    whole, dot, fraction = arg[1:].partition('.')
+    if not dot:
+        return whole.isdecimal()
+
+    return ((not whole) or whole.isdecimal()) and fraction.isdecimal()
+
+
+def _find_option(arg, options):
+    # Returns None if arg is a positional argument, otherwise a tuple of (option,
+    # option string, explicit value). Option is None for unrecognized options
+    if (not arg.startswith('-')) or (arg == '-'):
+        return None
+
+    if arg in options:
+        return options[arg], arg, None
+
+    if '=' in arg:
+        option_string, value = arg.split('=', 1)
+        if option_string in options:
+            return options[option_string], option_string, value
+
+    if arg.startswith('--'):
+        # Unique prefixes of long options are accepted
+        prefix, sep, value = arg.partition('=')
+        matches = [(s, value if sep else None) for s in options if s.startswith(prefix)]
+    else:
+        # Short option followed by its value, or by more flags
+        matches = [(s, arg[2:]) for s in options if s == arg[:2]]
+
+    if len(matches) > 1:
+        error(f"ambiguous option: {arg} could match {', '.join(s for s, _ in matches)}")
+
+    if matches:
+        option_string, value = matches[0]
+        return options[option_string], option_string, value
+
+    if _is_negative_number(arg) or (' ' in arg):
+        return None
+
+    return None, arg, None
+
+
+def parse_args(argv=None):
+    \"\"\"
+    Parse command-line arguments, like argparse.ArgumentParser.parse_args
+
+    :param list argv: arguments to parse. If None, sys.argv[1:] is used
+    :return: Namespace instance holding all argument values
+    \"\"\"
+    if argv is None:
+        argv = sys.argv[1:]
+
+    options = {'-h': HELP_OPTION, '--help': HELP_OPTION}
+    values = {}
+
+    for option in OPTIONS:
+        for option_string in option[0]:
+            options[option_string] = option
+
+        values[option[1]] = option[3]
+
+    end = argv.index('--') if '--' in argv else len(argv)
+    found = [_find_option(arg, options) for arg in argv[:end]]
+    positionals = list(POSITIONALS)
+    extras = []
+    last_positional = None
+    i = 0
+
+    while i < len(argv):
+        arg = argv[i]
+        index = i
+        i += 1
+
+        if index == end:
+            # Everything after the first '--' is a positional argument. Like argparse,
+            # the '--' is only dropped if it can be consumed along with a positional
+            if (not positionals) and (last_positional != index - 1):
+                extras.append(arg)
+
+            continue
+
+        if (index < end) and (found[index] is not None):
+            option, option_string, value = found[index]
+            flags = []
+
+            while option is not None:
+                name = '/'.join(option[0])
+
+                if option[2] is not None:
+                    if value is None:
+                        if (i >= end) or (found[i] is not None):
+                            error(f"argument {name}: expected one argument")
+
+                        value = argv[i]
+                        i += 1
+
+                    values[option[1]] = _convert(name, option[2], value, option[4])
+                    break
+
+                flags.append(option)
+                if value is None:
+                    break
+
+                if (option_string[1] == '-') or (not value):
+                    error(f"argument {name}: ignored explicit argument {value!r}")
+
+                # Flags may be combined, e.g. '-abc'
+                option_string = '-' + value[0]
+                if option_string not in options:
+                    error(f"argument {name}: ignored explicit argument {value!r}")
+
+                option = options[option_string]
+                value = value[1:] or None
+
+            if option is None:
+                extras.append(arg)
+
+            for option in flags:
+                if option is HELP_OPTION:
+                    sys.stdout.write(format_usage() + HELP)
+                    sys.exit(0)
+
+                values[option[1]] = True
+
+            continue
+
+        if positionals:
+            last_positional = index
+            name, kind = positionals.pop(0)
+            values[name] = _convert(name, kind, arg)
+        else:
+            extras.append(arg)
+
+    if positionals:
+        error(f"the following arguments are required: {', '.join(p[0] for p in positionals)}")
+
+    if extras:
+        error(f"unrecognized arguments: {' '.join(extras)}")
+
+    return Namespace(**values)
+"""
+
+# Names that can't be used as python variable names, or would hide commonly used builtins
+PYTHON_RESERVED_WORDS = frozenset(kwlist + ['int', 'float', 'bool', 'dict', 'list', 'tuple'])
+
+def _is_python_reserved_str(var_name):
+    return var_name in PYTHON_RESERVED_WORDS
+
+
+class PythonSettings(object):
+    """
+    Settings for generating python code, read from environment variables. Settings
+    are read once when an instance is created, so a single instance can be passed to
+    iter_python_code / generate_python_code in place of env to generate many programs
+    without reading them again.
+    """
+    __slots__ = ('env', 'print_values', 'comment', 'lazy_files', 'timing', 'fastparse', 'module_mode')
+
+    def __init__(self, env=None):
+        """
+        :param dict env: environment variables to read settings from. If None,\
+            os.environ is used
+        """
+        if env is None:
+            env = os.environ
+
+        self.env = env
+        self.print_values = _get_env_int(env, 'DUCKARGS_PRINT') > 0
+        self.comment = _get_env_int(env, 'DUCKARGS_COMMENT') > 0
+        self.lazy_files = _get_env_choice(env, 'DUCKARGS_PY_FILE', PY_FILE_MODES, PY_FILE_OPEN) == PY_FILE_LAZY
+        self.timing = _get_env_int(env, 'DUCKARGS_TIMING', 0) > 0
+        self.fastparse = _get_env_int(env, 'DUCKARGS_FASTPARSE', 0) > 0
+        self.module_mode = _get_env_choice(env, 'DUCKARGS_PY_MODULE', PY_MODULE_MODES, PY_MODULE_OFF)
+
+
+def _python_choices(opt):
+    # Returns the list of choices for a string option with comma-separated choices, or None
+    if opt.is_option() and (opt.type == ArgType.STRING):
+        choices = opt.value.split(',')
+        if len(choices) > 1:
+            return choices
+
+    return None
+
+def _python_default(opt):
+    # Returns the default value of an option, as python code
+    if opt.type == ArgType.STRING:
+        choices = _python_choices(opt)
+        value = f"'{choices[0]}'" if choices else f"'{opt.value}'"
+    elif opt.type == ArgType.FILE:
+        value = f"'{opt.value}'"
+    else:
+        value = opt.value
+
+    return "None" if opt.type is ArgType.FILE else str(value)
+
+def _python_help_text(opt):
+    if opt.type is not None:
+        if opt.type == ArgType.INT:
+            helptext = "an int value"
+        elif opt.type == ArgType.FLOAT:
+            helptext = "a float value"
+        elif opt.type == ArgType.FILE:
+            helptext = "a filename"
+        elif opt.type == ArgType.STRING:
+            helptext = "a string"
+        else:
+            raise RuntimeError('Invalid type setting')
+
+    elif opt.is_flag():
+        helptext = f"{opt.desc} flag"
+
+    return helptext
+
+def _python_type(opt, file_type):
+    return file_type if opt.type == ArgType.FILE else opt.type
+
+def _generate_python_code_line(opt, file_type=ArgType.FILE):
+    """
+    Generate the 'parser.add_argument(...)' line for an option
+
+    :param str file_type: type conversion function used for FILE arguments
+    :return: Line of python code to add this option to the arg parser
+    :rtype: str
+    """
+    if opt.is_flag():
+        funcargs = opt.opttext() + ", action='store_true'"
+
+    elif opt.is_option():
+        funcargs = opt.opttext()
+        choices = _python_choices(opt)
+        if choices:
+            funcargs += f", choices={choices}"
+
+        funcargs += f", default={_python_default(opt)}"
+
+        if opt.type is not ArgType.STRING:
+            funcargs += f", type={_python_type(opt, file_type)}"
+
+    elif opt.is_positional():
+        funcargs = f"'{_python_dest(opt)}'"
+
+        if opt.type is not ArgType.STRING:
+            funcargs += f", type={_python_type(opt, file_type)}"
+    else:
+        raise RuntimeError('Invalid options provided')
+
+    funcargs += f", help='{_python_help_text(opt)}'"
+
+    return f"parser.add_argument({funcargs})"
+
+def _python_dest(opt):
+    # Returns the name of the attribute that argparse stores the value of an option in
+    if opt.is_positional():
+        return opt.value if opt.value.isidentifier() else opt.var_name
+
+    return (opt.longopt or opt.opt).lstrip('-').replace('-', '_')
+
+def _python_default_text(opt):
+    # Returns the default value of an option as argparse.ArgumentDefaultsHelpFormatter shows it
+    if opt.is_flag():
+        return "False"
+
+    if opt.type == ArgType.FILE:
+        return "None"
+
+    if opt.type == ArgType.STRING:
+        choices = _python_choices(opt)
+        return choices[0] if choices else opt.value
+
+    if opt.type == ArgType.INT:
+        return str(int(opt.value, 16 if classify_token(opt.value) == TokenClass.HEX else 10))
+
+    return str(float(opt.value))
+
+def _fastparse_option_strings(opt):
+    return [s for s in (opt.opt, opt.longopt) if s is not None]
+
+def _fastparse_metavar(opt):
+    choices = _python_choices(opt)
+    if choices:
+        return '{' + ','.join(choices) + '}'
+
+    return _python_dest(opt).upper()
+
+def _fastparse_usage_part(opt):
+    if opt.is_positional():
+        return _python_dest(opt)
+
+    if opt.is_flag():
+        return f"[{opt.opt or opt.longopt}]"
+
+    return f"[{opt.opt or opt.longopt} {_fastparse_metavar(opt)}]"
+
+def _fastparse_help_entries(opts):
+    # Yields (invocation, help text) for each option, as argparse shows them
+    for opt in opts:
+        if opt.is_positional():
+            yield _python_dest(opt), _python_help_text(opt)
+            continue
+
+        if opt.is_flag():
+            invocation = ', '.join(_fastparse_option_strings(opt))
+        else:
+            metavar = _fastparse_metavar(opt)
+            invocation = ', '.join(f"{s} {metavar}" for s in _fastparse_option_strings(opt))
+
+        yield invocation, f"{_python_help_text(opt)} (default: {_python_default_text(opt)})"
+
+def _fastparse_help(processed_args):
+    """
+    Generate the help text printed after the usage text, formatted the same way as
+    argparse.ArgumentDefaultsHelpFormatter formats it for an 80-column terminal
+
+    :param list processed_args: list of CmdlineOpt instances
+    :return: help text
+    :rtype: str
+    """
+    import textwrap
+
+    positionals = list(_fastparse_help_entries(o for o in processed_args if o.is_positional()))
+    options = [('-h, --help', 'show this help message and exit')]
+    options.extend(_fastparse_help_entries(o for o in processed_args if not o.is_positional()))
+
+    max_length = max(len(invocation) + 2 for invocation, _ in positionals + options)
+    help_position = min(max_length + 2, FASTPARSE_MAX_HELP_POSITION)
+    help_width = max(FASTPARSE_TEXT_WIDTH - help_position, 11)
+    action_width = help_position - 4
+
+    sections = [("positional arguments", positionals), ("options", options)]
+    ret = "\nA command-line program generated by duckargs\n"
+
+    for title, entries in sections:
+        if not entries:
+            continue
+
+        ret += f"\n{title}:\n"
+        for invocation, helptext in entries:
+            if len(invocation) <= action_width:
+                ret += f"  {invocation:<{action_width}}  "
+                indent = 0
+            else:
+                ret += f"  {invocation}\n"
+                indent = help_position
+
+            for i, line in enumerate(textwrap.wrap(helptext, help_width)):
+                ret += ' ' * (indent if i == 0 else help_position) + line + "\n"
+
+    return ret
+
+def _iter_python_list(items):
+    if not items:
+        yield "[]"
+        return
+
+    yield "[\n"
+    for item in items:
+        yield f"    {item},\n"
+
+    yield "]"
+
+def _iter_fastparse_help(processed_args):
+    yield "(\n"
+    for line in _fastparse_help(processed_args).splitlines(True):
+        yield f"    {line!r}\n"
+
+    yield ")"
+
+def _fastparse_option_row(opt, file_type):
+    option_strings = repr(tuple(_fastparse_option_strings(opt)))
+    if opt.is_flag():
+        return f"({option_strings}, '{_python_dest(opt)}', None, False, None)"
+
+    return (f"({option_strings}, '{_python_dest(opt)}', {_python_type(opt, file_type)}, "
+            f"{_python_default(opt)}, {_python_choices(opt)})")
+
+def _iter_python_fastparse_fields(processed_args, lazy_files, timing=False):
+    """
+    Yields the fields of PYTHON_FASTPARSE_TEMPLATE which describe the options
+
+    :param list processed_args: list of CmdlineOpt instances
+    :param bool lazy_files: if True, FILE arguments are LazyFile instances
+    :param bool timing: if True, hidden --duckargs-timing and --duckargs-profile\
+        options are added
+    """
+    types = dict(_FASTPARSE_TYPES)
+    if lazy_files:
+        types[ArgType.FILE] = 'LazyFile'
+
+    positionals = [o for o in processed_args if o.is_positional()]
+    options = [o for o in processed_args if not o.is_positional()]
+
+    yield _iter_python_list([repr('[-h]')] + [repr(_fastparse_usage_part(o)) for o in options])
+    yield _iter_python_list([repr(_fastparse_usage_part(o)) for o in positionals])
+    yield _iter_fastparse_help(processed_args)
+    option_rows = [_fastparse_option_row(o, types[ArgType.FILE]) for o in options]
+    if timing:
+        # Not included in the usage and help text
+        option_rows += [f"(('{opt}',), '{opt.lstrip('-').replace('-', '_')}', None, False, None)"
+                        for opt in (PY_TIMING_OPTION, PY_PROFILE_OPTION)]
+
+    yield _iter_python_list(option_rows)
+    yield _iter_python_list([f"('{_python_dest(o)}', {types[o.type]})" for o in positionals])
+
+    runtime = [PYTHON_FASTPARSE_PARSER]
+    if lazy_files:
+        runtime.append(PYTHON_LAZY_FILE_CLASS)
+
+    if timing:
+        runtime.append(PYTHON_TIMING_CODE)
+
+    yield runtime
+
+def _iter_lines(lines, indent="    "):
+    for i, line in enumerate(lines):
+        if i > 0:
+            yield "\n"
+
+        yield indent
+        yield line
+
+def _iter_python_comment(args):
+    yield "# Generated by duckargs, invoked with the following arguments:\n# "
+    yield ' '.join(shlex.quote(arg) for arg in args)
+    yield "\n\n"
+
+def _iter_python_optlines(processed_args, file_type, timing=False):
+    lines = [_generate_python_code_line(o, file_type) for o in processed_args]
+    if timing:
+        lines += [f"parser.add_argument('{opt}', action='store_true', help=argparse.SUPPRESS)"
+                  for opt in (PY_TIMING_OPTION, PY_PROFILE_OPTION)]
+
+    if not lines:
+        yield "    "
+
+    yield from _iter_lines(lines)
+
+def _iter_python_lazy_file_class():
+    yield _PYTHON_LAZY_FILE_IMPORTS
+    yield PYTHON_LAZY_FILE_CLASS.replace('ArgumentTypeError', 'argparse.ArgumentTypeError')
+    yield "\n"
+
+def _iter_python_timing_code(lazy_files):
+    if not lazy_files:
+        # Already imported for LazyFile
+        yield "import sys\n"
+
+    yield PYTHON_TIMING_CODE
+    yield "\n"
+
+def _iter_python_printlines(processed_args):
+    yield "\n\n"
+    if not processed_args:
+        yield "    "
+
+    yield from _iter_lines(f"print(args.{o.var_name})" for o in processed_args)
+
+def iter_python_code(argv=sys.argv, env=None, probe=None):
+    """
+    Process all command line arguments and yield the text of a python program
+    which handles the described command-line options, one chunk at a time
+
+    :param argv: command-line arguments, including program name, or a Spec instance
+    :param dict env: environment variables to read settings from, or a PythonSettings\
+        instance. If None, os.environ is used
+    :param FileProbe probe: used to check whether values are existing files. If\
+        None, a new FileProbe using the DUCKARGS_PROBE setting is used
+    """
+    settings = env if isinstance(env, PythonSettings) else PythonSettings(env)
+    return profiling.profile_chunks('python', settings.env, _iter_python_code(argv, settings, probe))
+
+def _iter_python_code(argv, settings, probe):
+    if isinstance(argv, Spec):
+        processed_args = argv.to_cmdline_opts(_is_python_reserved_str)
+        args = argv.args
+    else:
+        if probe is None:
+            probe = FileProbe.from_env(settings.env)
+
+        processed_args = process_args(_is_python_reserved_str, argv, probe)
+        args = argv[1:]
+
+    printlines = ()
+    if settings.print_values:
+        printlines = _iter_python_printlines(processed_args)
+
+    comment = ()
+    if settings.comment:
+        comment = _iter_python_comment(args)
+
+    lazy_files = settings.lazy_files
+    timing = settings.timing
+    timing_fields = [(), (), ()]
+    if timing:
+        timing_fields = [(_PYTHON_TIMING_START,), ("@duckargs_timing\n",),
+                         ("\n    duckargs_timing_parsed()",)]
+
+    module_mode = settings.module_mode
+    if settings.fastparse:
+        segments = _PYTHON_FASTPARSE_SEGMENTS
+        if module_mode != PY_MODULE_OFF:
+            segments = _PYTHON_FASTPARSE_MODULE_SEGMENTS
+
+        fields = [comment] + list(_iter_python_fastparse_fields(processed_args, lazy_files, timing))
+        yield from iter_template(segments, fields + [printlines] + timing_fields)
+    elif module_mode != PY_MODULE_OFF:
+        file_type = 'LazyFile' if lazy_files else ArgType.FILE
+        runtime = []
+        if lazy_files:
+            runtime.append(_iter_python_lazy_file_class())
+
+        if timing:
+            runtime.append(_iter_python_timing_code(lazy_files))
+
+        parser_code, parser = _PYTHON_MODULE_PARSER, "PARSER"
+        if module_mode == PY_MODULE_LAZY:
+            parser_code, parser = _PYTHON_MODULE_LAZY_PARSER, "get_parser()"
+
+        start, decorator, parsed = timing_fields
+        optlines = _iter_python_optlines(processed_args, file_type, timing)
+        yield from iter_template(_PYTHON_MODULE_SEGMENTS, [
+            comment,
+            start,
+            (chunk for part in runtime for chunk in part),
+            optlines,
+            (parser_code,),
+            (parser,),
+            parsed,
+            printlines,
+            decorator
+        ])
+    else:
+        file_type = 'LazyFile' if lazy_files else ArgType.FILE
+        runtime = []
+        if lazy_files:
+            runtime.append(_iter_python_lazy_file_class())
+
+        if timing:
+            runtime.append(_iter_python_timing_code(lazy_files))
+
+        optlines = _iter_python_optlines(processed_args, file_type, timing)
+        yield from iter_template(_PYTHON_SEGMENTS, [comment, optlines, printlines,
+                                                    (chunk for part in runtime for chunk in part)] +
+                                 timing_fields)
+
+def generate_python_code(argv=sys.argv, env=None, probe=None):
+    """
+    Process all command line arguments and return the text of a python program
+    which handles the described command-line options
+
+    :param argv: command-line arguments, including program name, or a Spec instance
+    :param dict env: environment variables to read settings from, or a PythonSettings\
+        instance. If None, os.environ is used
+    :param FileProbe probe: used to check whether values are existing files. If\
+        None, a new FileProbe using the DUCKARGS_PROBE setting is used
+
+    :return: text of the corresponding python program
+    :rtype: str
+    """
+    return ''.join(iter_python_code(argv, env, probe))
+
+if __name__ == "__main__":
+    # Allows running with 'python -m duckargs.python', which skips the console script wrapper
+    from duckargs.__main__ import duckargs_python
+    duckargs_python()
@@ -0,0 +1,256 @@
+"""
+Generation server, which keeps duckargs loaded and answers code generation requests
+over a Unix domain socket, to avoid paying for interpreter startup on every call.
+
+Requests and responses are JSON objects, one per line. A generation request looks like:
+
+    {"target": "c", "argv": ["duckargs", "-a", "--apple", "3"], "env": {"DUCKARGS_PRINT": "0"}, "cwd": "/home/me"}
+
+And is answered with either {"ok": true, "code": "..."}, or {"ok": false, "error": "...",
+"error_type": "ValueError"}. The server also accepts {"cmd": "stats"}, which returns
+latency statistics, and {"cmd": "shutdown"}. Every response also has a "version" key,
+holding the version of duckargs running in the server, and clients ignore responses
+from a different version.
+"""
+import os
+import sys
+import json
+import time
+import threading
+import socketserver
+from collections import deque
+
+from duckargs import check_target, generate_code, __version__
+from duckargs.client import default_socket_path, is_trusted_socket, send_request
+from duckargs.probe import FileProbe
+
+# Seconds without any requests before the server shuts itself down
+DEFAULT_IDLE_TIMEOUT = 600.0
+
+# Number of most recent request latencies used for percentile stats
+LATENCY_WINDOW = 1024
+
+
+class LatencyStats(object):
+    """
+    Collects per-request latency statistics
+    """
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+
+    def add(self, seconds, ok=True):
+        """
+        Record a single request
+
+        :param float seconds: time taken to handle request
+        :param bool ok: False if request failed
+        """
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def _percentile(self, sorted_recent, pc):
+        index = min(len(sorted_recent) - 1, int(len(sorted_recent) * pc / 100.0))
+        return sorted_recent[index] * 1000.0
+
+    def to_dict(self):
+        """
+        Returns all statistics as a dict, with times in milliseconds
+        """
+        ret = {'requests': self.requests, 'errors': self.errors}
+        if self.requests == 0:
+            return ret
+
+        recent = sorted(self.recent)
+        ret.update({
+            'mean_ms': (self.total / self.requests) * 1000.0,
+            'min_ms': self.min * 1000.0,
+            'max_ms': self.max * 1000.0,
+            'p50_ms': self._percentile(recent, 50),
+            'p99_ms': self._percentile(recent, 99)
+        })
+
+        return ret
+
+    def __str__(self):
+        d = self.to_dict()
+        if self.requests == 0:
+            return "0 requests"
+
+        return (f"{d['requests']} requests, {d['errors']} errors, mean {d['mean_ms']:.3f}ms, "
+                f"p50 {d['p50_ms']:.3f}ms, p99 {d['p99_ms']:.3f}ms, max {d['max_ms']:.3f}ms")
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.server.connection_opened()
+
+    def finish(self):
+        self.server.connection_closed()
+        super().finish()
+
+    def handle(self):
+        for line in self.rfile:
+            response = self.server.handle_message(line)
+            response['version'] = __version__
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class GenerationServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix domain socket server that handles code generation requests. Each
+    connection is handled in a separate thread.
+    """
+    daemon_threads = True
+
+    def __init__(self, path=None, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        """
+        :param str path: socket path. If None, default_socket_path() is used
+        :param float idle_timeout: seconds without requests before serve() returns.\
+            If 0 or None, the server never times out
+        """
+        if path is None:
+            path = default_socket_path()
+
+        if os.path.lexists(path):
+            if send_request({'cmd': 'stats'}, path, check_version=False) is not None:
+                raise RuntimeError(f"duckargs server is already running on {path}")
+
+            # Only remove a stale socket left by one of our own servers that didn't exit
+            # cleanly, never a file or a socket created by somebody else
+            if not is_trusted_socket(path):
+                raise RuntimeError(f"{path} already exists, and is not a private socket owned by the current user")
+
+            os.unlink(path)
+
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.stats = LatencyStats()
+        self.stopping = False
+        self.last_activity = time.monotonic()
+        self.active_connections = 0
+        self.state_lock = threading.Lock()
+
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(path, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def connection_opened(self):
+        with self.state_lock:
+            self.active_connections += 1
+            self.last_activity = time.monotonic()
+
+    def connection_closed(self):
+        with self.state_lock:
+            self.active_connections -= 1
+            self.last_activity = time.monotonic()
+
+    def _generate(self, message):
+        target = message.get('target')
+        check_target(target)
+
+        argv = message.get('argv')
+        if (not isinstance(argv, list)) or (not argv):
+            raise ValueError("'argv' must be a non-empty list of strings")
+
+        # Relative paths in the arguments are checked for existing files
+        # relative to the working directory of the client
+        env = message.get('env', {})
+        probe = FileProbe.from_env(env, message.get('cwd'))
+        return generate_code(target, argv, env, probe)
+
+    def handle_message(self, line):
+        """
+        Handle a single request message
+
+        :param bytes line: JSON-encoded request message
+        :return: response message
+        :rtype: dict
+        """
+        start = time.perf_counter()
+
+        try:
+            message = json.loads(line)
+            if not isinstance(message, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            return {'ok': False, 'error': f"Invalid request: {e}", 'error_type': 'ValueError'}
+
+        cmd = message.get('cmd', 'generate')
+
+        if cmd == 'stats':
+            return {'ok': True, 'stats': self.stats.to_dict()}
+
+        if cmd == 'shutdown':
+            self.stopping = True
+            return {'ok': True}
+
+        try:
+            response = {'ok': True, 'code': self._generate(message)}
+        except (ValueError, RuntimeError, OSError) as e:
+            response = {'ok': False, 'error': str(e), 'error_type': e.__class__.__name__}
+
+        with self.state_lock:
+            self.stats.add(time.perf_counter() - start, response['ok'])
+
+        return response
+
+    def _is_idle(self):
+        if not self.idle_timeout:
+            return False
+
+        with self.state_lock:
+            if self.active_connections > 0:
+                return False
+
+            return (time.monotonic() - self.last_activity) > self.idle_timeout
+
+    def serve(self):
+        """
+        Handle requests until a shutdown request is received, or the server has
+        been idle for longer than the idle timeout
+        """
+        self.timeout = 1.0 if not self.idle_timeout else min(1.0, self.idle_timeout)
+
+        try:
+            while (not self.stopping) and (not self._is_idle()):
+                self.handle_request()
+        finally:
+            self.server_close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+def serve(path=None, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """
+    Run a generation server until it is shut down or times out, and print
+    latency statistics to stderr when finished
+
+    :param str path: socket path. If None, default_socket_path() is used
+    :param float idle_timeout: seconds without requests before shutting down
+    """
+    server = GenerationServer(path, idle_timeout)
+    print(f"duckargs server listening on {server.path}", file=sys.stderr)
+
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+
+    print(f"duckargs server stopped: {server.stats}", file=sys.stderr)
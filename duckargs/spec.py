@@ -0,0 +1,376 @@
+"""
+Compact, immutable representation of a parsed program description, which can be
+converted to and from JSON, and passed directly to the code generators. Parsing
+arguments once with parse_spec() and re-using the result avoids parsing the same
+arguments again for each code generator.
+"""
+import sys
+
+from duckargs.core import ArgType, CmdlineOpt, SpecFile, process_args, check_duplicates, infer_type
+
+# Type names used in dicts / JSON, mapped to ArgType values
+_TYPE_NAMES = {
+    'int': ArgType.INT,
+    'float': ArgType.FLOAT,
+    'file': ArgType.FILE,
+    'str': ArgType.STRING
+}
+
+_ARG_TYPES = {v: k for k, v in _TYPE_NAMES.items()}
+
+
+class _Immutable(object):
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} instances are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} instances are immutable")
+
+    def _set(self, name, value):
+        object.__setattr__(self, name, value)
+
+
+class OptSpec(_Immutable):
+    """
+    Describes a single option / flag / positional argument
+    """
+    FLAG = "flag"
+    OPTION = "option"
+    POSITIONAL = "positional"
+
+    KINDS = (FLAG, OPTION, POSITIONAL)
+
+    __slots__ = ('kind', 'opt', 'longopt', 'var_name', 'type', 'default', 'choices')
+
+    def __init__(self, kind, opt=None, longopt=None, var_name=None, type=None, default=None,
+                 choices=None):
+        """
+        :param str kind: one of OptSpec.FLAG, OptSpec.OPTION or OptSpec.POSITIONAL
+        :param str opt: short option, including dash (e.g. '-a'). May be None for\
+            options and flags with a long option, which only the table-driven C\
+            parsers support
+        :param str longopt: long option, including dashes (e.g. '--apple')
+        :param str var_name: variable name. If None, derived from the option names\
+            (or for positional arguments, the default value)
+        :param type: ArgType value. If None, inferred from the default value
+        :param str default: default value, as it would be given on the command line.\
+            For positional arguments, this is an example value. None for flags, and\
+            for FILE options with no default
+        :param choices: sequence of allowed values, for string options
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"Invalid kind '{kind}', must be one of {list(self.KINDS)}")
+
+        if kind == self.POSITIONAL:
+            if (opt is not None) or (longopt is not None):
+                raise ValueError("Positional arguments cannot have option names")
+
+            if var_name is None:
+                if (default is None) or (not default.isidentifier()):
+                    raise ValueError("Positional argument requires a var_name")
+
+                var_name = default
+
+            if default is None:
+                default = var_name
+        else:
+            if (opt is None) and (longopt is None):
+                raise ValueError("Options and flags require a short or long option")
+
+            if (opt is not None) and ((len(opt) > 2) or (not opt.startswith('-'))):
+                raise ValueError(f"Invalid short option '{opt}'")
+
+            if (longopt is not None) and (not longopt.startswith('--')):
+                raise ValueError(f"Invalid long option '{longopt}'")
+
+            if var_name is None:
+                var_name = (longopt or opt).lstrip('-').replace('-', '_')
+
+        if kind == self.FLAG:
+            if (type is not None) or (default is not None) or (choices is not None):
+                raise ValueError("Flags cannot have a type, default value or choices")
+        else:
+            if choices is not None:
+                choices = tuple(str(c) for c in choices)
+                if len(choices) < 2:
+                    raise ValueError("At least two choices are required")
+
+                if default is None:
+                    default = choices[0]
+                elif default not in choices:
+                    raise ValueError(f"Default value '{default}' is not one of the choices")
+
+                if type is None:
+                    type = ArgType.STRING
+                elif type != ArgType.STRING:
+                    raise ValueError("Only string values can have choices")
+
+            if type is None:
+                if default is None:
+                    raise ValueError("Options require a type or default value")
+
+                type = infer_type(default)
+
+            if type not in _ARG_TYPES:
+                raise ValueError(f"Invalid type '{type}'")
+
+            if (default is None) and (type != ArgType.FILE):
+                raise ValueError("Only FILE options can have no default value")
+
+            if (kind == self.OPTION) and (type == ArgType.FILE) and (default == 'FILE'):
+                # 'FILE' is a placeholder meaning no default value
+                default = None
+
+        self._set('kind', kind)
+        self._set('opt', opt)
+        self._set('longopt', longopt)
+        self._set('var_name', var_name)
+        self._set('type', type)
+        self._set('default', default)
+        self._set('choices', choices)
+
+    @classmethod
+    def from_cmdline_opt(cls, opt):
+        """
+        Create an OptSpec from a CmdlineOpt instance
+
+        :param CmdlineOpt opt: CmdlineOpt instance
+        :return: new OptSpec instance
+        :rtype: OptSpec
+        """
+        default = opt.value
+        choices = None
+
+        if opt.is_flag():
+            kind = cls.FLAG
+        elif opt.is_positional():
+            kind = cls.POSITIONAL
+        else:
+            kind = cls.OPTION
+            if opt.type == ArgType.STRING:
+                values = opt.value.split(',')
+                if len(values) > 1:
+                    choices = values
+                    default = values[0]
+
+        return cls(kind, opt.opt, opt.longopt, opt.var_name, opt.type, default, choices)
+
+    def value_text(self):
+        """
+        Returns the value for this option / positional argument, as it would be
+        given on the command line, or None for flags
+        """
+        if self.choices is not None:
+            return ','.join(self.choices)
+
+        if (self.default is None) and (self.type == ArgType.FILE):
+            return 'FILE'
+
+        return self.default
+
+    def to_cmdline_opt(self):
+        """
+        Create a new CmdlineOpt instance with the same values as this OptSpec
+
+        :return: new CmdlineOpt instance
+        :rtype: CmdlineOpt
+        """
+        ret = CmdlineOpt()
+        ret.opt = self.opt
+        ret.longopt = self.longopt
+        ret.value = self.value_text()
+        ret.type = self.type
+        ret.var_name = self.var_name
+        ret.desc = self.var_name
+        return ret
+
+    def to_args(self):
+        """
+        Returns the command-line arguments that describe this option / flag /
+        positional argument
+        """
+        ret = [x for x in (self.opt, self.longopt) if x is not None]
+        if self.kind != self.FLAG:
+            ret.append(self.value_text())
+
+        return ret
+
+    def to_dict(self):
+        """
+        Returns a dict containing all non-default values of this OptSpec, which
+        can be converted to JSON
+        """
+        ret = {'kind': self.kind}
+        for name in ('opt', 'longopt', 'var_name', 'default'):
+            value = getattr(self, name)
+            if value is not None:
+                ret[name] = value
+
+        if self.type is not None:
+            ret['type'] = _ARG_TYPES[self.type]
+
+        if self.choices is not None:
+            ret['choices'] = list(self.choices)
+
+        return ret
+
+    @classmethod
+    def from_dict(cls, d):
+        """
+        Create an OptSpec from a dict created by OptSpec.to_dict
+
+        :param dict d: dict created by to_dict
+        :return: new OptSpec instance
+        :rtype: OptSpec
+        """
+        d = dict(d)
+        kind = d.pop('kind', None)
+        typename = d.pop('type', None)
+
+        if (typename is not None) and (typename not in _TYPE_NAMES):
+            raise ValueError(f"Invalid type '{typename}', must be one of {list(_TYPE_NAMES)}")
+
+        try:
+            return cls(kind, type=_TYPE_NAMES.get(typename), **d)
+        except TypeError as e:
+            raise ValueError(f"Invalid {cls.__name__} fields: {e}")
+
+    def _key(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, OptSpec) and (self._key() == other._key())
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __str__(self):
+        fields = ', '.join(f"{k}={v!r}" for k, v in self.to_dict().items())
+        return f"{self.__class__.__name__}({fields})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class Spec(_Immutable):
+    """
+    Describes all options / flags / positional arguments of a program
+    """
+    __slots__ = ('opts', 'args')
+
+    def __init__(self, opts, args=None):
+        """
+        :param opts: sequence of OptSpec instances
+        :param args: command-line arguments (not including program name) that\
+            this spec was created from, shown in the comment header of generated\
+            code. If None, arguments are created from the OptSpec instances
+        """
+        opts = tuple(opts)
+        check_duplicates(opts)
+
+        if args is None:
+            args = [a for o in opts for a in o.to_args()]
+
+        self._set('opts', opts)
+        self._set('args', tuple(args))
+
+    def to_cmdline_opts(self, reserved_str_check=None):
+        """
+        Create a list of new CmdlineOpt instances, as process_args would
+
+        :param reserved_str_check: function that returns True if a variable name is\
+            a reserved word in the target language. If None, no names are changed
+
+        :return: list of CmdlineOpt instances
+        :rtype: list
+        """
+        ret = []
+        for o in self.opts:
+            c = o.to_cmdline_opt()
+            if (reserved_str_check is not None) and reserved_str_check(c.var_name):
+                c.var_name += "val"
+
+            ret.append(c)
+
+        return ret
+
+    def to_dict(self):
+        """
+        Returns a dict representation of this Spec, which can be converted to JSON
+        """
+        return {'args': list(self.args), 'opts': [o.to_dict() for o in self.opts]}
+
+    @classmethod
+    def from_dict(cls, d):
+        """
+        Create a Spec from a dict created by Spec.to_dict
+
+        :param dict d: dict created by to_dict
+        :return: new Spec instance
+        :rtype: Spec
+        """
+        if (not isinstance(d, dict)) or (not isinstance(d.get('opts'), list)):
+            raise ValueError(f"{cls.__name__} dict must have an 'opts' list")
+
+        return cls([OptSpec.from_dict(o) for o in d['opts']], d.get('args'))
+
+    def to_json(self, **kwargs):
+        """
+        Returns a JSON representation of this Spec
+
+        :param kwargs: passed to json.dumps
+        :rtype: str
+        """
+        import json
+        return json.dumps(self.to_dict(), **kwargs)
+
+    @classmethod
+    def from_json(cls, text):
+        """
+        Create a Spec from JSON created by Spec.to_json
+
+        :param str text: JSON text
+        :return: new Spec instance
+        :rtype: Spec
+        """
+        import json
+        return cls.from_dict(json.loads(text))
+
+    def __eq__(self, other):
+        return isinstance(other, Spec) and (self.opts == other.opts) and (self.args == other.args)
+
+    def __hash__(self):
+        return hash((self.opts, self.args))
+
+    def __len__(self):
+        return len(self.opts)
+
+    def __iter__(self):
+        return iter(self.opts)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({list(self.opts)})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def parse_spec(argv=sys.argv, probe=None, allow_long_only=False):
+    """
+    Process all command line arguments and return a Spec instance describing them
+
+    :param argv: command-line arguments, including program name, or a SpecFile\
+        instance to read arguments from
+    :param FileProbe probe: used to check whether values are existing files. If\
+        None, a new FileProbe which always checks the filesystem is used
+    :param bool allow_long_only: if True, long options without a short option are allowed
+    :return: Spec instance
+    :rtype: Spec
+    """
+    opts = process_args(None, argv, probe, allow_long_only)
+
+    # Arguments read from a file are not kept, and are created from the options instead
+    args = None if isinstance(argv, SpecFile) else argv[1:]
+    return Spec([OptSpec.from_cmdline_opt(o) for o in opts], args)
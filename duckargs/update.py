@@ -0,0 +1,275 @@
+"""
+Updating previously generated code for new command-line arguments, without losing
+changes that were made to it by hand
+"""
+import bisect
+import difflib
+import shlex
+
+# Text of the first line of the comment at the top of generated code
+HEADER_TEXT = "Generated by duckargs, invoked with the following arguments:"
+
+# Number of lines at the start of a file that are searched for the header comment
+HEADER_SEARCH_LINES = 10
+
+# Regions of a diff that contain no lines that are unique on both sides are only
+# diffed with difflib when they are this small (number of lines on one side
+# multiplied by number of lines on the other side), since difflib is very slow for
+# generated code, which repeats the same few lines many times. Larger regions are
+# treated as entirely changed.
+MAX_DIFFLIB_SIZE = 250000
+
+
+def recover_argv(text):
+    """
+    Get the arguments that generated code was created from, by reading the comment
+    at the top of the code
+
+    :param str text: generated code, which may have been changed by hand
+    :return: command-line arguments, including program name
+    :rtype: list
+    """
+    lines = text.splitlines()[:HEADER_SEARCH_LINES + 1]
+    for i, line in enumerate(lines[:-1]):
+        if line.endswith(HEADER_TEXT):
+            prefix = line[:-len(HEADER_TEXT)].strip()
+            args_line = lines[i + 1]
+            if prefix and args_line.startswith(prefix):
+                # Arguments are quoted as for a POSIX shell
+                return ['duckargs'] + shlex.split(args_line[len(prefix):])
+
+    raise ValueError("No duckargs comment found at the top of the file, so the arguments "
+                     "it was generated from are unknown")
+
+def _unique_anchors(a, alo, ahi, b, blo, bhi):
+    # Lines occurring exactly once in both a[alo:ahi] and b[blo:bhi], as a list of
+    # (a index, b index), with the longest run of pairs that appear in the same
+    # order on both sides (patience diff)
+    a_index = {}
+    for i in range(alo, ahi):
+        a_index[a[i]] = None if a[i] in a_index else i
+
+    b_index = {}
+    for j in range(blo, bhi):
+        b_index[b[j]] = None if b[j] in b_index else j
+
+    pairs = []
+    for line, i in a_index.items():
+        j = b_index.get(line)
+        if (i is not None) and (j is not None):
+            pairs.append((i, j))
+
+    # Longest increasing subsequence of b indices, pairs are already sorted by a index
+    tails = []
+    tail_indices = []
+    previous = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect.bisect_left(tails, j)
+        if pos > 0:
+            previous[k] = tail_indices[pos - 1]
+
+        if pos == len(tails):
+            tails.append(j)
+            tail_indices.append(k)
+        else:
+            tails[pos] = j
+            tail_indices[pos] = k
+
+    ret = []
+    k = tail_indices[-1] if tail_indices else -1
+    while k >= 0:
+        ret.append(pairs[k])
+        k = previous[k]
+
+    ret.reverse()
+    return ret
+
+def match_lines(a, b):
+    """
+    Find which lines of one list of lines are unchanged in another list of lines
+
+    :param list a: old lines
+    :param list b: new lines
+    :return: list with one item for each line in a, which is the index of the same\
+        line in b, or -1 if the line was removed or changed
+    :rtype: list
+    """
+    where = [-1] * len(a)
+    regions = [(0, len(a), 0, len(b))]
+
+    while regions:
+        alo, ahi, blo, bhi = regions.pop()
+
+        while (alo < ahi) and (blo < bhi) and (a[alo] == b[blo]):
+            where[alo] = blo
+            alo += 1
+            blo += 1
+
+        while (alo < ahi) and (blo < bhi) and (a[ahi - 1] == b[bhi - 1]):
+            ahi -= 1
+            bhi -= 1
+            where[ahi] = bhi
+
+        if (alo == ahi) or (blo == bhi):
+            continue
+
+        anchors = _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if anchors:
+            for i, j in anchors:
+                where[i] = j
+                regions.append((alo, i, blo, j))
+                alo, blo = i + 1, j + 1
+
+            regions.append((alo, ahi, blo, bhi))
+        elif ((ahi - alo) * (bhi - blo)) <= MAX_DIFFLIB_SIZE:
+            matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            for i, j, size in matcher.get_matching_blocks():
+                for k in range(size):
+                    where[alo + i + k] = blo + j + k
+
+    return where
+
+def _iter_hunks(where, blen):
+    # Yields (a start, a end, b start, b end) for each changed region
+    i = j = 0
+    for i2, j2 in enumerate(where + [blen]):
+        if j2 < 0:
+            continue
+
+        if (i2 > i) or (j2 > j):
+            yield i, i2, j, j2
+
+        i, j = i2 + 1, j2 + 1
+
+def merge_update(base, new, current):
+    """
+    Apply the changes between two versions of generated code to a copy of the older
+    version which may have been changed by hand. Each changed region of generated code
+    is only replaced if it, and the lines on either side of it, have not been changed
+    by hand.
+
+    :param str base: code generated from the old arguments
+    :param str new: code generated from the new arguments
+    :param str current: code generated from the old arguments, possibly changed by hand
+
+    :return: tuple of (updated code, conflicts), where conflicts is a list of\
+        (line number, old lines, new lines) tuples for each change that was not made\
+        because the lines had been changed by hand. Line number is the line in the\
+        updated code where the change would have been made, old lines is a list of the\
+        previously generated lines that should have been removed (and may still be in\
+        the updated code), and new lines is a list of the generated lines that were not\
+        added there.
+    :rtype: tuple
+    """
+    base_lines = base.splitlines(True)
+    new_lines = new.splitlines(True)
+    current_lines = current.splitlines(True)
+
+    base_to_new = match_lines(base_lines, new_lines)
+    base_to_current = match_lines(base_lines, current_lines)
+    # Index of the following base line in current_lines, for the end of the file
+    base_to_current.append(len(current_lines))
+
+    out = []
+    conflicts = []
+    pos = 0
+
+    for i1, i2, j1, j2 in _iter_hunks(base_to_new, len(new_lines)):
+        start = 0
+        if i1 > 0:
+            start = base_to_current[i1 - 1] + 1
+
+        applies = ((i1 == 0) or (start > 0)) and \
+                  all(base_to_current[k] == (start + k - i1) for k in range(i1, i2 + 1))
+
+        if applies:
+            out.extend(current_lines[pos:start])
+            out.extend(new_lines[j1:j2])
+            pos = start + (i2 - i1)
+            continue
+
+        # Find the last unchanged line before this region, to report where it is
+        k = i1 - 1
+        while (k >= 0) and (base_to_current[k] < 0):
+            k -= 1
+
+        after = base_to_current[k] + 1 if k >= 0 else 0
+        conflicts.append((len(out) + max(0, after - pos) + 1, base_lines[i1:i2],
+                          new_lines[j1:j2]))
+
+    out.extend(current_lines[pos:])
+    return ''.join(out), conflicts
+
+def update_code(target, text, argv, env=None, probe=None):
+    """
+    Update previously generated code for new command-line arguments. The arguments
+    that the code was originally generated from are read from the comment at the top
+    of the code, and only the parts of the code that are different when generated
+    with the new arguments are changed.
+
+    :param str target: target language name
+    :param str text: previously generated code, which may have been changed by hand
+    :param argv: new command-line arguments, including program name, or a Spec instance
+    :param dict env: environment variables to read settings from. If None,\
+        os.environ is used. Must be the same settings that the code was originally\
+        generated with
+    :param FileProbe probe: used to check whether values are existing files
+
+    :return: tuple of (updated code, conflicts), as returned by merge_update
+    :rtype: tuple
+    """
+    from duckargs import generate_code
+    from duckargs.spec import Spec
+
+    old_argv = recover_argv(text)
+    new_args = list(argv.args) if isinstance(argv, Spec) else list(argv[1:])
+    if new_args == old_argv[1:]:
+        return text, []
+
+    base = generate_code(target, old_argv, env, probe)
+
+    # Comment syntax is different for each target language
+    header = base.split('\n', 1)[0]
+    if header not in text.split('\n', HEADER_SEARCH_LINES):
+        raise ValueError(f"Code was not generated for target '{target}'")
+
+    return merge_update(base, generate_code(target, argv, env, probe), text)
+
+def update_file(target, path, argv, env=None, probe=None, output=None, force=False):
+    """
+    Update a file containing previously generated code for new command-line arguments,
+    as described for update_code. The file is only written if anything was changed,
+    and, unless forced, only if there were no conflicts.
+
+    :param str target: target language name
+    :param str path: path of file containing generated code
+    :param argv: new command-line arguments, including program name, or a Spec instance
+    :param dict env: environment variables to read settings from. If None,\
+        os.environ is used
+    :param FileProbe probe: used to check whether values are existing files
+    :param str output: path to write updated code to. If None, the file is updated\
+        in place
+    :param bool force: if True, updated code is written even if there were conflicts,\
+        leaving the conflicting lines as they were changed by hand
+
+    :return: list of conflicts, as returned by merge_update. If this is not empty and\
+        force is False, nothing was written
+    :rtype: list
+    """
+    from duckargs.output import write_atomic
+
+    with open(path, 'r') as fh:
+        text = fh.read()
+
+    code, conflicts = update_code(target, text, argv, env, probe)
+
+    if conflicts and not force:
+        return conflicts
+
+    if output is None:
+        output = path
+
+    if (code != text) or (output != path):
+        write_atomic(output, [code])
+
+    return conflicts
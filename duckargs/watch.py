@@ -0,0 +1,245 @@
+"""
+Watching a spec file, and regenerating code whenever it changes
+"""
+import os
+import sys
+import time
+import select
+import struct
+
+from duckargs import generate_code
+from duckargs.core import SpecFile
+from duckargs.batch import BatchSpec, load_manifest, dedupe_specs
+from duckargs.output import write_atomic
+
+# After the spec file changes, wait until it has not changed for this many seconds
+# before regenerating, so that a burst of writes (e.g. an editor saving a file in
+# several steps) only causes one regeneration
+DEFAULT_DEBOUNCE = 0.05
+
+# How often the spec file is checked for changes when inotify is not available
+POLL_INTERVAL = 0.1
+
+# inotify event flags, from <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+# Size of struct inotify_event, not including the name
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def load_spec_file(path):
+    """
+    Read a file containing the arguments describing a program, in the same format as
+    for '--spec' (see duckargs.core.SpecFile)
+
+    :param str path: path to spec file
+    :return: arguments describing the program (not including program name)
+    :rtype: list
+    """
+    return list(SpecFile(path))[1:]
+
+
+class _InotifyMonitor(object):
+    # Waits for changes to a file using inotify. The directory is watched rather
+    # than the file itself, since many editors save files by replacing them
+    def __init__(self, fd, name):
+        self.fd = fd
+        self.name = name
+
+    @classmethod
+    def open(cls, path):
+        try:
+            import ctypes
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+
+        if fd < 0:
+            return None
+
+        dirname = os.path.dirname(os.path.abspath(path))
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(fd, os.fsencode(dirname), mask) < 0:
+            os.close(fd)
+            return None
+
+        return cls(fd, os.fsencode(os.path.basename(path)))
+
+    def wait(self, timeout):
+        changed = False
+
+        while select.select([self.fd], [], [], timeout)[0]:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+
+            pos = 0
+            while pos < len(data):
+                _, _, _, size = _EVENT_HEADER.unpack_from(data, pos)
+                pos += _EVENT_HEADER.size
+                if data[pos:pos + size].rstrip(b'\0') == self.name:
+                    changed = True
+
+                pos += size
+
+            if changed:
+                break
+
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PollMonitor(object):
+    # Waits for changes to a file by checking its modification time
+    def __init__(self, path):
+        self.path = path
+        self.state = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+
+        while True:
+            state = self._stat()
+            if state != self.state:
+                self.state = state
+                return True
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+
+            time.sleep(min(remaining, POLL_INTERVAL))
+
+    def close(self):
+        pass
+
+
+class Watcher(object):
+    """
+    Watches a spec file, and regenerates code whenever it changes. The spec file is
+    either a file containing the arguments describing a single program (see
+    load_spec_file), or a manifest describing many programs (see
+    duckargs.batch.load_manifest). When a manifest changes, only the programs whose
+    lines changed are regenerated.
+    """
+    def __init__(self, path, output=None, target=None, debounce=DEFAULT_DEBOUNCE, poll=False,
+                 out=sys.stdout):
+        """
+        :param str path: path to spec file
+        :param str output: path to write generated code to. If None, the spec file\
+            is a manifest describing many programs
+        :param str target: target language name. If None, the target is picked\
+            based on output file extension
+        :param float debounce: seconds to wait for the spec file to stop changing\
+            before regenerating
+        :param bool poll: if True, always check the spec file for changes by polling,\
+            even if inotify is available
+        :param out: file object to print results and errors to
+        """
+        self.path = path
+        self.output = output
+        self.target = target
+        self.debounce = debounce
+        self.poll = poll
+        self.out = out
+
+        # Maps normalized output paths to the key of the spec they were generated from
+        self.generated = {}
+
+    def load(self):
+        """
+        Read the spec file
+
+        :return: list of BatchSpec instances
+        :rtype: list
+        """
+        if self.output is None:
+            return load_manifest(self.path, self.target)
+
+        return [BatchSpec(self.output, load_spec_file(self.path), self.target, self.path)]
+
+    def regenerate(self):
+        """
+        Read the spec file, and regenerate code for each program whose spec changed
+        since the last call. Results and errors are printed, and never raised.
+
+        :return: number of programs that were regenerated
+        :rtype: int
+        """
+        try:
+            groups = dedupe_specs(self.load())
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}", file=self.out, flush=True)
+            return 0
+
+        count = 0
+
+        for key, specs in groups.items():
+            specs = [s for s in specs if self.generated.get(os.path.normpath(s.output)) != key]
+            if not specs:
+                continue
+
+            start = time.perf_counter()
+
+            try:
+                code = generate_code(key[0], ('duckargs',) + key[1])
+                for spec in specs:
+                    write_atomic(spec.output, [code])
+            except (ValueError, RuntimeError, OSError) as e:
+                print(f"{specs[0].source}: Error: {e}", file=self.out, flush=True)
+                continue
+
+            elapsed = (time.perf_counter() - start) * 1000.0
+
+            for spec in specs:
+                self.generated[os.path.normpath(spec.output)] = key
+                print(f"Generated {spec.output} in {elapsed:.2f} ms", file=self.out, flush=True)
+
+            count += len(specs)
+
+        return count
+
+    def run(self, stop=None):
+        """
+        Generate code for all programs, then wait for changes to the spec file and
+        regenerate changed programs, until stopped
+
+        :param threading.Event stop: stops watching when set. If None, watch forever
+        """
+        monitor = None
+        if not self.poll:
+            monitor = _InotifyMonitor.open(self.path)
+
+        if monitor is None:
+            monitor = _PollMonitor(self.path)
+
+        try:
+            self.regenerate()
+
+            while (stop is None) or (not stop.is_set()):
+                if not monitor.wait(POLL_INTERVAL):
+                    continue
+
+                while monitor.wait(self.debounce):
+                    pass
+
+                self.regenerate()
+        finally:
+            monitor.close()
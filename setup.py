@@ -43,7 +43,8 @@ setup(
         'console_scripts': [
             'duckargs=duckargs.__main__:duckargs_python',
             'duckargs-c=duckargs.__main__:duckargs_c',
-            'duckargs-python=duckargs.__main__:duckargs_python'
+            'duckargs-python=duckargs.__main__:duckargs_python',
+            'duckargs-batch=duckargs.__main__:duckargs_batch'
         ]
     },
     python_requires=">=3.7",
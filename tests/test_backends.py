@@ -0,0 +1,87 @@
+import os
+import sys
+import tempfile
+import subprocess
+import unittest
+
+import duckargs
+from duckargs import generate_code, generate_python_code, register_backend, get_targets
+
+
+ARGV = ['duckargs', 'pos', '-a', '--apple', '3']
+ENV = {'DUCKARGS_PROBE': 'sentinel'}
+
+BACKEND_MODULE = """
+def iter_code(argv, env=None, probe=None):
+    yield "upper:"
+    yield " ".join(argv[1:]).upper()
+
+def generate_code(argv, env=None, probe=None):
+    return "".join(iter_code(argv, env, probe))
+"""
+
+DIST_METADATA = """Metadata-Version: 2.1
+Name: duckargs-upper
+Version: 1.0
+"""
+
+ENTRY_POINTS = """[duckargs.backends]
+upper = duckargs_upper
+"""
+
+
+class TestBackends(unittest.TestCase):
+    def tearDown(self):
+        duckargs.TARGETS.pop('python-copy', None)
+
+    def test_register_backend(self):
+        register_backend('python-copy', 'duckargs.python', 'generate_python_code', 'iter_python_code')
+
+        self.assertIn('python-copy', get_targets())
+        self.assertEqual(generate_code('python-copy', ARGV, ENV), generate_python_code(ARGV, ENV))
+        self.assertEqual(''.join(duckargs.iter_code('python-copy', ARGV, ENV)),
+                         generate_python_code(ARGV, ENV))
+
+        self.assertRaises(ValueError, register_backend, 'python-copy', 'duckargs.c')
+        self.assertRaises(ValueError, register_backend, 'c', 'duckargs.c')
+
+    def test_unknown_target(self):
+        self.assertRaises(ValueError, generate_code, 'cobol', ARGV, ENV)
+        self.assertRaises(ValueError, duckargs.check_target, 'cobol')
+
+    def test_entry_point(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            with open(os.path.join(tempdir, 'duckargs_upper.py'), 'w') as fh:
+                fh.write(BACKEND_MODULE)
+
+            dist_info = os.path.join(tempdir, 'duckargs_upper-1.0.dist-info')
+            os.mkdir(dist_info)
+
+            with open(os.path.join(dist_info, 'METADATA'), 'w') as fh:
+                fh.write(DIST_METADATA)
+
+            with open(os.path.join(dist_info, 'entry_points.txt'), 'w') as fh:
+                fh.write(ENTRY_POINTS)
+
+            env = dict(os.environ)
+            env['PYTHONPATH'] = os.pathsep.join([tempdir, os.getcwd()])
+
+            code = ("import sys, duckargs; "
+                    "print(duckargs.generate_code('upper', ['duckargs', '-a', 'pos'])); "
+                    "print('duckargs_upper' in sys.modules)")
+            proc = subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                                  stdout=subprocess.PIPE, universal_newlines=True)
+            self.assertEqual(proc.stdout.split('\n')[:2], ['upper:-A POS', 'True'])
+
+            # Built-in targets never search installed packages
+            code = ("import sys, duckargs; duckargs.generate_code('python', ['duckargs', '-a']); "
+                    "print('upper' in duckargs.TARGETS)")
+            proc = subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                                  stdout=subprocess.PIPE, universal_newlines=True)
+            self.assertEqual(proc.stdout.strip(), 'False')
+
+            # Generating with the duckargs CLI
+            proc = subprocess.run([sys.executable, '-m', 'duckargs', '--no-daemon', '--target',
+                                   'upper', '-a', 'pos'], env=env, check=True,
+                                  stdout=subprocess.PIPE, universal_newlines=True)
+            self.assertEqual(proc.stdout.strip(), 'upper:-A POS')
@@ -0,0 +1,107 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from duckargs import generate_python_code, generate_c_code
+from duckargs.batch import BatchSpec, load_manifest, dedupe_specs, run_batch
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        os.environ["DUCKARGS_PRINT"] = "1"
+        os.environ["DUCKARGS_COMMENT"] = "1"
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _path(self, *parts):
+        return os.path.join(self.tempdir, *parts)
+
+    def _write_manifest(self, lines):
+        path = self._path("manifest.txt")
+        with open(path, 'w') as fh:
+            fh.write('\n'.join(lines) + '\n')
+
+        return path
+
+    def _read(self, path):
+        with open(path, 'r') as fh:
+            return fh.read()
+
+    def test_load_manifest(self):
+        out_py = self._path("a.py")
+        out_c = self._path("b.c")
+        path = self._write_manifest([
+            "# comment",
+            "",
+            f"{out_py} -a --apple 3  # trailing comment",
+            json.dumps({"output": out_c, "args": ["pos", "-q"]}),
+            json.dumps({"output": out_py + "x", "args": ["-v"], "target": "c"}),
+        ])
+
+        specs = load_manifest(path)
+        self.assertEqual(len(specs), 3)
+        self.assertEqual(specs[0].key(), ('python', ('-a', '--apple', '3')))
+        self.assertEqual(specs[1].key(), ('c', ('pos', '-q')))
+        self.assertEqual(specs[2].key(), ('c', ('-v',)))
+        self.assertEqual(specs[0].source, f"{path}:3")
+
+        specs = load_manifest(path, 'c')
+        self.assertEqual(specs[0].target, 'c')
+
+    def test_load_manifest_invalid(self):
+        path = self._write_manifest(['{"output": "x.py"}'])
+        self.assertRaises(ValueError, load_manifest, path)
+
+        path = self._write_manifest(['{"output": "x.py", "args": "-a"}'])
+        self.assertRaises(ValueError, load_manifest, path)
+
+        path = self._write_manifest(['{"output": "x.py", "args": ["-a"], "target": "rust"}'])
+        self.assertRaises(ValueError, load_manifest, path)
+
+        path = self._write_manifest(['{"output": '])
+        self.assertRaises(ValueError, load_manifest, path)
+
+    def test_dedupe(self):
+        specs = [
+            BatchSpec("a.py", ["-a"]),
+            BatchSpec("b.py", ["-a"]),
+            BatchSpec("./a.py", ["-a"]),
+            BatchSpec("a.c", ["-a"]),
+        ]
+
+        groups = dedupe_specs(specs)
+        self.assertEqual(len(groups), 2)
+        self.assertEqual([s.output for s in groups[('python', ('-a',))]], ["a.py", "b.py"])
+
+        specs.append(BatchSpec("a.py", ["-b"]))
+        self.assertRaises(ValueError, dedupe_specs, specs)
+
+    def _check_batch(self, num_specs, max_workers):
+        specs = []
+        for i in range(num_specs):
+            target = 'c' if (i % 2) else 'python'
+            ext = '.c' if (i % 2) else '.py'
+            specs.append(BatchSpec(self._path("out", f"prog{i}{ext}"),
+                                   [f"pos{i}", "-i", "--intval", str(i), "-q"], target))
+
+        # Failing spec should be reported without stopping the others
+        specs.append(BatchSpec(self._path("bad.py"), ["-a", "-a"]))
+
+        errors = run_batch(specs, max_workers)
+        self.assertEqual(len(errors), 1)
+        self.assertIs(errors[0].spec, specs[-1])
+        self.assertFalse(os.path.exists(self._path("bad.py")))
+
+        for spec in specs[:-1]:
+            func = generate_c_code if spec.target == 'c' else generate_python_code
+            self.assertEqual(self._read(spec.output), func(('duckargs',) + spec.args))
+
+    def test_run_batch_serial(self):
+        self._check_batch(4, 1)
+
+    def test_run_batch_process_pool(self):
+        self._check_batch(20, 2)
@@ -0,0 +1,361 @@
+import os
+import random
+import shutil
+import tempfile
+import subprocess
+import unittest
+
+from duckargs import generate_c_code
+from duckargs.c import _build_perfect_hash, _fnv1a
+from benchmarks.c_harness import compile_program, parse_write_count, WRITE_COUNT_MAIN
+
+
+CC = shutil.which('cc') or shutil.which('gcc')
+
+
+def _random_choices(rng, count):
+    ret = set()
+    while len(ret) < count:
+        # No leading '-', so the list of choices is never mistaken for an option
+        ret.add(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789_.') +
+                ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789_-.')
+                        for _ in range(rng.randint(0, 11))))
+
+    # Sort before shuffling, since set order depends on the hash seed
+    return sorted(sorted(ret), key=lambda _: rng.random())
+
+
+class TestPerfectHash(unittest.TestCase):
+    def test_perfect_hash(self):
+        rng = random.Random(99)
+        for count in [2, 3, 10, 100, 500]:
+            choices = _random_choices(rng, count)
+            seeds, slots = _build_perfect_hash(choices)
+
+            self.assertEqual(sorted(range(count)), sorted(i for i in slots if i is not None))
+            for i, choice in enumerate(choices):
+                data = choice.encode('utf-8')
+                seed = seeds[_fnv1a(data, 0) % len(seeds)]
+                self.assertEqual(i, slots[_fnv1a(data, seed) % len(slots)])
+
+    def test_duplicate_choices(self):
+        seeds, slots = _build_perfect_hash(['a', 'b', 'a'])
+        self.assertEqual([0, 1], sorted(i for i in slots if i is not None))
+
+
+@unittest.skipUnless(CC, "C compiler not available")
+class TestCModes(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.env = {'DUCKARGS_PRINT': '1', 'DUCKARGS_COMMENT': '1'}
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _compile(self, code, harness_main=None, cflags=()):
+        exe, proc = compile_program(CC, self.tempdir, code, harness_main,
+                                    ['-Wall', '-Werror'] + list(cflags))
+        self.assertEqual(0, proc.returncode, proc.stdout)
+        return exe
+
+    def _run(self, exe, args, stdin=None):
+        return subprocess.run([exe] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              input=stdin, universal_newlines=True)
+
+    def test_choices_lookup(self):
+        rng = random.Random(1)
+        choices = _random_choices(rng, 300)
+        not_choices = ['', 'x' * 20, choices[0] + 'x', choices[1][:-1] + '!']
+
+        harness_main = """
+int main(int argc, char *argv[])
+{
+    char line[256];
+    while (fgets(line, sizeof(line), stdin))
+    {
+        line[strcspn(line, "\\n")] = '\\0';
+        printf("%d\\n", mode_choice_index(line));
+    }
+    return 0;
+}
+"""
+        for mode in ['sorted', 'hash']:
+            self.env['DUCKARGS_C_CHOICES'] = mode
+            code = generate_c_code(['duckargs', '-m', '--mode', ','.join(choices)], self.env)
+            exe = self._compile(code, harness_main)
+
+            proc = self._run(exe, [], '\n'.join(choices + not_choices) + '\n')
+            expected = list(range(len(choices))) + [-1] * len(not_choices)
+            self.assertEqual(expected, [int(x) for x in proc.stdout.split()])
+
+    def test_choices_program(self):
+        for mode in ['linear', 'sorted', 'hash']:
+            self.env['DUCKARGS_C_CHOICES'] = mode
+            code = generate_c_code(['duckargs', '-m', '--mode', 'fast,slow,a-b', 'x,y'], self.env)
+            exe = self._compile(code)
+
+            proc = self._run(exe, ['-m', 'a-b', 'y'])
+            self.assertIn("mode: a-b\n", proc.stdout)
+            self.assertIn("positional_arg0: y\n", proc.stdout)
+
+            proc = self._run(exe, ['--mode', 'medium', 'y'])
+            self.assertIn("must be one of", proc.stdout)
+            self.assertNotEqual(0, proc.returncode)
+
+            proc = self._run(exe, ['-m', 'fast', 'z'])
+            self.assertIn("must be one of", proc.stdout)
+
+    def test_choices_enum_names_unique(self):
+        # "--mode a_x" and "--mode-a x" would both have an enum value named MODE_A_X
+        argv = ['duckargs', '-m', '--mode', 'a_x,b', '-q', '--mode-a', 'x,y']
+        for mode in ['sorted', 'hash']:
+            for parser in ['getopt', 'reentrant']:
+                self.env['DUCKARGS_C_CHOICES'] = mode
+                self.env['DUCKARGS_C_PARSER'] = parser
+                code = generate_c_code(argv, self.env)
+                self.assertIn("MODE_A_X_2", code)
+
+                exe = self._compile(code)
+                proc = self._run(exe, ['-m', 'a_x', '-q', 'x'])
+                self.assertEqual(0, proc.returncode)
+                self.assertIn("mode: a_x\n", proc.stdout)
+                self.assertIn("mode_a: x\n", proc.stdout)
+
+    def test_buffered_output(self):
+        argv = ['duckargs', 'pos', '-a', '--apple', '3', '-f', '--fl', '4.5', '-m', '--mode', 'x,y',
+                '-i', '--infile', 'FILE', '-q']
+        prog_args = ['-a', '7', '-m', 'y', '-q', 'posval']
+        outputs = []
+
+        for buffered in ['0', '1']:
+            self.env['DUCKARGS_C_BUFFERED'] = buffered
+            exe = self._compile(generate_c_code(argv, self.env))
+            outputs.append((self._run(exe, []).stdout, self._run(exe, prog_args).stdout))
+
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_buffered_static_usage(self):
+        self.env['DUCKARGS_C_BUFFERED'] = '1'
+        self.env['DUCKARGS_PRINT'] = '0'
+        code = generate_c_code(['duckargs', 'pos', '-q'], self.env)
+        self.assertIn("static const char usage[]", code)
+        self.assertNotIn("duckargs_write(", code)
+
+        proc = self._run(self._compile(code), [])
+        self.assertIn("program_name [OPTIONS] pos\n", proc.stdout)
+
+    @unittest.skipUnless(os.path.exists('/proc/self/io'), "/proc/self/io not available")
+    def test_buffered_write_count(self):
+        argv = ['duckargs', '-a', '--apple', '3', '-b', '--banana', 'x', '-q', 'pos']
+        prog_args = ['-a', '7', '-q', 'posval']
+        counts = {}
+
+        for buffered in ['0', '1']:
+            self.env['DUCKARGS_C_BUFFERED'] = buffered
+            exe = self._compile(generate_c_code(argv, self.env), WRITE_COUNT_MAIN)
+            counts[buffered] = [parse_write_count(self._run(exe, args).stderr)
+                                for args in [[], prog_args]]
+
+        self.assertEqual([1, 1], counts['1'])
+        self.assertGreater(min(counts['0']), 1)
+
+    def test_mmap_files(self):
+        self.env['DUCKARGS_C_FILE'] = 'mmap'
+        exe = self._compile(generate_c_code(['duckargs', '-i', '--input', 'FILE', '-l', '--log', 'FILE',
+                                             '-q'], self.env))
+
+        path = os.path.join(self.tempdir, "data.txt")
+        data = "line\n" * 300000
+        with open(path, 'w') as fh:
+            fh.write(data)
+
+        proc = self._run(exe, ['-i', path, '-q'])
+        self.assertIn(f"input: {path} ({len(data)} bytes)\n", proc.stdout)
+        self.assertIn("log: null (0 bytes)\n", proc.stdout)
+        self.assertEqual(0, proc.returncode)
+
+        # stdin is a pipe, which can't be memory-mapped
+        proc = self._run(exe, ['-i', '-', '-l', path], data)
+        self.assertIn(f"input: - ({len(data)} bytes)\n", proc.stdout)
+        self.assertIn(f"log: {path} ({len(data)} bytes)\n", proc.stdout)
+
+        proc = self._run(exe, ['-l', path + '.missing'])
+        self.assertIn(f"Failed to open {path}.missing", proc.stdout)
+        self.assertNotEqual(0, proc.returncode)
+
+        self.env['DUCKARGS_C_PARSER'] = 'reentrant'
+        exe = self._compile(generate_c_code(['duckargs', '-i', '--input', 'FILE', '-q'], self.env))
+        proc = self._run(exe, ['--input', path])
+        self.assertIn(f"input: {path} ({len(data)} bytes)\n", proc.stdout)
+        self.assertEqual(0, proc.returncode)
+
+    def test_table_parser(self):
+        argv = ['duckargs', 'pos', '10', '-a', '--apple', '-b', '--banana', '3', '-f', '--fl', '4.5',
+                '-m', '--mode', 'x,y', '-i', '--infile', 'FILE', '-q']
+        prog_args = [
+            ['p', '5'],
+            ['-aq', 'p', '--banana=7', '5', '-mx', '--fl', '-2.5'],
+            ['--app', '-b', '0x10', 'p', '--', '-5'],
+            ['-b3', '-i', 'in.txt', '--infile=out.txt', 'p', '5', 'extra'],
+        ]
+
+        outputs = {}
+        for parser in ['getopt', 'table']:
+            self.env['DUCKARGS_C_PARSER'] = parser
+            exe = self._compile(generate_c_code(argv, self.env))
+            outputs[parser] = [self._run(exe, args).stdout for args in [[]] + prog_args]
+
+        self.assertEqual(outputs['getopt'], outputs['table'])
+
+        errors = [
+            (['p', '5', '-z'], "invalid option -- 'z'"),
+            (['p', '5', '--zzz'], "unrecognized option '--zzz'"),
+            (['p', '5', '-b'], "option requires an argument -- 'b'"),
+            (['p', '5', '--banana'], "option '--banana' requires an argument"),
+            (['p', '5', '--apple=1'], "option '--apple' doesn't allow an argument"),
+            (['p', '5', '--b', 'x'], "Option '-b' requires an integer argument"),
+            (['p', '5', '-m', 'z'], "Option '-m' must be one of ['x', 'y']"),
+            (['p'], "Missing positional arguments"),
+        ]
+
+        for args, message in errors:
+            proc = self._run(exe, args)
+            self.assertIn(message, proc.stdout + proc.stderr)
+            self.assertNotEqual(0, proc.returncode)
+
+    def test_table_parser_long_only(self):
+        self.env['DUCKARGS_C_PARSER'] = 'table'
+        argv = ['duckargs']
+        for i in range(300):
+            argv += [f"--opt-{i}"] + ([] if i % 2 else [str(i)])
+
+        exe = self._compile(generate_c_code(argv + ['--optional', '--verbose'], self.env))
+
+        proc = self._run(exe, ['--opt-299', '--opt-3', '--opt-12', '7', '--opt-2=8', '--verb'])
+        self.assertIn("opt_299: true\n", proc.stdout)
+        self.assertIn("opt_3: true\n", proc.stdout)
+        self.assertIn("opt_1: false\n", proc.stdout)
+        self.assertIn("opt_12: 7\n", proc.stdout)
+        self.assertIn("opt_2: 8\n", proc.stdout)
+        self.assertIn("opt_4: 4\n", proc.stdout)
+        self.assertIn("verbose: true\n", proc.stdout)
+
+        # "--opt-29" is an option, and a prefix of "--opt-290" .. "--opt-299"
+        proc = self._run(exe, ['--opt-29'])
+        self.assertIn("opt_29: true\n", proc.stdout)
+
+        for prefix in ['--op', '--opt', '--opt-']:
+            proc = self._run(exe, [prefix])
+            self.assertIn(f"option '{prefix}' is ambiguous", proc.stderr)
+            self.assertNotEqual(0, proc.returncode)
+
+        proc = self._run(exe, ['--opti'])
+        self.assertIn("optional: true\n", proc.stdout)
+
+        proc = self._run(exe, ['-v'])
+        self.assertIn("invalid option -- 'v'", proc.stderr)
+
+    def test_reentrant_parser(self):
+        argv = ['duckargs', 'pos', '10', '-a', '--apple', '-b', '--banana', '3', '-f', '--fl', '4.5',
+                '-m', '--mode', 'x,y', '-i', '--infile', 'FILE', '-q']
+        prog_args = [
+            ['p', '5'],
+            ['-aq', 'p', '--banana=7', '5', '-mx', '--fl', '-2.5'],
+            ['--app', '-b', '0x10', 'p', '--', '-5'],
+            ['-b3', '-i', 'in.txt', '--infile=out.txt', 'p', '5', 'extra'],
+        ]
+
+        outputs = {}
+        for parser in ['getopt', 'reentrant']:
+            self.env['DUCKARGS_C_PARSER'] = parser
+            code = generate_c_code(argv, self.env)
+            exe = self._compile(code)
+            outputs[parser] = [self._run(exe, args).stdout for args in [[]] + prog_args]
+
+        self.assertEqual(outputs['getopt'], outputs['reentrant'])
+        self.assertNotIn("optind", code)
+
+        errors = [
+            (['p', '5', '-z'], "invalid option -- 'z'"),
+            (['p', '5', '--banana'], "option '--banana' requires an argument"),
+            (['p', '5', '--b', 'x'], "Option '-b' requires an integer argument"),
+            (['p', '5', '-m', 'z'], "Option '-m' must be one of ['x', 'y']"),
+            (['p', 'x'], "Positional argument #2 (positional_arg0) requires an integer argument"),
+            (['p'], "Missing positional arguments"),
+        ]
+
+        for args, message in errors:
+            proc = self._run(exe, args)
+            self.assertIn(message, proc.stdout + proc.stderr)
+            self.assertNotEqual(0, proc.returncode)
+
+    def test_reentrant_parser_many_argv(self):
+        # Parses two argv vectors into separate structs, many times in one process
+        harness_main = """
+int main(void)
+{
+    char *first[] = {"prog", "-m", "y", "p", "7", NULL};
+    char *second[] = {"prog", "--banana=3", "q", "--", "8", NULL};
+    struct program_options a;
+    struct program_options b;
+
+    for (int i = 0; i < 1000; i++)
+    {
+        init_defaults(&a);
+        init_defaults(&b);
+        if ((0 != parse_args(&a, 5, first)) || (0 != parse_args(&b, 5, second)))
+        {
+            return 1;
+        }
+    }
+
+    printf("%s %ld %ld %s %d\\n", a.pos, a.positional_arg0, a.banana, a.mode, a.mode_index);
+    printf("%s %ld %ld %s %d\\n", b.pos, b.positional_arg0, b.banana, b.mode, b.mode_index);
+    printf("%s %s\\n", first[1], second[2]);
+    return 0;
+}
+"""
+        self.env['DUCKARGS_C_PARSER'] = 'reentrant'
+        self.env['DUCKARGS_C_CHOICES'] = 'hash'
+        argv = ['duckargs', 'pos', '10', '-b', '--banana', '1', '-m', '--mode', 'x,y', '-a', '--apple']
+        exe = self._compile(generate_c_code(argv, self.env), harness_main)
+
+        proc = self._run(exe, [])
+        self.assertEqual(0, proc.returncode)
+        self.assertEqual("p 7 1 y 1\nq 8 3 x 0\n-m q\n", proc.stdout)
+
+    def test_timing(self):
+        self.env['DUCKARGS_TIMING'] = '1'
+        rgx = r"duckargs timing: parsing [0-9.]+ ms, total [0-9.]+ ms, peak RSS \d+ KB\n"
+
+        for parser in ['getopt', 'table', 'reentrant']:
+            self.env['DUCKARGS_C_PARSER'] = parser
+            exe = self._compile(generate_c_code(['duckargs', 'pos', '-a', '--apple', '3', '-q'], self.env))
+
+            proc = self._run(exe, ['x', '--duckargs-timing', '-a', '4'])
+            self.assertEqual(0, proc.returncode)
+            self.assertIn("pos: x\napple: 4\n", proc.stdout)
+            self.assertRegex(proc.stderr, rgx)
+
+            proc = self._run(exe, ['x'])
+            self.assertEqual("", proc.stderr)
+
+            proc = self._run(exe, ['--', '--duckargs-timing'])
+            self.assertIn("pos: --duckargs-timing\n", proc.stdout)
+            self.assertEqual("", proc.stderr)
+
+    def test_timing_c99(self):
+        self.env['DUCKARGS_TIMING'] = '1'
+        rgx = r"duckargs timing: parsing [0-9.]+ ms, total [0-9.]+ ms, peak RSS \d+ KB\n"
+
+        for parser in ['getopt', 'table', 'reentrant']:
+            for buffered in ['0', '1']:
+                self.env['DUCKARGS_C_PARSER'] = parser
+                self.env['DUCKARGS_C_BUFFERED'] = buffered
+                code = generate_c_code(['duckargs', 'pos', '-a', '--apple', '3', '-q'], self.env)
+                exe = self._compile(code, cflags=['-std=c99', '-pedantic'])
+
+                proc = self._run(exe, ['x', '--duckargs-timing', '-a', '4'])
+                self.assertEqual(0, proc.returncode)
+                self.assertIn("pos: x\napple: 4\n", proc.stdout)
+                self.assertRegex(proc.stderr, rgx)
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from duckargs import generate_python_code, generate_c_code
+from duckargs.batch import BatchSpec, run_batch
+from duckargs.cache import GenerationCache, cache_key, generate_cached
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        os.environ["DUCKARGS_PRINT"] = "1"
+        os.environ["DUCKARGS_COMMENT"] = "1"
+        self.tempdir = tempfile.mkdtemp()
+        self.cachedir = os.path.join(self.tempdir, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_cache_key(self):
+        argv = ['duckargs', 'pos', '-a', '--apple', '3']
+        key = cache_key('python', argv)
+
+        self.assertEqual(key, cache_key('python', list(argv)))
+        self.assertNotEqual(key, cache_key('c', argv))
+        self.assertNotEqual(key, cache_key('python', argv + ['-q']))
+
+        os.environ["DUCKARGS_PRINT"] = "0"
+        self.assertNotEqual(key, cache_key('python', argv))
+        self.assertEqual(key, cache_key('python', argv, {"DUCKARGS_PRINT": "1", "DUCKARGS_COMMENT": "1"}))
+
+    def test_cache_key_file_probe(self):
+        path = os.path.join(self.tempdir, "infile.txt")
+        argv = ['duckargs', '-f', '--file', path]
+
+        key_nofile = cache_key('python', argv)
+        with open(path, 'w') as fh:
+            fh.write("hello")
+
+        key_file = cache_key('python', argv)
+        self.assertNotEqual(key_nofile, key_file)
+
+        # Positional values have dashes replaced with underscores before probing
+        path = os.path.join(self.tempdir, "in_file")
+        argv = ['duckargs', os.path.join(self.tempdir, "in-file")]
+
+        key_nofile = cache_key('python', argv)
+        with open(path, 'w') as fh:
+            fh.write("hello")
+
+        self.assertNotEqual(key_nofile, cache_key('python', argv))
+
+    def test_get_put(self):
+        cache = GenerationCache(self.cachedir)
+        self.assertIsNone(cache.get("abcd"))
+
+        cache.put("abcd", "some code")
+        self.assertEqual(cache.get("abcd"), "some code")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        cache.clear()
+        self.assertIsNone(cache.get("abcd"))
+
+    def test_lru_eviction(self):
+        cache = GenerationCache(self.cachedir, max_size=1000)
+
+        for i in range(5):
+            cache.put(f"key{i}", "x" * 200)
+            path = cache._entry_path(f"key{i}")
+            os.utime(path, (i, i))
+
+        # Use the oldest entry, so it becomes the most recently used
+        self.assertIsNotNone(cache.get("key0"))
+
+        cache.put("key5", "x" * 200)
+
+        self.assertIsNotNone(cache.get("key0"))
+        self.assertIsNone(cache.get("key1"))
+        self.assertIsNone(cache.get("key2"))
+        self.assertIsNotNone(cache.get("key5"))
+
+        total = sum(os.path.getsize(os.path.join(self.cachedir, f)) for f in os.listdir(self.cachedir))
+        self.assertLessEqual(total, 1000)
+
+    def test_invalid_env_cache_size(self):
+        os.environ["DUCKARGS_CACHE_SIZE"] = "big"
+        try:
+            self.assertRaises(RuntimeError, GenerationCache, self.cachedir)
+        finally:
+            del os.environ["DUCKARGS_CACHE_SIZE"]
+
+    def test_generate_cached(self):
+        cache = GenerationCache(self.cachedir)
+        argv = ['duckargs', 'pos', '-a', '--apple', '3', '-q']
+
+        for target, func in [('python', generate_python_code), ('c', generate_c_code)]:
+            expected = func(argv)
+            self.assertEqual(generate_cached(target, argv, cache), expected)
+            self.assertEqual(generate_cached(target, argv, cache), expected)
+            self.assertEqual(generate_cached(target, argv, None), expected)
+
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+    def test_batch_cache(self):
+        specs = [BatchSpec(os.path.join(self.tempdir, f"out{i}.py"), [f"pos{i}", "-q"]) for i in range(3)]
+
+        cache = GenerationCache(self.cachedir)
+        self.assertEqual(run_batch(specs, 1, cache), [])
+        self.assertEqual(cache.hits, 0)
+
+        cache = GenerationCache(self.cachedir)
+        self.assertEqual(run_batch(specs, 1, cache), [])
+        self.assertEqual(cache.hits, 3)
+
+        with open(specs[0].output, 'r') as fh:
+            self.assertEqual(fh.read(), generate_python_code(("duckargs",) + specs[0].args))
@@ -2,7 +2,7 @@ import os
 import sys
 import unittest
 
-from duckargs import generate_python_code, generate_c_code
+from duckargs import generate_python_code, generate_c_code, ENV_VARS
 
 
 TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), "test_data")
@@ -12,6 +12,19 @@ class TestDuckargs(unittest.TestCase):
         # Set default env. var values
         os.environ["DUCKARGS_PRINT"] = "1"
         os.environ["DUCKARGS_COMMENT"] = "1"
+        os.environ.pop("DUCKARGS_C_CHOICES", None)
+        os.environ.pop("DUCKARGS_C_BUFFERED", None)
+        os.environ.pop("DUCKARGS_FASTPARSE", None)
+        os.environ.pop("DUCKARGS_PY_FILE", None)
+        os.environ.pop("DUCKARGS_C_FILE", None)
+        os.environ.pop("DUCKARGS_C_PARSER", None)
+        os.environ.pop("DUCKARGS_TIMING", None)
+        os.environ.pop("DUCKARGS_PY_MODULE", None)
+
+    def tearDown(self):
+        # Don't leave settings changed by a test in place for other test modules
+        for name in ENV_VARS:
+            os.environ.pop(name, None)
 
     def _run_python_test(self, test_dir_name):
         test_dir_path = os.path.join(TEST_DATA_DIR, test_dir_name)
@@ -145,6 +158,95 @@ class TestDuckargs(unittest.TestCase):
         os.environ["DUCKARGS_PRINT"] = "0"
         self._run_python_test("env_all")
 
+    def test_choices_sorted_c(self):
+        os.environ["DUCKARGS_C_CHOICES"] = "sorted"
+        self._run_c_test("choices_sorted")
+
+    def test_choices_hash_c(self):
+        os.environ["DUCKARGS_C_CHOICES"] = "hash"
+        self._run_c_test("choices_hash")
+
+    def test_c_buffered_c(self):
+        os.environ["DUCKARGS_C_BUFFERED"] = "1"
+        self._run_c_test("c_buffered")
+
+    def test_fastparse_python(self):
+        os.environ["DUCKARGS_FASTPARSE"] = "1"
+        self._run_python_test("fastparse")
+
+    def test_lazy_file_python(self):
+        os.environ["DUCKARGS_PY_FILE"] = "lazy"
+        self._run_python_test("lazy_file")
+
+    def test_invalid_env_py_file(self):
+        os.environ["DUCKARGS_PY_FILE"] = "ksfensik"
+        self.assertRaises(RuntimeError, generate_python_code, ['duckargs', '-a'])
+
+    def test_py_module_python(self):
+        os.environ["DUCKARGS_PY_MODULE"] = "1"
+        self._run_python_test("py_module")
+
+    def test_py_module_lazy_python(self):
+        os.environ["DUCKARGS_PY_MODULE"] = "lazy"
+        self._run_python_test("py_module_lazy")
+
+    def test_invalid_env_py_module(self):
+        os.environ["DUCKARGS_PY_MODULE"] = "ksfensik"
+        self.assertRaises(RuntimeError, generate_python_code, ['duckargs', '-a'])
+
+    def test_invalid_env_fastparse(self):
+        os.environ["DUCKARGS_FASTPARSE"] = "ksfensik"
+        self.assertRaises(RuntimeError, generate_python_code, ['duckargs', '-a'])
+
+    def test_mmap_file_c(self):
+        os.environ["DUCKARGS_C_FILE"] = "mmap"
+        self._run_c_test("mmap_file")
+
+    def test_invalid_env_c_file(self):
+        os.environ["DUCKARGS_C_FILE"] = "ksfensik"
+        self.assertRaises(RuntimeError, generate_c_code, ['duckargs', '-a'])
+
+    def test_table_parser_c(self):
+        os.environ["DUCKARGS_C_PARSER"] = "table"
+        self._run_c_test("table_parser")
+
+    def test_reentrant_parser_c(self):
+        os.environ["DUCKARGS_C_PARSER"] = "reentrant"
+        self._run_c_test("reentrant_parser")
+
+    def test_invalid_env_c_parser(self):
+        os.environ["DUCKARGS_C_PARSER"] = "ksfensik"
+        self.assertRaises(RuntimeError, generate_c_code, ['duckargs', '-a'])
+
+    def test_long_only_c(self):
+        self.assertRaises(ValueError, generate_c_code, ['duckargs', '--apple', '-b'])
+
+        os.environ["DUCKARGS_C_PARSER"] = "table"
+        generated_c = generate_c_code(['duckargs', '--apple', '-b', '--banana', '3'])
+        self.assertIn("{'\\0', \"apple\", OPT_FLAG, &apple}", generated_c)
+        self.assertIn("{'b', \"banana\", OPT_INT, &banana}", generated_c)
+
+        os.environ["DUCKARGS_C_PARSER"] = "reentrant"
+        generated_c = generate_c_code(['duckargs', '--apple', '-b', '--banana', '3'])
+        self.assertIn("{'\\0', \"apple\", OPT_FLAG, offsetof(struct program_options, apple)}", generated_c)
+
+    def test_timing_python(self):
+        os.environ["DUCKARGS_TIMING"] = "1"
+        self._run_python_test("timing")
+
+    def test_timing_c(self):
+        os.environ["DUCKARGS_TIMING"] = "1"
+        self._run_c_test("timing")
+
+    def test_invalid_env_timing(self):
+        os.environ["DUCKARGS_TIMING"] = "ksfensik"
+        self.assertRaises(RuntimeError, generate_python_code, ['duckargs', '-a'])
+        self.assertRaises(RuntimeError, generate_c_code, ['duckargs', '-a'])
+
+    def test_invalid_env_c_choices(self):
+        os.environ["DUCKARGS_C_CHOICES"] = "ksfensik"
+        self.assertRaises(RuntimeError, generate_c_code, ['duckargs', '-a'])
+
     def test_invalid_env_print(self):
         os.environ["DUCKARGS_PRINT"] = "ksfensik"
         self.assertRaises(RuntimeError, generate_python_code, ['duckargs', '-a'])
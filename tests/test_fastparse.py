@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+import subprocess
+import unittest
+
+from duckargs import generate_python_code
+
+
+SPEC = ['duckargs', 'pos1', 'count', '-a', '-b', '--bravo', '-i', '--int-val', '4', '-e', '0xabc',
+        '-f', '--file', 'FILE', '-c', '--color', 'red,green,blue', '-r', '--ratio', '2.5',
+        '-n', '--name', 'bob']
+
+# Arguments to run the generated programs with, covering both successful parsing
+# and each kind of error
+PROGRAM_ARGS = [
+    [],
+    ['-h'],
+    ['x', 'y'],
+    ['x', 'y', 'z'],
+    ['x'],
+    ['x', 'y', '-ab', '-i', '7', '--col', 'green', '--ratio=-1.5', '-nalice'],
+    ['-bai', '-3', 'x', 'y', '-e=0x1f'],
+    ['x', 'y', '-c', 'purple'],
+    ['x', 'y', '-i', 'abc'],
+    ['x', 'y', '-i'],
+    ['x', 'y', '-i', '-a'],
+    ['x', 'y', '-f', 'does_not_exist.txt'],
+    ['x', 'y', '-az'],
+    ['x', 'y', '--bravo=1'],
+    ['x', 'y', '--r', '1'],
+    ['x', 'y', '--zzz', '-q'],
+    ['-5', '-6.5'],
+    ['x', '--', '-a'],
+    ['x', 'y', '--', '-a'],
+    ['x', 'y', '--he'],
+]
+
+
+@unittest.skipIf(sys.version_info < (3, 10), "argparse help and error text differs before python 3.10")
+class TestFastparse(unittest.TestCase):
+    def _write_program(self, dirname, env):
+        env = dict(env, DUCKARGS_PRINT='1', DUCKARGS_COMMENT='0', DUCKARGS_PROBE='sentinel')
+        os.mkdir(dirname)
+
+        path = os.path.join(dirname, 'program.py')
+        with open(path, 'w') as fh:
+            fh.write(generate_python_code(SPEC, env))
+
+        return path
+
+    def test_same_behaviour_as_argparse(self):
+        env = dict(os.environ, COLUMNS='80')
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            argparse_program = self._write_program(os.path.join(tempdir, 'argparse'), {})
+            fast_program = self._write_program(os.path.join(tempdir, 'fast'), {'DUCKARGS_FASTPARSE': '1'})
+
+            for args in PROGRAM_ARGS:
+                results = []
+                for program in [argparse_program, fast_program]:
+                    proc = subprocess.run([sys.executable, program] + args, cwd=tempdir, env=env,
+                                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                          universal_newlines=True)
+                    results.append((proc.returncode, proc.stdout, proc.stderr))
+
+                self.assertEqual(results[0], results[1], msg=f"program arguments: {args}")
+
+    def test_no_argparse_import(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            program = self._write_program(os.path.join(tempdir, 'fast'), {'DUCKARGS_FASTPARSE': '1'})
+            code = ("import sys, runpy; sys.argv = ['program', 'x', 'y']; "
+                    f"runpy.run_path({program!r}, run_name='__main__'); "
+                    "print('argparse' in sys.modules)")
+
+            proc = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE,
+                                  universal_newlines=True, check=True)
+            self.assertEqual(proc.stdout.splitlines()[-1], 'False')
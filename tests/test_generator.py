@@ -0,0 +1,57 @@
+import unittest
+
+import duckargs
+from duckargs import Generator, generate_code, parse_spec, register_backend
+from duckargs.probe import FileProbe, PROBE_SENTINEL
+
+
+ARGV = ['duckargs', 'infile', '-n', '--count', '10', '-c', '--color', 'red,green', '-q', '--quiet',
+        '-i', '--int']
+
+ENVS = [
+    {},
+    {'DUCKARGS_PRINT': '0', 'DUCKARGS_COMMENT': '0'},
+    {'DUCKARGS_FASTPARSE': '1', 'DUCKARGS_PY_FILE': 'lazy', 'DUCKARGS_TIMING': '1'},
+    {'DUCKARGS_C_CHOICES': 'hash', 'DUCKARGS_C_BUFFERED': '1', 'DUCKARGS_C_PARSER': 'table'}
+]
+
+
+class TestGenerator(unittest.TestCase):
+    def tearDown(self):
+        duckargs.TARGETS.pop('python-env', None)
+
+    def test_same_as_generate_code(self):
+        for env in ENVS:
+            env = dict(env, DUCKARGS_PROBE=PROBE_SENTINEL)
+            generator = Generator(env)
+
+            for target in ['python', 'c']:
+                expected = generate_code(target, ARGV, env)
+                self.assertEqual(generator.generate(ARGV, target), expected)
+                self.assertEqual(''.join(generator.iter_code(ARGV, target)), expected)
+
+                spec = parse_spec(ARGV, FileProbe(PROBE_SENTINEL))
+                self.assertEqual(generator.generate(spec, target), generate_code(target, spec, env))
+
+    def test_settings_read_once(self):
+        env = {'DUCKARGS_PROBE': PROBE_SENTINEL, 'DUCKARGS_COMMENT': '0', 'HOME': '/'}
+        generator = Generator(env)
+        self.assertEqual(generator.env, {'DUCKARGS_PROBE': PROBE_SENTINEL, 'DUCKARGS_COMMENT': '0'})
+
+        env['DUCKARGS_COMMENT'] = '1'
+        self.assertEqual(generator.generate(ARGV), generate_code('python', ARGV, dict(env, DUCKARGS_COMMENT='0')))
+
+    def test_errors(self):
+        generator = Generator({'DUCKARGS_C_PARSER': 'bad', 'DUCKARGS_PROBE': PROBE_SENTINEL})
+
+        # Settings are only read for targets that are used
+        generator.generate(ARGV, 'python')
+        self.assertRaises(RuntimeError, generator.generate, ARGV, 'c')
+        self.assertRaises(ValueError, generator.generate, ARGV, 'cobol')
+        self.assertRaises(ValueError, generator.generate, ['duckargs', '-a', '-a'], 'python')
+
+    def test_backend_without_settings(self):
+        register_backend('python-env', 'duckargs.python', 'generate_python_code', 'iter_python_code')
+        env = {'DUCKARGS_PROBE': PROBE_SENTINEL, 'DUCKARGS_FASTPARSE': '1'}
+
+        self.assertEqual(Generator(env).generate(ARGV, 'python-env'), generate_code('python', ARGV, env))
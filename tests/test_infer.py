@@ -0,0 +1,71 @@
+import random
+import unittest
+
+from duckargs.core import TokenClass, classify_token, classify_tokens, infer_type, ArgType
+
+
+def _reference_classify(token):
+    # Classification using the int() / float() conversions directly, which
+    # classify_token must always agree with
+    try:
+        int(token)
+    except ValueError:
+        pass
+    else:
+        return TokenClass.INT
+
+    if ((len(token) >= 3) and (token[:2].lower() == "0x")) or \
+       ((len(token) >= 4) and (token[:3].lower() == "-0x")):
+        try:
+            int(token, 16)
+        except ValueError:
+            pass
+        else:
+            return TokenClass.HEX
+
+    try:
+        float(token)
+    except ValueError:
+        pass
+    else:
+        return TokenClass.FLOAT
+
+    if token == 'FILE':
+        return TokenClass.FILE
+
+    return TokenClass.STRING
+
+
+TOKENS = [
+    '0', '12', '-12', '+12', '007', '1_000', '1__000', '_1', '1_', ' 12 ', '\t-3\n', '١٢',
+    '0x1f', '0X1F', '-0x1f', '+0x1f', '0x', '-0x', '0x_1f', '0x1_f', '0x1__f', '0xg', ' 0x1f', '0x1f ',
+    '1.5', '-1.5', '.5', '5.', '.', '-.', '1e5', '1E-5', '-1.5e+3', 'e5', '1e', '1.5e', '1_0.5',
+    '1_.5', '1._5', '1e1_0', 'inf', '-Infinity', 'NaN', '+nan', 'infin', 'nana',
+    'FILE', 'file', 'FILES', '', '-', '--', '-a', '--apple', 'apple', 'a,b,c', 'x-y', '1-2', '1.2.3',
+]
+
+
+class TestClassifyToken(unittest.TestCase):
+    def test_tokens_match_reference(self):
+        for token in TOKENS:
+            self.assertEqual(_reference_classify(token), classify_token(token), repr(token))
+
+    def test_random_tokens_match_reference(self):
+        rng = random.Random(1234)
+        alphabet = '0123456789xXeE._+- abfFILn'
+
+        for _ in range(20000):
+            token = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 8)))
+            self.assertEqual(_reference_classify(token), classify_token(token), repr(token))
+
+    def test_classify_tokens(self):
+        tokens = TOKENS * 3
+        self.assertEqual([classify_token(t) for t in tokens], classify_tokens(tokens))
+        self.assertEqual([], classify_tokens([]))
+
+    def test_infer_type(self):
+        self.assertEqual(ArgType.INT, infer_type('-0x1f'))
+        self.assertEqual(ArgType.INT, infer_type('12'))
+        self.assertEqual(ArgType.FLOAT, infer_type('-1.5'))
+        self.assertEqual(ArgType.FILE, infer_type('FILE'))
+        self.assertEqual(ArgType.STRING, infer_type('apple'))
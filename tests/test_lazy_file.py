@@ -0,0 +1,86 @@
+import io
+import os
+import sys
+import contextlib
+import argparse
+import tempfile
+import subprocess
+import unittest
+
+from duckargs import generate_python_code
+
+
+SPEC = ['duckargs', 'FILE', '-f', '--file', 'FILE']
+
+
+def _load_program(env):
+    # Returns the global namespace of a generated program, without running main()
+    env = dict(env, DUCKARGS_PY_FILE='lazy', DUCKARGS_PROBE='sentinel')
+    namespace = {'__name__': 'generated'}
+    exec(generate_python_code(SPEC, env), namespace)
+    return namespace
+
+
+class TestLazyFile(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'data.bin')
+        self.data = bytes(range(256)) * 1000
+
+        with open(self.path, 'wb') as fh:
+            fh.write(self.data)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_lazy_file_access(self):
+        LazyFile = _load_program({})['LazyFile']
+        lazy = LazyFile(self.path)
+
+        self.assertEqual(os.fspath(lazy), self.path)
+
+        mapped = lazy.mmap()
+        self.assertEqual(mapped[:], self.data)
+        mapped.close()
+
+        self.assertEqual(b''.join(bytes(c) for c in lazy.chunks(4096)), self.data)
+        self.assertTrue(all(len(c) == 4096 for c in list(lazy.chunks(4096))[:-1]))
+
+        with lazy.open('rb') as fh:
+            self.assertEqual(fh.read(), self.data)
+
+        empty_path = os.path.join(self.tempdir.name, 'empty')
+        open(empty_path, 'w').close()
+        self.assertEqual(LazyFile(empty_path).mmap(), b'')
+        self.assertEqual(list(LazyFile(empty_path).chunks()), [])
+
+        missing_path = os.path.join(self.tempdir.name, 'missing')
+        self.assertRaises(argparse.ArgumentTypeError, LazyFile, missing_path)
+
+    def test_lazy_file_fastparse(self):
+        program = _load_program({'DUCKARGS_FASTPARSE': '1'})
+        args = program['parse_args']([self.path, '-f', '-'])
+
+        self.assertIsInstance(args.FILE, program['LazyFile'])
+        self.assertEqual(b''.join(bytes(c) for c in args.FILE.chunks()), self.data)
+        self.assertEqual(args.file.path, '-')
+
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            self.assertRaises(SystemExit, program['parse_args'], [self.path + '.missing'])
+
+        self.assertIn("argument FILE: can't open", stderr.getvalue())
+
+    def test_stdin_chunks(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            program = os.path.join(tempdir, 'program.py')
+            with open(program, 'w') as fh:
+                fh.write(generate_python_code(SPEC, {'DUCKARGS_PY_FILE': 'lazy',
+                                                     'DUCKARGS_PROBE': 'sentinel'}))
+
+            code = (f"import runpy; ns = runpy.run_path({program!r}); "
+                    "print(sum(len(c) for c in ns['LazyFile']('-').chunks(1000)))")
+
+            proc = subprocess.run([sys.executable, '-c', code], input=self.data,
+                                  stdout=subprocess.PIPE, check=True)
+            self.assertEqual(int(proc.stdout), len(self.data))
@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+import subprocess
+import unittest
+
+from duckargs import generate_python_code
+from duckargs.__main__ import _split_args, _long_only_allowed
+
+
+class TestMain(unittest.TestCase):
+    def test_split_args(self):
+        self.assertEqual(_split_args(['duckargs']), ({}, ['duckargs']))
+        self.assertEqual(_split_args(['duckargs', '-a', '--no-cache']),
+                         ({}, ['duckargs', '-a', '--no-cache']))
+        self.assertEqual(_split_args(['duckargs', '--no-cache', '-a', '--apple']),
+                         ({'--no-cache': True}, ['duckargs', '-a', '--apple']))
+        self.assertEqual(_split_args(['duckargs', '--no-cache', '--', '--x']),
+                         ({'--no-cache': True}, ['duckargs', '--x']))
+
+        # Unknown long option is left for the code generator to report
+        self.assertEqual(_split_args(['duckargs', '--apple', '-a']),
+                         ({}, ['duckargs', '--apple', '-a']))
+
+    def test_split_args_output(self):
+        self.assertEqual(_split_args(['duckargs', '--output', 'out.py', '-a']),
+                         ({'--output': 'out.py'}, ['duckargs', '-a']))
+        self.assertEqual(_split_args(['duckargs', '--no-cache', '-o', 'out.py', '-a']),
+                         ({'--no-cache': True, '--output': 'out.py'}, ['duckargs', '-a']))
+
+        # '-o' alone describes an option of the program to generate
+        self.assertEqual(_split_args(['duckargs', '-o', 'out.py']),
+                         ({}, ['duckargs', '-o', 'out.py']))
+        self.assertRaises(ValueError, _split_args, ['duckargs', '--output'])
+
+    def test_split_args_require_separator(self):
+        # Long options may describe the program, so '--' is needed after duckargs options
+        argv = ['duckargs', '--output', '3', '-a']
+        self.assertEqual(_split_args(argv, True), ({}, argv))
+        self.assertEqual(_split_args(['duckargs', '--output', '3', '--', '-a'], True),
+                         ({'--output': '3'}, ['duckargs', '-a']))
+        self.assertEqual(_split_args(['duckargs', '--no-cache', '@spec.txt'], True),
+                         ({'--no-cache': True}, ['duckargs', '@spec.txt']))
+        self.assertEqual(_split_args(['duckargs', '--verbose', '-a'], True),
+                         ({}, ['duckargs', '--verbose', '-a']))
+        self.assertEqual(_split_args(['duckargs', '--serve-stop'], True),
+                         ({'--serve-stop': True}, ['duckargs']))
+
+    def test_long_only_allowed(self):
+        self.assertFalse(_long_only_allowed({}))
+        self.assertFalse(_long_only_allowed({'DUCKARGS_C_PARSER': 'getopt'}))
+        self.assertTrue(_long_only_allowed({'DUCKARGS_C_PARSER': 'table'}))
+        self.assertTrue(_long_only_allowed({'DUCKARGS_C_PARSER': 'reentrant'}))
+
+    def test_c_parser_setting_ignored_for_python(self):
+        # '--' is only needed after duckargs options when generating C code
+        with tempfile.TemporaryDirectory() as tempdir:
+            output = os.path.join(tempdir, 'out.py')
+            env = dict(os.environ, DUCKARGS_C_PARSER='table', DUCKARGS_PROBE='sentinel')
+            env['PYTHONPATH'] = os.getcwd()
+            proc = subprocess.run([sys.executable, '-c', 'from duckargs.__main__ import '
+                                   'duckargs_python; duckargs_python()', '--no-daemon',
+                                   '--output', output, '-a'], env=env, stdout=subprocess.PIPE,
+                                  universal_newlines=True)
+            self.assertEqual(proc.stdout, "")
+
+            with open(output, 'r') as fh:
+                self.assertEqual(fh.read(), generate_python_code(['duckargs', '-a'],
+                                                                 {'DUCKARGS_PROBE': 'sentinel'}))
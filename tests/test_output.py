@@ -0,0 +1,82 @@
+import io
+import os
+import stat
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from duckargs import generate_code, iter_code, write_code, iter_python_code, iter_c_code
+from duckargs.output import write_atomic
+
+
+class TestOutput(unittest.TestCase):
+    def setUp(self):
+        os.environ["DUCKARGS_PRINT"] = "1"
+        os.environ["DUCKARGS_COMMENT"] = "1"
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_iter_code(self):
+        argv = ['duckargs', 'pos', '-a', '--apple', '3', '-b', '--banana', 'x,y', '-q']
+        for target in ['python', 'c']:
+            chunks = list(iter_code(target, argv))
+            self.assertGreater(len(chunks), 1)
+            self.assertEqual(generate_code(target, argv), ''.join(chunks))
+
+            fh = io.StringIO()
+            write_code(target, fh, argv)
+            self.assertEqual(generate_code(target, argv), fh.getvalue())
+
+    def test_iter_code_errors(self):
+        # Errors are raised when the first chunk is requested
+        for func in [iter_python_code, iter_c_code]:
+            chunks = func(['duckargs', '-a', '-a'])
+            self.assertRaises(ValueError, next, chunks)
+
+    def test_write_atomic(self):
+        path = os.path.join(self.tempdir, "subdir", "out.txt")
+        self.assertEqual(5, write_atomic(path, ["he", "llo"]))
+
+        with open(path, 'r') as fh:
+            self.assertEqual("hello", fh.read())
+
+        os.chmod(path, 0o640)
+        write_atomic(path, ["world"])
+        self.assertEqual(0o640, stat.S_IMODE(os.stat(path).st_mode))
+
+        def failing_chunks():
+            yield "partial"
+            raise ValueError("failed")
+
+        self.assertRaises(ValueError, write_atomic, path, failing_chunks())
+
+        # Original file is unchanged, and no temporary files are left behind
+        with open(path, 'r') as fh:
+            self.assertEqual("world", fh.read())
+
+        self.assertEqual(["out.txt"], os.listdir(os.path.dirname(path)))
+
+    def test_write_atomic_new_file_mode(self):
+        path = os.path.join(self.tempdir, "new.txt")
+        old_umask = os.umask(0o027)
+        try:
+            # The umask must never be changed, since other threads may be creating files
+            with mock.patch('os.umask', side_effect=AssertionError("umask changed")):
+                write_atomic(path, ["new"])
+        finally:
+            os.umask(old_umask)
+
+        self.assertEqual(0o640, stat.S_IMODE(os.stat(path).st_mode))
+
+        write_atomic(path, ["newer"], mode=0o600)
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(path).st_mode))
+
+    def test_large_spec(self):
+        argv = ['duckargs'] + [f"pos{i}" for i in range(5000)]
+        for target in ['python', 'c']:
+            path = os.path.join(self.tempdir, f"large.{target}")
+            size = write_atomic(path, iter_code(target, argv))
+            self.assertEqual(len(generate_code(target, argv).encode('utf-8')), size)
@@ -0,0 +1,100 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from duckargs import generate_python_code, ArgType
+from duckargs.core import process_args
+from duckargs.probe import FileProbe, probe_policy, PROBE_ALWAYS, PROBE_SENTINEL, PROBE_NEVER
+
+
+class CountingProbe(FileProbe):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checked = []
+
+    def _check(self, path):
+        self.checked.append(path)
+        return super()._check(path)
+
+
+class TestProbe(unittest.TestCase):
+    def setUp(self):
+        os.environ.pop("DUCKARGS_PROBE", None)
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, "infile.txt")
+        with open(self.path, 'w') as fh:
+            fh.write("hello")
+
+    def tearDown(self):
+        os.environ.pop("DUCKARGS_PROBE", None)
+        shutil.rmtree(self.tempdir)
+
+    def _types(self, args, probe):
+        return [o.type for o in process_args(None, ['duckargs'] + args, probe)]
+
+    def test_policies(self):
+        args = ['-a', '--apple', self.path, '-b', '--banana', 'FILE', '-c', '--cherry', 'abc']
+
+        self.assertEqual([ArgType.FILE, ArgType.FILE, ArgType.STRING],
+                         self._types(args, FileProbe(PROBE_ALWAYS)))
+        self.assertEqual([ArgType.STRING, ArgType.FILE, ArgType.STRING],
+                         self._types(args, FileProbe(PROBE_SENTINEL)))
+        self.assertEqual([ArgType.STRING, ArgType.STRING, ArgType.STRING],
+                         self._types(args, FileProbe(PROBE_NEVER)))
+
+    def test_policy_from_env(self):
+        self.assertEqual(PROBE_ALWAYS, probe_policy({}))
+        self.assertEqual(PROBE_NEVER, probe_policy({'DUCKARGS_PROBE': 'never'}))
+        self.assertRaises(RuntimeError, probe_policy, {'DUCKARGS_PROBE': 'sometimes'})
+        self.assertRaises(ValueError, FileProbe, 'sometimes')
+
+        os.environ["DUCKARGS_PROBE"] = "sentinel"
+        code = generate_python_code(['duckargs', '-a', '--apple', self.path])
+        self.assertNotIn("FileType", code)
+
+        os.environ["DUCKARGS_PROBE"] = "always"
+        code = generate_python_code(['duckargs', '-a', '--apple', self.path])
+        self.assertIn("FileType", code)
+
+    def test_base_dir(self):
+        args = ['-a', '--apple', 'infile.txt']
+        self.assertEqual([ArgType.STRING], self._types(args, FileProbe()))
+        self.assertEqual([ArgType.FILE], self._types(args, FileProbe(base_dir=self.tempdir)))
+
+    def test_cache(self):
+        probe = CountingProbe()
+        args = ['-a', '--apple', self.path, '-b', '--banana', 'abc', '-c', '--cherry', '3', 'pos']
+
+        self._types(args, probe)
+        self._types(args, probe)
+        self.assertEqual(sorted([self.path, 'abc', 'pos']), sorted(probe.checked))
+
+        probe = CountingProbe(PROBE_SENTINEL)
+        self._types(args, probe)
+        self.assertEqual([], probe.checked)
+
+    def test_prefetch(self):
+        probe = CountingProbe()
+        paths = [os.path.join(self.tempdir, f"file{i}") for i in range(100)]
+        for path in paths[::2]:
+            with open(path, 'w') as fh:
+                fh.write("hello")
+
+        probe.prefetch(paths + paths)
+        self.assertEqual(sorted(paths), sorted(probe.checked))
+
+        for i, path in enumerate(paths):
+            self.assertEqual((i % 2) == 0, probe.isfile(path))
+
+        self.assertEqual(100, len(probe.checked))
+
+    def test_pickle(self):
+        probe = FileProbe(base_dir=self.tempdir)
+        probe.prefetch(['infile.txt', 'nofile.txt'])
+
+        copy = pickle.loads(pickle.dumps(probe))
+        self.assertEqual(self.tempdir, copy.base_dir)
+        self.assertTrue(copy.isfile('infile.txt'))
+        self.assertFalse(copy.isfile('nofile.txt'))
@@ -0,0 +1,83 @@
+import os
+import json
+import tempfile
+import unittest
+
+from duckargs import generate_python_code, generate_c_code
+from duckargs import profiling
+
+
+ARGV = ['duckargs', 'pos', '-a', '--apple', '3', '-f', '--file', 'FILE', '-q']
+ENV = {'DUCKARGS_PROBE': 'sentinel'}
+
+PROCESS_PHASES = [profiling.PHASE_TOKENIZE, profiling.PHASE_PROBE, profiling.PHASE_FINALIZE,
+                  profiling.PHASE_CHECK_DUPLICATES, profiling.PHASE_RENAME_RESERVED]
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.records = []
+
+    def tearDown(self):
+        profiling.remove_hook(self.records.append)
+
+    def test_disabled(self):
+        self.assertIs(profiling.phase(profiling.PHASE_TOKENIZE), profiling._NULL_PHASE)
+
+        chunks = iter(['a', 'b'])
+        self.assertIs(profiling.profile_chunks('python', {}, chunks), chunks)
+
+    def test_hook(self):
+        profiling.add_hook(self.records.append)
+        code = generate_c_code(ARGV, ENV)
+        profiling.remove_hook(self.records.append)
+
+        self.assertEqual(code, generate_c_code(ARGV, ENV))
+        self.assertEqual(1, len(self.records))
+
+        record = self.records[0]
+        self.assertEqual('c', record['target'])
+        self.assertNotIn('peak_bytes', record)
+        self.assertEqual(set(PROCESS_PHASES + [profiling.PHASE_EMIT]), set(record['phases']))
+        self.assertEqual(len(ARGV) - 1, record['phases'][profiling.PHASE_TOKENIZE]['calls'])
+        self.assertEqual(4, record['phases'][profiling.PHASE_FINALIZE]['calls'])
+
+        # Time in each phase is exclusive, so the total is never more than the whole generation
+        total = sum(p['seconds'] for p in record['phases'].values())
+        self.assertLessEqual(total, record['seconds'])
+
+    def test_trace_memory(self):
+        profiling.add_hook(self.records.append, trace_memory=True)
+        generate_python_code(ARGV, ENV)
+
+        record = self.records[0]
+        self.assertGreater(record['peak_bytes'], 0)
+        self.assertGreater(record['phases'][profiling.PHASE_EMIT]['alloc_bytes'], 0)
+
+    def test_error(self):
+        profiling.add_hook(self.records.append)
+        self.assertRaises(ValueError, generate_python_code, ['duckargs', '-a', '-a'], ENV)
+
+        self.assertEqual(1, len(self.records))
+        self.assertIn("ValueError", self.records[0]['error'])
+        self.assertNotIn(profiling.PHASE_RENAME_RESERVED, self.records[0]['phases'])
+
+    def test_json_lines(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, 'profile.jsonl')
+            env = dict(ENV, DUCKARGS_PROFILE=path, DUCKARGS_PROFILE_MEMORY='1')
+
+            generate_python_code(ARGV, env)
+            generate_c_code(ARGV, env)
+
+            with open(path, 'r') as fh:
+                records = [json.loads(line) for line in fh]
+
+        self.assertEqual(['python', 'c'], [r['target'] for r in records])
+        for record in records:
+            self.assertIn('peak_bytes', record)
+            self.assertIn('alloc_bytes', record['phases'][profiling.PHASE_TOKENIZE])
+
+    def test_invalid_env_profile_memory(self):
+        env = dict(ENV, DUCKARGS_PROFILE='-', DUCKARGS_PROFILE_MEMORY='ksfensik')
+        self.assertRaises(RuntimeError, generate_python_code, ARGV, env)
@@ -0,0 +1,85 @@
+import io
+import os
+import sys
+import tempfile
+import importlib.util
+import subprocess
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+
+from duckargs import generate_python_code
+
+
+SPEC = ['duckargs', 'pos1', '-a', '-i', '--int-val', '4', '-c', '--color', 'red,green,blue',
+        '-n', '--name', 'bob']
+
+ENV = {'DUCKARGS_PRINT': '1', 'DUCKARGS_COMMENT': '0', 'DUCKARGS_PROBE': 'sentinel'}
+
+
+class TestPyModule(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def _write_program(self, name, env):
+        path = os.path.join(self.tempdir.name, f"{name}.py")
+        with open(path, 'w') as fh:
+            fh.write(generate_python_code(SPEC, dict(ENV, **env)))
+
+        return path
+
+    def _import_program(self, name, env):
+        spec = importlib.util.spec_from_file_location(name, self._write_program(name, env))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def _check_parse(self, module):
+        for i in range(100):
+            args = module.parse(['x', '-a', '-i', str(i), '--color', 'green'])
+            self.assertEqual((args.pos1, args.a, args.int_val, args.color, args.name),
+                             ('x', True, i, 'green', 'bob'))
+
+        args = module.parse(['y'])
+        self.assertEqual((args.pos1, args.a, args.int_val, args.color), ('y', False, 4, 'red'))
+
+        with redirect_stderr(io.StringIO()):
+            self.assertRaises(SystemExit, module.parse, ['x', '-c', 'purple'])
+            self.assertRaises(SystemExit, module.parse, [])
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            module.run(['z', '-n', 'alice'])
+
+        self.assertEqual(out.getvalue(), "z\nFalse\n4\nred\nalice\n")
+
+    def test_eager(self):
+        module = self._import_program('eager', {'DUCKARGS_PY_MODULE': '1'})
+        parser = module.PARSER
+        self.assertIsNotNone(parser)
+
+        self._check_parse(module)
+        self.assertIs(module.PARSER, parser)
+
+    def test_lazy(self):
+        module = self._import_program('lazy', {'DUCKARGS_PY_MODULE': 'lazy'})
+        self.assertIsNone(module.PARSER)
+
+        self._check_parse(module)
+        parser = module.PARSER
+        self.assertIsNotNone(parser)
+        self.assertIs(module.get_parser(), parser)
+
+    def test_fastparse(self):
+        module = self._import_program('fast', {'DUCKARGS_PY_MODULE': 'lazy', 'DUCKARGS_FASTPARSE': '1'})
+        self._check_parse(module)
+
+    def test_main(self):
+        for name, env in [('eager_main', {'DUCKARGS_PY_MODULE': '1'}),
+                          ('lazy_main', {'DUCKARGS_PY_MODULE': 'lazy', 'DUCKARGS_TIMING': '1'})]:
+            path = self._write_program(name, env)
+            proc = subprocess.run([sys.executable, path, 'x', '-i', '7'], stdout=subprocess.PIPE,
+                                  universal_newlines=True, check=True)
+            self.assertEqual(proc.stdout, "x\nFalse\n7\nred\nbob\n")
@@ -0,0 +1,168 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+from duckargs import generate_python_code, generate_c_code
+from duckargs import client, server
+from duckargs.server import GenerationServer, LatencyStats
+
+
+ENV_VARS = ['DUCKARGS_PRINT', 'DUCKARGS_COMMENT']
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "Unix domain sockets not available")
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        os.environ["DUCKARGS_PRINT"] = "1"
+        os.environ["DUCKARGS_COMMENT"] = "1"
+        self.tempdir = tempfile.mkdtemp()
+        self.sockpath = os.path.join(self.tempdir, "duckargs.sock")
+        self.server = None
+        self.thread = None
+
+    def tearDown(self):
+        if self.server is not None:
+            client.send_request({'cmd': 'shutdown'}, self.sockpath)
+            self.thread.join(5.0)
+
+        shutil.rmtree(self.tempdir)
+
+    def _start_server(self, idle_timeout=None):
+        self.server = GenerationServer(self.sockpath, idle_timeout)
+        self.thread = threading.Thread(target=self.server.serve)
+        self.thread.start()
+
+    def test_not_running(self):
+        self.assertIsNone(client.generate('python', ['duckargs', '-a'], ENV_VARS, self.sockpath))
+
+        # Stale socket file, with nothing listening
+        with open(self.sockpath, 'w') as fh:
+            pass
+
+        self.assertIsNone(client.generate('python', ['duckargs', '-a'], ENV_VARS, self.sockpath))
+
+    def test_generate(self):
+        self._start_server()
+        argv = ['duckargs', 'pos', '-a', '--apple', '3', '-q']
+
+        self.assertEqual(client.generate('python', argv, ENV_VARS, self.sockpath), generate_python_code(argv))
+        self.assertEqual(client.generate('c', argv, ENV_VARS, self.sockpath), generate_c_code(argv))
+
+        os.environ["DUCKARGS_PRINT"] = "0"
+        self.assertEqual(client.generate('c', argv, ENV_VARS, self.sockpath), generate_c_code(argv))
+
+        stats = client.send_request({'cmd': 'stats'}, self.sockpath)['stats']
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['errors'], 0)
+
+    def test_generate_cwd(self):
+        self._start_server()
+        with open(os.path.join(self.tempdir, "infile.txt"), 'w') as fh:
+            fh.write("hello")
+
+        argv = ['duckargs', '-f', '--file', 'infile.txt']
+        old_cwd = os.getcwd()
+        os.chdir(self.tempdir)
+        try:
+            expected = generate_python_code(argv)
+            self.assertEqual(client.generate('python', argv, ENV_VARS, self.sockpath), expected)
+        finally:
+            os.chdir(old_cwd)
+
+        self.assertIn("argparse.FileType()", expected)
+
+    def test_generate_errors(self):
+        self._start_server()
+
+        self.assertRaises(ValueError, client.generate, 'python', ['duckargs', '-a', '-a'],
+                          ENV_VARS, self.sockpath)
+
+        os.environ["DUCKARGS_PRINT"] = "ksfensik"
+        self.assertRaises(RuntimeError, client.generate, 'python', ['duckargs', '-a'],
+                          ENV_VARS, self.sockpath)
+
+        response = client.send_request({'target': 'rust', 'argv': ['duckargs']}, self.sockpath)
+        self.assertFalse(response['ok'])
+
+        stats = client.send_request({'cmd': 'stats'}, self.sockpath)['stats']
+        self.assertEqual(stats['errors'], 3)
+
+    def test_already_running(self):
+        self._start_server()
+        self.assertRaises(RuntimeError, GenerationServer, self.sockpath)
+
+    def test_stale_socket(self):
+        # Socket left behind by a server that didn't exit cleanly
+        old_umask = os.umask(0o177)
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(self.sockpath)
+            sock.close()
+        finally:
+            os.umask(old_umask)
+
+        self._start_server()
+        argv = ['duckargs', '-a']
+        self.assertEqual(client.generate('python', argv, ENV_VARS, self.sockpath), generate_python_code(argv))
+
+    def test_existing_file(self):
+        # Never removed, since it isn't a socket created by a server
+        with open(self.sockpath, 'w') as fh:
+            fh.write("data")
+
+        self.assertRaises(RuntimeError, GenerationServer, self.sockpath)
+        self.assertTrue(os.path.isfile(self.sockpath))
+
+    def test_untrusted_socket(self):
+        self._start_server()
+        argv = ['duckargs', '-a']
+
+        # Other users could have created the socket, or can connect to it
+        os.chmod(self.sockpath, 0o666)
+        try:
+            self.assertFalse(client.is_trusted_socket(self.sockpath))
+            self.assertIsNone(client.generate('python', argv, ENV_VARS, self.sockpath))
+        finally:
+            os.chmod(self.sockpath, 0o600)
+
+        self.assertTrue(client.is_trusted_socket(self.sockpath))
+        self.assertFalse(client.is_trusted_socket(self.tempdir))
+
+    def test_version_mismatch(self):
+        self._start_server()
+        argv = ['duckargs', '-a']
+
+        old_version = server.__version__
+        server.__version__ = "0.0.0"
+        try:
+            self.assertIsNone(client.generate('python', argv, ENV_VARS, self.sockpath))
+            self.assertIsNotNone(client.send_request({'cmd': 'stats'}, self.sockpath, check_version=False))
+        finally:
+            server.__version__ = old_version
+
+        self.assertEqual(client.generate('python', argv, ENV_VARS, self.sockpath), generate_python_code(argv))
+
+    def test_idle_timeout(self):
+        self._start_server(idle_timeout=0.1)
+        self.thread.join(5.0)
+        self.assertFalse(self.thread.is_alive())
+        self.assertFalse(os.path.exists(self.sockpath))
+        self.server = None
+
+    def test_latency_stats(self):
+        stats = LatencyStats()
+        self.assertEqual(stats.to_dict(), {'requests': 0, 'errors': 0})
+
+        for i in range(1, 101):
+            stats.add(i / 1000.0, ok=(i != 50))
+
+        d = stats.to_dict()
+        self.assertEqual(d['requests'], 100)
+        self.assertEqual(d['errors'], 1)
+        self.assertAlmostEqual(d['min_ms'], 1.0)
+        self.assertAlmostEqual(d['max_ms'], 100.0)
+        self.assertAlmostEqual(d['mean_ms'], 50.5)
+        self.assertAlmostEqual(d['p50_ms'], 51.0)
+        self.assertAlmostEqual(d['p99_ms'], 100.0)
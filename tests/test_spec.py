@@ -0,0 +1,92 @@
+import os
+import unittest
+
+from duckargs import generate_python_code, generate_c_code, ArgType
+from duckargs.spec import OptSpec, Spec, parse_spec
+
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), "test_data")
+
+
+class TestSpec(unittest.TestCase):
+    def setUp(self):
+        os.environ["DUCKARGS_PRINT"] = "1"
+        os.environ["DUCKARGS_COMMENT"] = "1"
+
+    def _test_data_args(self):
+        for name in sorted(os.listdir(TEST_DATA_DIR)):
+            args_path = os.path.join(TEST_DATA_DIR, name, "args.txt")
+            if os.path.isfile(args_path):
+                with open(args_path, 'r') as fh:
+                    yield name, fh.read().strip().split()
+
+    def test_generate_from_spec(self):
+        for name, args in self._test_data_args():
+            spec = parse_spec(args)
+            self.assertEqual(generate_python_code(spec), generate_python_code(args), name)
+            self.assertEqual(generate_c_code(spec), generate_c_code(args), name)
+
+    def test_json_round_trip(self):
+        for name, args in self._test_data_args():
+            spec = parse_spec(args)
+            self.assertEqual(Spec.from_json(spec.to_json()), spec, name)
+            self.assertEqual(Spec.from_dict(spec.to_dict()), spec, name)
+
+    def test_parse_spec(self):
+        spec = parse_spec(['duckargs', 'pos', '-i', '--intval', '0x1f', '-q', '-m', '--mode', 'a,b,c',
+                           '-f', '--file', 'FILE', '-d', '--dec', '2.5'])
+
+        self.assertEqual(spec.args, ('pos', '-i', '--intval', '0x1f', '-q', '-m', '--mode', 'a,b,c',
+                                     '-f', '--file', 'FILE', '-d', '--dec', '2.5'))
+        self.assertEqual(list(spec), [
+            OptSpec(OptSpec.POSITIONAL, var_name='pos', type=ArgType.STRING, default='pos'),
+            OptSpec(OptSpec.OPTION, '-i', '--intval', 'intval', ArgType.INT, '0x1f'),
+            OptSpec(OptSpec.FLAG, '-q', var_name='q'),
+            OptSpec(OptSpec.OPTION, '-m', '--mode', 'mode', ArgType.STRING, 'a', ('a', 'b', 'c')),
+            OptSpec(OptSpec.OPTION, '-f', '--file', 'file', ArgType.FILE, None),
+            OptSpec(OptSpec.OPTION, '-d', '--dec', 'dec', ArgType.FLOAT, '2.5'),
+        ])
+
+    def test_build_programmatically(self):
+        spec = Spec([
+            OptSpec('positional', default='infile'),
+            OptSpec('option', '-i', '--intval', default='12'),
+            OptSpec('option', '-m', '--mode', choices=['fast', 'slow']),
+            OptSpec('option', '-f', '--file', type=ArgType.FILE),
+            OptSpec('flag', '-q', '--quiet'),
+        ])
+
+        args = ['duckargs', 'infile', '-i', '--intval', '12', '-m', '--mode', 'fast,slow',
+                '-f', '--file', 'FILE', '-q', '--quiet']
+
+        self.assertEqual(list(spec.args), args[1:])
+        self.assertEqual(generate_python_code(spec), generate_python_code(args))
+        self.assertEqual(generate_c_code(spec), generate_c_code(args))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, OptSpec, 'thing', '-a')
+        self.assertRaises(ValueError, OptSpec, 'flag')
+        self.assertRaises(ValueError, OptSpec, 'flag', '-ab')
+        self.assertRaises(ValueError, OptSpec, 'flag', '-a', '-apple')
+        self.assertRaises(ValueError, OptSpec, 'flag', '-a', default='1')
+        self.assertRaises(ValueError, OptSpec, 'option', '-a')
+        self.assertRaises(ValueError, OptSpec, 'option', '-a', type=ArgType.INT)
+        self.assertRaises(ValueError, OptSpec, 'option', '-a', choices=['x'])
+        self.assertRaises(ValueError, OptSpec, 'option', '-a', default='z', choices=['x', 'y'])
+        self.assertRaises(ValueError, OptSpec, 'option', '-a', type=ArgType.INT, choices=['1', '2'])
+        self.assertRaises(ValueError, OptSpec, 'positional', '-a', default='x')
+        self.assertRaises(ValueError, OptSpec, 'positional', default='1.5')
+        self.assertRaises(ValueError, Spec, [OptSpec('flag', '-a'), OptSpec('flag', '-a', '--b')])
+        self.assertRaises(ValueError, OptSpec.from_dict, {'kind': 'flag', 'opt': '-a', 'size': 3})
+        self.assertRaises(ValueError, OptSpec.from_dict, {'kind': 'option', 'opt': '-a', 'type': 'x'})
+        self.assertRaises(ValueError, Spec.from_dict, {'args': []})
+
+    def test_immutable(self):
+        o = OptSpec('flag', '-a')
+        self.assertRaises(AttributeError, setattr, o, 'opt', '-b')
+        self.assertRaises(AttributeError, delattr, o, 'opt')
+        self.assertFalse(hasattr(o, '__dict__'))
+
+        spec = Spec([o])
+        self.assertRaises(AttributeError, setattr, spec, 'opts', ())
+        self.assertEqual(hash(spec), hash(Spec([OptSpec('flag', '-a')])))
@@ -0,0 +1,119 @@
+import os
+import sys
+import tempfile
+import subprocess
+import unittest
+
+from duckargs import generate_python_code, generate_c_code, process_args, parse_spec, SpecFile
+from duckargs.probe import FileProbe, PROBE_SENTINEL
+
+
+ARGS = ['infile', '-n', '--count', '10', '-m', '--message', 'hello world', '-q']
+
+SPEC_TEXT = """# A comment
+infile
+
+-n
+--count
+    10
+-m
+--message
+hello world
+# Another comment
+-q
+"""
+
+ENV = {'DUCKARGS_PROBE': PROBE_SENTINEL, 'DUCKARGS_COMMENT': '0'}
+
+
+class TestSpecFile(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'spec.txt')
+        self._write(SPEC_TEXT)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def _write(self, text):
+        with open(self.path, 'w') as fh:
+            fh.write(text)
+
+    def test_iter(self):
+        spec_file = SpecFile(self.path)
+        self.assertEqual(list(spec_file), ['duckargs'] + ARGS)
+        self.assertEqual(spec_file.num_args, len(ARGS))
+        self.assertEqual(spec_file.location(), f"{self.path}:11")
+
+        # Lines are only read as they are needed
+        it = iter(SpecFile(self.path))
+        next(it)
+        next(it)
+        self.assertEqual(next(it), '-n')
+
+    def test_process_args(self):
+        probe = FileProbe(PROBE_SENTINEL)
+        expected = process_args(None, ['duckargs'] + ARGS, probe)
+        opts = process_args(None, SpecFile(self.path), probe)
+
+        self.assertEqual([str(o) for o in opts], [str(o) for o in expected])
+        self.assertEqual([o.var_name for o in opts], [o.var_name for o in expected])
+
+    def test_generate(self):
+        probe = FileProbe(PROBE_SENTINEL)
+        spec = parse_spec(SpecFile(self.path), probe)
+        argv = ['duckargs'] + ARGS
+
+        self.assertEqual(generate_python_code(spec, ENV), generate_python_code(argv, ENV))
+        self.assertEqual(generate_c_code(spec, ENV), generate_c_code(argv, ENV))
+
+    def test_errors(self):
+        self._write("infile\n-n\n\n--count\n-nn\n")
+        with self.assertRaises(ValueError) as cm:
+            process_args(None, SpecFile(self.path))
+
+        self.assertEqual(str(cm.exception), f"{self.path}:5: short option (-nn) must have "
+                         "exactly one character after the dash (-)")
+
+        self._write("-a\n--apple\n3\n# comment\n-b\n-a\n--again\n")
+        with self.assertRaises(ValueError) as cm:
+            process_args(None, SpecFile(self.path))
+
+        self.assertEqual(str(cm.exception), f"{self.path}:6: Short option '-a' was defined more than once")
+
+        self.assertRaises(OSError, list, SpecFile(self.path + '.missing'))
+
+    def test_cli(self):
+        env = dict(os.environ, DUCKARGS_PROBE=PROBE_SENTINEL, DUCKARGS_COMMENT='0')
+        env['PYTHONPATH'] = os.getcwd()
+        expected = generate_python_code(['duckargs'] + ARGS, ENV) + "\n"
+
+        for args, stdin in [(['--spec', self.path], None), ([f"@{self.path}"], None),
+                            (['--spec', '-'], SPEC_TEXT)]:
+            proc = subprocess.run([sys.executable, '-m', 'duckargs', '--no-daemon'] + args,
+                                  input=stdin, env=env, stdout=subprocess.PIPE,
+                                  universal_newlines=True, check=True)
+            self.assertEqual(proc.stdout, expected)
+
+    def test_long_only(self):
+        self._write("infile\n--verbose\n--level\n3\n-q\n")
+        argv = ['duckargs', 'infile', '--verbose', '--level', '3', '-q']
+
+        with self.assertRaises(ValueError) as cm:
+            parse_spec(SpecFile(self.path))
+
+        self.assertEqual(str(cm.exception), f"{self.path}:2: long option (--verbose) is not "
+                         "allowed without short option")
+
+        # Long-only options are allowed with the table-driven C parser
+        table_env = dict(ENV, DUCKARGS_C_PARSER='table')
+        spec = parse_spec(SpecFile(self.path), FileProbe(PROBE_SENTINEL), allow_long_only=True)
+        self.assertEqual(generate_c_code(spec, table_env), generate_c_code(argv, table_env))
+        self.assertRaises(ValueError, generate_c_code, spec, ENV)
+
+        env = dict(os.environ, **table_env)
+        env['PYTHONPATH'] = os.getcwd()
+        proc = subprocess.run([sys.executable, '-c', 'from duckargs.__main__ import duckargs_c; '
+                               'duckargs_c()', '--no-daemon', '--spec', self.path], env=env,
+                              stdout=subprocess.PIPE, universal_newlines=True, check=True)
+        self.assertEqual(proc.stdout, generate_c_code(argv, table_env) + "\n")
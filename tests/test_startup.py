@@ -0,0 +1,70 @@
+import os
+import sys
+import subprocess
+import unittest
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Maximum combined import time, in microseconds, of all duckargs modules imported
+# by 'python -m duckargs' (when printing usage)
+IMPORT_TIME_BUDGET_US = 10000
+
+
+def _run_importtime(args):
+    """
+    Run python with '-X importtime' and return a dict mapping the names of all
+    imported modules to tuples of (cumulative import time in microseconds,
+    nesting level)
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = REPO_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    proc = subprocess.run([sys.executable, '-X', 'importtime'] + args, env=env, cwd=REPO_DIR,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+
+        name = fields[2].rstrip()
+        level = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(fields[1]), level)
+
+    return modules
+
+def _run_entry_point(func, args):
+    code = (f"import sys; sys.argv = {[func] + args}; "
+            f"from duckargs.__main__ import {func}; {func}()")
+    return _run_importtime(['-c', code])
+
+
+class TestStartup(unittest.TestCase):
+    def test_usage_import_time(self):
+        # First run makes sure bytecode is cached
+        _run_importtime(['-m', 'duckargs'])
+        modules = _run_importtime(['-m', 'duckargs'])
+
+        for name in ['duckargs.core', 'duckargs.python', 'duckargs.c', 're', 'argparse', 'json', 'socket']:
+            self.assertNotIn(name, modules)
+
+        total = sum(t for name, (t, level) in modules.items()
+                    if (level == 0) and name.startswith('duckargs'))
+
+        self.assertLessEqual(total, IMPORT_TIME_BUDGET_US)
+
+    def test_c_does_not_import_python_backend(self):
+        modules = _run_entry_point('duckargs_c', ['-a', '--apple', '3', '-q'])
+        self.assertIn('duckargs.c', modules)
+        self.assertNotIn('duckargs.python', modules)
+
+    def test_python_does_not_import_c_backend(self):
+        modules = _run_entry_point('duckargs_python', ['-a', '--apple', '3', '-q'])
+        self.assertIn('duckargs.python', modules)
+        self.assertNotIn('duckargs.c', modules)
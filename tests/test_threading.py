@@ -0,0 +1,76 @@
+import os
+import random
+import threading
+import unittest
+
+from duckargs import generate_python_code, generate_c_code, generate_code, generate_parallel
+
+
+def _random_argv(rng, index):
+    args = ['duckargs']
+
+    # Positional values that are not valid identifiers get generated names
+    # (positional_arg0, positional_arg1...), which depend on parsing state
+    for i in range(rng.randint(0, 6)):
+        args.append(rng.choice([str(rng.randint(-100, 100)), f"{rng.random():.3f}",
+                                f"pos-{index}-{i}", f"pos{index}_{i}", "0x1f"]))
+
+    letters = rng.sample('abcdefghijklmnopqrstuvwxyz', rng.randint(0, 6))
+    for letter in letters:
+        args.append(f"-{letter}")
+        kind = rng.randint(0, 3)
+        if kind == 0:
+            continue
+
+        args.append(f"--{letter}{index}")
+        if kind == 1:
+            args.append(str(rng.randint(0, 1000)))
+        elif kind == 2:
+            args.append("x,y,z")
+        else:
+            args.append("FILE")
+
+    return args
+
+
+class TestThreading(unittest.TestCase):
+    NUM_SPECS = 2000
+    NUM_THREADS = 16
+
+    def setUp(self):
+        os.environ["DUCKARGS_PRINT"] = "1"
+        os.environ["DUCKARGS_COMMENT"] = "1"
+
+        rng = random.Random(1234)
+        self.argvs = [_random_argv(rng, i) for i in range(self.NUM_SPECS)]
+
+    def test_generate_parallel(self):
+        for target in ['python', 'c']:
+            expected = [generate_code(target, argv) for argv in self.argvs]
+            self.assertEqual(generate_parallel(target, self.argvs, self.NUM_THREADS), expected)
+
+    def test_many_threads(self):
+        expected = [(generate_python_code(a), generate_c_code(a)) for a in self.argvs]
+        results = [None] * len(self.argvs)
+        start = threading.Barrier(self.NUM_THREADS)
+
+        def worker(thread_index):
+            start.wait()
+            for i in range(thread_index, len(self.argvs), self.NUM_THREADS):
+                results[i] = (generate_python_code(self.argvs[i]), generate_c_code(self.argvs[i]))
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.NUM_THREADS)]
+        for t in threads:
+            t.start()
+
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, expected)
+
+    def test_no_state_leak_after_error(self):
+        self.assertRaises(ValueError, generate_python_code, ['duckargs', '12', '-a', '-a'])
+        self.assertIn("'positional_arg0'", generate_python_code(['duckargs', '12']))
+
+        self.assertRaises(ValueError, generate_c_code, ['duckargs', '12', '-a', '-a'])
+        self.assertIn("positional_arg0", generate_c_code(['duckargs', '12']))
@@ -0,0 +1,52 @@
+import os
+import re
+import sys
+import tempfile
+import subprocess
+import unittest
+
+from duckargs import generate_python_code
+
+
+SPEC = ['duckargs', 'infile', '-n', '--count', '10', '-v', '--verbose']
+
+TIMING_RGX = re.compile(r"duckargs timing: parsing ([0-9.]+) ms, total ([0-9.]+) ms, peak RSS (\d+ KB|unknown)")
+
+
+class TestTiming(unittest.TestCase):
+    def _run(self, env, args):
+        env = dict(env, DUCKARGS_TIMING='1', DUCKARGS_PROBE='sentinel')
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, 'program.py')
+            with open(path, 'w') as fh:
+                fh.write(generate_python_code(SPEC, env))
+
+            return subprocess.run([sys.executable, path] + args, stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE, universal_newlines=True)
+
+    def test_timing(self):
+        for env in [{}, {'DUCKARGS_FASTPARSE': '1'}]:
+            proc = self._run(env, ['in.txt', '-n', '3', '--duckargs-timing'])
+            self.assertEqual(0, proc.returncode, proc.stderr)
+            self.assertEqual("in.txt\n3\nFalse\n", proc.stdout)
+
+            match = TIMING_RGX.search(proc.stderr)
+            self.assertIsNotNone(match, proc.stderr)
+            self.assertLessEqual(float(match.group(1)), float(match.group(2)))
+
+            proc = self._run(env, ['in.txt'])
+            self.assertEqual("", proc.stderr)
+
+            # Hidden options are not in the help text, but are reported when exiting after it
+            proc = self._run(env, ['-h', '--duckargs-timing'])
+            self.assertNotIn("--duckargs", proc.stdout)
+            self.assertIsNotNone(TIMING_RGX.search(proc.stderr), proc.stderr)
+
+    def test_profile(self):
+        for env in [{}, {'DUCKARGS_FASTPARSE': '1'}]:
+            proc = self._run(env, ['in.txt', '--duckargs-profile'])
+            self.assertEqual(0, proc.returncode, proc.stderr)
+            self.assertIn("function calls", proc.stderr)
+            self.assertIn("(main)", proc.stderr)
+            self.assertIsNone(TIMING_RGX.search(proc.stderr))
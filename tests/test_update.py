@@ -0,0 +1,132 @@
+import os
+import sys
+import tempfile
+import subprocess
+import unittest
+
+from duckargs import generate_python_code, generate_c_code
+from duckargs.update import recover_argv, merge_update, update_code, update_file
+
+
+ENV = {'DUCKARGS_PROBE': 'sentinel'}
+
+OLD_ARGV = ['duckargs', 'pos', '-a', '--apple', '3', '-q']
+NEW_ARGV = ['duckargs', 'pos', '-a', '--apple', '3', '-b', '--banana', 'x', '-q']
+
+PY_PRINTLINES = "    print(args.pos)\n    print(args.apple)\n    print(args.q)\n"
+C_PRINTLINE = '    printf("pos: %s\\n", pos ? pos : "null");\n'
+
+
+class TestUpdate(unittest.TestCase):
+    def test_recover_argv(self):
+        self.assertEqual(recover_argv(generate_python_code(NEW_ARGV, ENV)), NEW_ARGV)
+        self.assertEqual(recover_argv(generate_c_code(NEW_ARGV, ENV)), NEW_ARGV)
+        self.assertEqual(recover_argv("#!/usr/bin/env python\n" + generate_python_code(OLD_ARGV, ENV)),
+                         OLD_ARGV)
+
+        code = generate_python_code(OLD_ARGV, dict(ENV, DUCKARGS_COMMENT='0'))
+        self.assertRaises(ValueError, recover_argv, code)
+
+    def test_recover_argv_quoted(self):
+        argv = ['duckargs', '-n', '--name', 'two words', '-q', '--quote', "it's"]
+        self.assertEqual(recover_argv(generate_python_code(argv, ENV)), argv)
+        self.assertEqual(recover_argv(generate_c_code(argv, ENV)), argv)
+
+    def test_unchanged(self):
+        code = generate_python_code(OLD_ARGV, ENV)
+        self.assertEqual(update_code('python', code, NEW_ARGV, ENV),
+                         (generate_python_code(NEW_ARGV, ENV), []))
+
+        self.assertEqual(update_code('python', code, OLD_ARGV, ENV), (code, []))
+
+    def test_hand_edits_python(self):
+        edited = generate_python_code(OLD_ARGV, ENV).replace(PY_PRINTLINES, "    run(args)\n")
+        code, conflicts = update_code('python', edited, NEW_ARGV, ENV)
+
+        expected = generate_python_code(NEW_ARGV, ENV).replace(
+            PY_PRINTLINES.replace("args.q", "args.banana)\n    print(args.q"), "    run(args)\n")
+        self.assertEqual(code, expected)
+
+        # The print line for the new option had nowhere to go
+        self.assertEqual(conflicts, [(expected.split('\n').index("    run(args)") + 1, [],
+                                      ["    print(args.banana)\n"])])
+
+    def test_hand_edits_c(self):
+        edited = generate_c_code(OLD_ARGV, ENV).replace(C_PRINTLINE, "    run(pos);\n")
+        edited += "\nvoid run(char *pos)\n{\n}\n"
+        code, conflicts = update_code('c', edited, NEW_ARGV, ENV)
+
+        expected = generate_c_code(NEW_ARGV, ENV).replace(C_PRINTLINE, "    run(pos);\n")
+        expected += "\nvoid run(char *pos)\n{\n}\n"
+        self.assertEqual(code, expected)
+        self.assertEqual(conflicts, [])
+
+    def test_wrong_target(self):
+        code = generate_python_code(OLD_ARGV, ENV)
+        self.assertRaises(ValueError, update_code, 'c', code, NEW_ARGV, ENV)
+
+    def test_merge_update(self):
+        base = "a\nb\nc\nd\ne\n"
+        self.assertEqual(merge_update(base, "a\nB\nc\nd\ne\nf\n", "x\na\nb\nc\nd\ne\n"),
+                         ("x\na\nB\nc\nd\ne\nf\n", []))
+
+        # Changed line was also changed by hand
+        self.assertEqual(merge_update(base, "a\nB\nc\nd\ne\n", "a\nb2\nc\nd\ne\n"),
+                         ("a\nb2\nc\nd\ne\n", [(2, ["b\n"], ["B\n"])]))
+
+        # Lines to remove are reported when the lines around them were changed by hand
+        self.assertEqual(merge_update(base, "a\nb\nd\ne\n", "a\nb2\nc\nd\ne\n"),
+                         ("a\nb2\nc\nd\ne\n", [(2, ["c\n"], [])]))
+
+        # Removed lines
+        self.assertEqual(merge_update(base, "a\ne\n", "a\nb\nc\nd\ne\nz\n"), ("a\ne\nz\n", []))
+
+    def test_update_file(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, 'tool.c')
+            with open(path, 'w') as fh:
+                fh.write(generate_c_code(OLD_ARGV, ENV).replace(C_PRINTLINE, ""))
+
+            env = dict(os.environ, DUCKARGS_PROBE='sentinel')
+            env['PYTHONPATH'] = os.getcwd()
+            subprocess.run([sys.executable, '-c', 'from duckargs.__main__ import duckargs_c; '
+                            'duckargs_c()', '--no-daemon', '--update', path] + NEW_ARGV[1:],
+                           env=env, check=True)
+
+            with open(path, 'r') as fh:
+                self.assertEqual(fh.read(), generate_c_code(NEW_ARGV, ENV).replace(C_PRINTLINE, ""))
+
+            output = os.path.join(tempdir, 'out.c')
+            self.assertEqual(update_file('c', path, OLD_ARGV, ENV, output=output), [])
+            with open(output, 'r') as fh:
+                self.assertEqual(fh.read(), generate_c_code(OLD_ARGV, ENV).replace(C_PRINTLINE, ""))
+
+    def test_update_file_conflicts(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, 'tool.py')
+            edited = generate_python_code(OLD_ARGV, ENV).replace(PY_PRINTLINES, "    run(args)\n")
+            with open(path, 'w') as fh:
+                fh.write(edited)
+
+            # Not written unless forced, since the new print line had nowhere to go
+            conflicts = update_file('python', path, NEW_ARGV, ENV)
+            self.assertEqual(len(conflicts), 1)
+            with open(path, 'r') as fh:
+                self.assertEqual(fh.read(), edited)
+
+            env = dict(os.environ, DUCKARGS_PROBE='sentinel')
+            env['PYTHONPATH'] = os.getcwd()
+            cmd = [sys.executable, '-c', 'from duckargs.__main__ import duckargs_python; '
+                   'duckargs_python()', '--no-daemon', '--update', path]
+            proc = subprocess.run(cmd + NEW_ARGV[1:], env=env, stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE, universal_newlines=True)
+            self.assertIn("+    print(args.banana)\n", proc.stderr)
+            self.assertIn("Use --force", proc.stdout)
+            with open(path, 'r') as fh:
+                self.assertEqual(fh.read(), edited)
+
+            subprocess.run(cmd[:-2] + ['--force'] + cmd[-2:] + NEW_ARGV[1:], env=env,
+                           stderr=subprocess.PIPE, check=True)
+            self.assertEqual(update_file('python', path, NEW_ARGV, ENV), [])
+            with open(path, 'r') as fh:
+                self.assertIn("    run(args)\n", fh.read())
@@ -0,0 +1,122 @@
+import io
+import os
+import time
+import tempfile
+import threading
+import unittest
+
+from duckargs import generate_python_code, generate_c_code, parse_spec, SpecFile
+from duckargs.probe import FileProbe, PROBE_SENTINEL
+from duckargs.watch import Watcher, load_spec_file
+
+# Longest time to wait for a change to be noticed
+TIMEOUT = 5.0
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.spec = os.path.join(self.tempdir.name, 'spec.txt')
+        self.output = os.path.join(self.tempdir.name, 'out.py')
+        self.out = io.StringIO()
+        self.watchers = []
+
+    def tearDown(self):
+        for stop, thread in self.watchers:
+            stop.set()
+            thread.join()
+
+        self.tempdir.cleanup()
+
+    def _write(self, path, text):
+        with open(path, 'w') as fh:
+            fh.write(text)
+
+    def _read(self, path):
+        with open(path, 'r') as fh:
+            return fh.read()
+
+    def _start(self, watcher):
+        stop = threading.Event()
+        thread = threading.Thread(target=watcher.run, args=(stop,))
+        thread.start()
+        self.watchers.append((stop, thread))
+
+    def _wait_for(self, path, text):
+        deadline = time.monotonic() + TIMEOUT
+        while time.monotonic() < deadline:
+            if os.path.isfile(path) and (self._read(path) == text):
+                return
+
+            time.sleep(0.01)
+
+        self.fail(f"{path} was not regenerated, output:\n{self.out.getvalue()}")
+
+    def test_load_spec_file(self):
+        self._write(self.spec, "# comment\npos\n-a\n--apple\n  3\n\n-m\n--message\nhello world\n")
+        self.assertEqual(load_spec_file(self.spec),
+                         ['pos', '-a', '--apple', '3', '-m', '--message', 'hello world'])
+
+        self.assertRaises(OSError, load_spec_file, self.spec + '.missing')
+
+    def test_same_format_as_spec(self):
+        # The same file gives the same program with '--watch' and '--spec'
+        self._write(self.spec, "# comment\npos\n-m\n--message\nhello world\n-q\n")
+        watcher = Watcher(self.spec, self.output, 'python', out=self.out)
+        self.assertEqual(watcher.regenerate(), 1)
+
+        spec = parse_spec(SpecFile(self.spec), FileProbe(PROBE_SENTINEL))
+        self.assertEqual(self._read(self.output), generate_python_code(spec))
+
+    def test_regenerate(self):
+        self._write(self.spec, "-a\n--apple\n3\n")
+        watcher = Watcher(self.spec, self.output, 'python', out=self.out)
+
+        self.assertEqual(watcher.regenerate(), 1)
+        self.assertEqual(self._read(self.output), generate_python_code(['duckargs', '-a', '--apple', '3']))
+
+        # Unchanged spec is not regenerated, even if formatted differently
+        self._write(self.spec, "# apples\n-a\n  --apple\n\n3\n")
+        self.assertEqual(watcher.regenerate(), 0)
+
+        self._write(self.spec, "-a\n--apple\n3\n-a\n")
+        self.assertEqual(watcher.regenerate(), 0)
+        self.assertIn("Error:", self.out.getvalue())
+
+        self._write(self.spec, "-a\n--apple\n4\n")
+        self.assertEqual(watcher.regenerate(), 1)
+        self.assertIn(f"Generated {self.output} in", self.out.getvalue())
+
+    def test_manifest(self):
+        tool_c = os.path.join(self.tempdir.name, 'tool.c')
+        manifest = os.path.join(self.tempdir.name, 'manifest.txt')
+        self._write(manifest, f"{self.output} -a\n{tool_c} -b\n")
+
+        watcher = Watcher(manifest, out=self.out)
+        self.assertEqual(watcher.regenerate(), 2)
+
+        os.unlink(self.output)
+        self._write(manifest, f"{self.output} -a\n{tool_c} -b -c\n")
+        self.assertEqual(watcher.regenerate(), 1)
+        self.assertFalse(os.path.exists(self.output))
+        self.assertEqual(self._read(tool_c), generate_c_code(['duckargs', '-b', '-c']))
+
+    def _test_watch(self, poll):
+        self._write(self.spec, "-a")
+        self._start(Watcher(self.spec, self.output, 'python', poll=poll, out=self.out))
+        self._wait_for(self.output, generate_python_code(['duckargs', '-a']))
+
+        # Replaced, the way many editors save files
+        tmp = self.spec + '.tmp'
+        self._write(tmp, "-a\n-b\n")
+        os.replace(tmp, self.spec)
+        self._wait_for(self.output, generate_python_code(['duckargs', '-a', '-b']))
+
+        self._write(self.spec, "-x\n--xval\n5\n")
+        self._wait_for(self.output, generate_python_code(['duckargs', '-x', '--xval', '5']))
+
+    def test_watch_inotify(self):
+        self._test_watch(False)
+
+    def test_watch_poll(self):
+        self._test_watch(True)